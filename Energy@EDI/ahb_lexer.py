@@ -0,0 +1,95 @@
+"""
+Zerlegt die Datenelementspalte einer Zeile eines AHB Anwendungsfalls in Token für parse_dataelement.
+
+Jeder Paragraph der Spalte ist eine Zeile. Die Strings eines Paragraphen werden an Folgen von drei oder mehr
+Leerzeichen (Word ersetzt Tabulatoren beim HTML Export durch Leerzeichen) in Token zerlegt. Der Typ eines Tokens
+ergibt sich aus der Formatierung und der Position in der Zeile:
+
+empty:    nur Leerzeichen
+bold_x:   fett, in der Zeile folgen noch Operanden (X, M, S, K), also der Beginn eines Qualifiers
+bold:     fett, Fortsetzung eines in der Vorzeile begonnenen Qualifiers
+gray:     grau, Beschreibung des Datenelementes
+indented: Paragraph mit mehr als 20pt Einzug
+plain_c:  übriger Text ab Position 30, Bedingung
+plain:    übriger Text vor Position 30, z.B. Beschreibung des Qualifiers
+newline:  Ende des Paragraphen
+
+Die Regeln entsprechen der bisherigen Zerlegung in extract_ahb einschließlich ihrer Eigenheiten:
+Farbe und Einzug eines Elternelementes gelten für alle folgenden Strings des Paragraphen weiter, fett ist ein
+String nur innerhalb von <b><span>, und die Operanden werden hinter dem ersten Vorkommen des Tokens in der Zeile
+gesucht. Die regulären Ausdrücke werden einmal übersetzt, die Zeile für die Suche nach Operanden wird nur für
+Paragraphen mit fettem Text aufgebaut und die Token sind Tupel.
+"""
+from collections import namedtuple
+from functools import lru_cache
+import re
+import util
+
+# Der Typname entspricht der früheren Dataclass, damit die Fehlertexte mit dem Token unverändert bleiben
+Token = namedtuple('DataClassToken', 'type pos strng line')
+
+# Per Definition werden Token ab einer Folge von drei oder mehr Leerzeichen als Trenner erzeugt
+RE_SPLIT_TAB = re.compile(r'(\s{3,})')
+RE_OPERAND = re.compile(r'X |M |S |K ')
+
+# Stichproben haben ergeben, dass keine X vor Position 30 liegen und die Anfänge der Qualifier Beschreiber
+# höchstens bei 10
+CONDITION_POS = 29
+
+# Einzug in pt, ab dem ein Paragraph als eingerückt gilt
+INDENT_PT = 20
+
+@lru_cache(maxsize=None)
+def is_indented(margin_left):
+    return float(margin_left[:-2]) > INDENT_PT
+
+def iter_tokens(dataelement):
+    """
+    :param dataelement: Datenelementspalte (td) einer Zeile des Anwendungsfalls
+    :return: Generator der Token
+    """
+    # Entspricht find_all('p'), ohne für jede Spalte einen Filter aufzubauen
+    paragraphs = [tag for tag in dataelement.descendants if tag.name == 'p']
+    for line_no, p in enumerate(paragraphs):
+        style = util.get_style_dict(p)
+        color = style.get('color', '')
+        margin_left = style.get('margin-left', '0pt')
+        strings = list(p.strings)
+        # Zeile für die Suche nach Operanden hinter fettem Text
+        look_ahead = None
+        pos = 0
+
+        for ps in strings:
+            parent = ps.parent
+            style = util.get_style_dict(parent)
+            color = style.get('color', color)
+            margin_left = style.get('margin-left', margin_left)
+            bold = parent.parent.name == 'b'
+
+            for s in RE_SPLIT_TAB.split(ps.replace('\n', '')):
+                if s == '':
+                    continue
+                strng = s.strip()
+
+                if strng == '':
+                    yield Token('empty', pos, s, line_no)
+                elif bold:
+                    # Beginnen in der Zeile hinter dem Token noch Operanden, ist es der Anfang eines neuen
+                    # Qualifiers, ansonsten wird ein in der Vorzeile begonnener Qualifier fortgesetzt
+                    if look_ahead is None:
+                        look_ahead = (" ".join(strings) + ' ').replace('\n', '')
+                    if RE_OPERAND.search(look_ahead, look_ahead.find(strng) + len(strng)) is None:
+                        yield Token('bold', pos, strng, line_no)
+                    else:
+                        yield Token('bold_x', pos, strng, line_no)
+                elif color == 'gray':
+                    yield Token('gray', pos, strng, line_no)
+                elif is_indented(margin_left):
+                    yield Token('indented', pos, strng, line_no)
+                elif pos > CONDITION_POS:
+                    yield Token('plain_c', pos, strng, line_no)
+                else:
+                    yield Token('plain', pos, strng, line_no)
+
+                pos += len(s)
+        yield Token('newline', 0, '', line_no)
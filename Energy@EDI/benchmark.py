@@ -0,0 +1,494 @@
+"""
+Benchmarks für die Extraktion. Die Ergebnisse (gleiche Sheets aller Parser, Token, Layouts, Download,
+Konvertierung) prüfen die Tests in tests/.
+
+parser: Misst die Laufzeit von Parsen und Tabellenindex je Parser.
+stream: Vergleicht Laufzeit und Spitzenspeicher der AHB Extraktion mit ganzem Dokumentbaum und tabellenweise,
+        jeweils für die angegebenen Ausgabeformate (z.B. excel und excel-stream).
+extract: Erzeugt mit edi_generator synthetische Releases in mehreren Größen und misst je Extraktor und Schritt
+        (read, parse, index, extract, write) Laufzeit, Durchsatz und Spitzenspeicher.
+convert: Misst die Warteschlange von docx_to_html mit dem Fake Konverter abhängig von der Anzahl paralleler
+        Konvertierungen.
+lexer:  Misst die Zerlegung der Datenelementspalten mit ahb_lexer in Token je Sekunde.
+pids:   Misst die Zuordnung von Positionen zu PIDs (extract_ahb.PidColumns) gegen das Sortieren aller Abstände
+        für breite Anwendungsfälle.
+layout: Vergleicht Laufzeit, Spitzenspeicher und Größe der Ausgabe des breiten und des normalisierten Layouts.
+rows:   Vergleicht für das größte AHB und EBD Dokument Laufzeit und Spitzenspeicher beim Sammeln der Zeilen bis
+        zum DataFrame: je Zeile ein Objekt oder spaltenweise mit column_builder.
+download: Misst Verzeichnis und Download gegen einen lokalen Ersatz für edi-energy.de (tests/fake_edi_energy.py)
+        abhängig von der Anzahl der Dokumente und paralleler Anfragen.
+"""
+from pathlib import Path
+import argparse
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import ahb_lexer
+import column_builder
+import concat
+import docx_to_html
+import edi_generator
+import download
+import edi_extract
+import extract_ahb
+import extract_ebd
+import sink
+import util
+from tests.fake_edi_energy import start_fake_server
+
+def bench_parser(files, backends=util.PARSER_BACKENDS, repeat=3):
+    """
+    Misst für jedes Dokument und jeden Parser die beste Laufzeit von Parsen und Tabellenindex
+    :return: Liste mit (Datei, Parser, Sekunden Parsen, Sekunden Tabellenindex)
+    """
+    results = []
+    for file in files:
+        extractor = edi_extract.get_extractor(file)
+        with open(file, 'rb' if extractor.binary else 'r') as f:
+            data = f.read()
+        for backend in backends:
+            parse_times = []
+            index_times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                edi_doc = util.parse_html(data, backend, keep=extractor.strainer_tags)
+                parse_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                extractor.get_table_index(edi_doc)
+                index_times.append(time.perf_counter() - start)
+            results.append((file.name, backend, min(parse_times), min(index_times)))
+    return results
+
+def measure(function, *args):
+    """
+    Führt eine Funktion aus und misst Laufzeit und Spitzenspeicher (tracemalloc)
+    :return: (Sekunden, MB)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+def bench_stream(files, formats=('excel',)):
+    """
+    Vergleicht die AHB Extraktion mit ganzem Dokumentbaum und tabellenweise mit stream_reader
+    :param formats: Ausgabeformate, die jeweils einzeln gemessen werden
+    :return: Liste mit (Datei, Größe MB, Variante, Sekunden, Spitzenspeicher MB)
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for file in files:
+            source = Path(shutil.copy(file, tmp))
+            size = source.stat().st_size / 1024 / 1024
+            for fmt in formats:
+                results.append((file.name, size, f'Dokumentbaum {fmt}') +
+                               measure(extract_ahb.extract_ahb, source, 'html.parser', (fmt,)))
+                results.append((file.name, size, f'stream {fmt}') +
+                               measure(extract_ahb.extract_ahb_stream, source, (fmt,)))
+    return results
+
+def bench_download(counts, jobs_list, latency=0.01, size=64 * 1024):
+    """
+    Misst Verzeichnis (get_view), Download und einen zweiten Download ohne Änderungen gegen den lokalen Server
+    :return: Liste mit (Anzahl Dokumente, parallele Anfragen, Sekunden Verzeichnis, Sekunden Download,
+             Sekunden Aktualisieren)
+    """
+    results = []
+    for count in counts:
+        server, base_url = start_fake_server(count, size, latency)
+        try:
+            for jobs in jobs_list:
+                with tempfile.TemporaryDirectory() as tmp:
+                    session = download.create_session(pool_size=jobs)
+                    start = time.perf_counter()
+                    docs = download.get_view('now', session, base_url, jobs)
+                    crawl = time.perf_counter() - start
+                    start = time.perf_counter()
+                    download.download_docs(docs, '20231001', session, tmp, jobs)
+                    seconds = time.perf_counter() - start
+                    start = time.perf_counter()
+                    download.download_docs(docs, '20231001', session, tmp, jobs)
+                    results.append((count, jobs, crawl, seconds, time.perf_counter() - start))
+        finally:
+            server.shutdown()
+    return results
+
+def scaled_config(scale, seed=1):
+    """
+    Konfiguration des Generators, bei der Anwendungsfälle, Segmente und EBDs mit scale wachsen
+    """
+    defaults = edi_generator.DataClassGeneratorConfig()
+    return edi_generator.DataClassGeneratorConfig(seed=seed, use_cases=defaults.use_cases * scale,
+                                                  segments=defaults.segments * scale, ebds=defaults.ebds * scale,
+                                                  code_lists=defaults.code_lists * scale,
+                                                  changes=defaults.changes * scale)
+
+def run_stages(file, extractor, formats=('excel',), trace=False):
+    """
+    Führt edi_extract.extract_file aus und liefert die mit instrument gemessenen Schritte
+    :param trace: Spitzenspeicher je Schritt mit tracemalloc messen (verlangsamt die Ausführung)
+    :return: dict Schritt -> (Sekunden, Spitzenspeicher MB oder 0.0)
+    """
+    recorder = edi_extract.extract_file(file, extractor, edi_extract.DataClassTimings(),
+                                        edi_extract.DataClassOptions(formats=formats, memory=trace))
+    return {stage: (record.seconds, record.peak_mb) for stage, record in recorder.stages.items()}
+
+def bench_extract(scales, repeat=3, formats=('excel',)):
+    """
+    Misst für synthetische Releases der angegebenen Größen je Extraktor und Schritt die beste Laufzeit aus repeat
+    Läufen und in einem weiteren Lauf mit tracemalloc den Spitzenspeicher. Der Spitzenspeicher eines Schrittes
+    enthält auch, was aus den vorherigen Schritten noch gehalten wird (z.B. bei extract den Dokumentbaum).
+    :return: Liste mit (Extraktor, Skala, Größe MB, Schritt, Sekunden, MB/s, Spitzenspeicher MB)
+    """
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            for file in edi_generator.write_release(Path(tmp) / 'release', scaled_config(scale)):
+                extractor = edi_extract.get_extractor(file)
+                size = file.stat().st_size / 1024 / 1024
+                runs = [run_stages(file, extractor, formats) for _ in range(repeat)]
+                peaks = run_stages(file, extractor, formats, trace=True)
+                for stage in edi_extract.STAGES:
+                    seconds = min(run.get(stage, (0.0, 0.0))[0] for run in runs)
+                    results.append((extractor.name, scale, size, stage, seconds, size / seconds if seconds else 0.0,
+                                    peaks.get(stage, (0.0, 0.0))[1]))
+                total = sum(min(run.get(stage, (0.0, 0.0))[0] for run in runs) for stage in edi_extract.STAGES)
+                results.append((extractor.name, scale, size, 'Summe', total, size / total if total else 0.0,
+                                max(peak for _, peak in peaks.values())))
+    return results
+
+def lexer_cells(files):
+    """
+    Datenelementspalten aller Anwendungsfälle der AHB Dokumente
+    """
+    for file in files:
+        with open(file, 'r') as f:
+            edi_doc = util.parse_html(f.read(), keep=extract_ahb.STRAINER_TAGS)
+        for _, tab_list in extract_ahb.get_table_index(edi_doc)['UseCases'].values():
+            for table in tab_list:
+                for row in filter(extract_ahb.filter_white_rows, table.find_all('tr')):
+                    yield row.find_all('td')[1]
+
+def bench_lexer(files, repeat=3):
+    """
+    Beste Laufzeit aus repeat Läufen für die Zerlegung aller Datenelementspalten
+    :return: (Spalten, Token, Sekunden, Token je Sekunde)
+    """
+    cells = list(lexer_cells(files))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(sum(1 for _ in ahb_lexer.iter_tokens(cell)) for cell in cells)
+        times.append(time.perf_counter() - start)
+    return len(cells), count, min(times), count / min(times)
+
+def random_start_pos_ref(rnd, count):
+    """
+    Referenzzeile mit count PIDs in zufälliger Reihenfolge und Abständen, die auch gleich weit entfernte
+    Nachbarspalten ergeben
+    """
+    pids = [str(rnd.randint(10000, 99999)) for _ in range(count)]
+    positions = sorted(rnd.sample(range(30, 30 + 12 * count), count))
+    return list(zip(pids, positions))
+
+def bench_pid_columns(counts=(4, 24, 48), fragments=100000, seed=1):
+    """
+    Misst die Zuordnung von fragments Positionen für Anwendungsfälle mit count PIDs
+    :return: Liste (PIDs, Sekunden Sortieren aller Abstände, Sekunden PidColumns einschließlich Aufbau der Tabelle)
+    """
+    rnd = random.Random(seed)
+    rows = []
+    for count in counts:
+        start_pos_ref = random_start_pos_ref(rnd, count)
+        positions = [rnd.randrange(start_pos_ref[-1][1] + 20) for _ in range(fragments)]
+        start = time.perf_counter()
+        for pos in positions:
+            sorted((abs(ref - pos), pid) for pid, ref in start_pos_ref)[0]
+        sorting = time.perf_counter() - start
+        start = time.perf_counter()
+        columns = extract_ahb.PidColumns(start_pos_ref)
+        for pos in positions:
+            columns.nearest(pos)
+        rows.append((count, sorting, time.perf_counter() - start))
+    return rows
+
+def output_size(source, formats):
+    """
+    Größe der Ausgabe eines Dokumentes in MB über alle Formate (Datei bzw. Parquet Verzeichnis)
+    """
+    size = 0
+    for fmt in formats:
+        path = sink.output_path(source, fmt)
+        files = path.rglob('*') if path.is_dir() else [path]
+        size += sum(f.stat().st_size for f in files if f.is_file())
+    return size / 1024 / 1024
+
+def bench_layout(files, formats=('excel',)):
+    """
+    Misst die tabellenweise AHB Extraktion im breiten und im normalisierten Layout. Der Spitzenspeicher zeigt den
+    Bedarf der Datenelemente des größten Anwendungsfalls.
+    :return: Liste mit (Datei, Layout, Sekunden, Spitzenspeicher MB, Ausgabe MB)
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for file in files:
+            for layout in extract_ahb.LAYOUTS:
+                (Path(tmp) / layout).mkdir()
+                source = Path(shutil.copy(file, Path(tmp) / layout))
+                seconds, peak = measure(extract_ahb.extract_ahb_stream, source, formats, layout)
+                results.append((file.name, layout, seconds, peak, output_size(source, formats)))
+    return results
+
+class FrameSink:
+    """
+    Senke, die die mit append übergebenen DataFrames nur sammelt
+    """
+    def __init__(self):
+        self.frames = []
+
+    def append(self, df, sheet):
+        self.frames.append(df)
+
+def fresh(value):
+    """
+    Eigene Kopie eines Textes, wie sie der Parser für jede Zelle liefert
+    """
+    return (value + ' ')[:-1] if isinstance(value, str) else value
+
+def fresh_rows(builder):
+    return [tuple(map(fresh, row)) for row in zip(*builder.columns.values())]
+
+def parse_document(file):
+    extractor = edi_extract.get_extractor(file)
+    with open(file, 'rb' if extractor.binary else 'r') as f:
+        data = f.read()
+    return extractor.get_table_index(util.parse_html(data, keep=extractor.strainer_tags))
+
+def ahb_rows(file):
+    """
+    Datenelemente und Bedingungen je PID der Anwendungsfälle eines AHB mit eigenen Kopien der Texte
+    :return: Liste mit (Zeilen der Datenelemente, Zeilen der Bedingungen je PID) je Anwendungsfall
+    """
+    context = extract_ahb.DataClassContext(path=file)
+    use_cases = []
+    for pids, (head, tab_list) in parse_document(file)['UseCases'].items():
+        use_case = extract_ahb.get_use_case(head, tab_list, pids, context)
+        use_cases.append((fresh_rows(use_case.elements), fresh_rows(use_case.pid_rows)))
+    return use_cases
+
+def ahb_objects(use_cases):
+    """
+    Je Zeile ein dict mit allen Spalten, die Zeilen aller Anwendungsfälle werden bis zum Schreiben gehalten,
+    dann je Anwendungsfall pd.DataFrame(Liste)
+    """
+    held = []
+    for elements, pid_rows in use_cases:
+        values = [dict(zip(extract_ahb.ELEMENT_FIELDS, map(fresh, element))) for element in elements]
+        held.append([values[element] | dict(zip(extract_ahb.PID_FIELDS, map(fresh, pid_values)))
+                     for element, *pid_values in pid_rows])
+    return [pd.DataFrame(rows, columns=list(extract_ahb.USE_CASE_COLUMNS)).rename(columns=extract_ahb.USE_CASE_COLUMNS)
+            for rows in held]
+
+def ahb_columns(use_cases):
+    """
+    Mit column_builder: Datenelemente und Bedingungen je PID spaltenweise, Ausgabe über write_use_case
+    """
+    held = []
+    for elements, pid_rows in use_cases:
+        use_case = extract_ahb.DataClassUseCase()
+        for element in elements:
+            use_case.elements.append(*map(fresh, element))
+        for pid_values in pid_rows:
+            use_case.pid_rows.append(*map(fresh, pid_values))
+        held.append(use_case)
+    out = FrameSink()
+    context = extract_ahb.DataClassContext()
+    for use_case in held:
+        extract_ahb.write_use_case(out, use_case, context)
+    return out.frames
+
+def ebd_rows(file):
+    """
+    Zeilen der EBD und Codelisten eines EBD Dokumentes mit eigenen Kopien der Texte
+    :return: dict Tabelle -> (Dataclass der Zeilen, Zeilen)
+    """
+    table_index, _ = parse_document(file)
+    return {'EBD': (extract_ebd.DataClassEBD, fresh_rows(extract_ebd.get_ebd(table_index))),
+            'Codelisten': (extract_ebd.DataClassCodeList, fresh_rows(extract_ebd.get_code_lists(table_index)))}
+
+def ebd_objects(row_type, rows):
+    return [pd.DataFrame([row_type(*map(fresh, row)) for row in rows])]
+
+def ebd_columns(row_type, rows):
+    builder = column_builder.ColumnBuilder.from_dataclass(row_type)
+    for row in rows:
+        builder.append(*map(fresh, row))
+    return [builder.frame()]
+
+def bench_rows(files):
+    """
+    Vergleicht für das größte AHB und das größte EBD Dokument das Sammeln der Zeilen bis zum DataFrame: je Zeile
+    ein Objekt oder spaltenweise mit column_builder und sys.intern. Die Texte werden für jede Zeile neu erzeugt,
+    wie beim Parsen.
+    :return: Liste mit (Datei, Tabelle, Zeilen, Variante, Sekunden, Spitzenspeicher MB)
+    """
+    results = []
+    for kind in ('AHB', 'EBD'):
+        candidates = [file for file in files if edi_extract.get_extractor(file).name == kind]
+        if not candidates:
+            continue
+        file = max(candidates, key=lambda f: f.stat().st_size)
+        if kind == 'AHB':
+            use_cases = ahb_rows(file)
+            tables = {'Anwendungsfälle': ((ahb_objects, use_cases), (ahb_columns, use_cases),
+                                          sum(len(pid_rows) for _, pid_rows in use_cases))}
+        else:
+            tables = {table: ((ebd_objects, row_type, rows), (ebd_columns, row_type, rows), len(rows))
+                      for table, (row_type, rows) in ebd_rows(file).items()}
+        for table, (objects, columns, count) in tables.items():
+            results.append((file.name, table, count, 'Objekte je Zeile') + measure(*objects))
+            results.append((file.name, table, count, 'column_builder') + measure(*columns))
+    return results
+
+def make_conversion_jobs(path, count):
+    """
+    Legt count leere Word Dokumente in <path>/Strom an
+    :return: Liste der DataClassConversionJob
+    """
+    (path / 'Strom').mkdir(parents=True, exist_ok=True)
+    for n in range(count):
+        (path / 'Strom' / f'Dokument_{n}.docx').write_bytes(b'')
+    return sorted(docx_to_html.release_jobs(path), key=lambda job: job.source.name)
+
+def bench_conversion(count, workers_list, delay):
+    """
+    :return: Liste (Worker, Sekunden, Sekunden je Dokument)
+    """
+    rows = []
+    for workers in workers_list:
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = make_conversion_jobs(Path(tmp), count)
+            seconds, _ = measure(lambda: docx_to_html.convert_all(jobs, docx_to_html.FakeConverter(delay), workers))
+            rows.append((workers, seconds, seconds / count))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks für die Extraktion')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    bench = sub.add_parser('parser', help='Laufzeit der Parser messen')
+    bench.add_argument('files', nargs='+', type=Path)
+    bench.add_argument('--backends', nargs='+', default=util.PARSER_BACKENDS, choices=util.PARSER_BACKENDS)
+    bench.add_argument('--repeat', type=int, default=3)
+
+    stream = sub.add_parser('stream', help='Speicherbedarf der tabellenweisen AHB Extraktion messen')
+    stream.add_argument('files', nargs='+', type=Path)
+    stream.add_argument('--format', nargs='+', default=['excel', 'excel-stream'], choices=sink.FORMATS)
+
+    ext = sub.add_parser('extract', help='Durchsatz und Spitzenspeicher je Extraktor und Schritt messen')
+    ext.add_argument('--scales', nargs='+', type=int, default=[1, 4], help='Größen der synthetischen Releases')
+    ext.add_argument('--repeat', type=int, default=3)
+    ext.add_argument('--format', nargs='+', default=['excel'], choices=sink.FORMATS)
+
+    convert = sub.add_parser('convert', help='Warteschlange der Konvertierung messen')
+    convert.add_argument('--count', type=int, default=32, help='Anzahl der Dokumente')
+    convert.add_argument('--workers', nargs='+', type=int, default=[1, 4, 8])
+    convert.add_argument('--delay', type=float, default=0.2, help='Dauer einer Konvertierung in Sekunden')
+
+    lexer = sub.add_parser('lexer', help='Zerlegung der Datenelementspalte messen')
+    lexer.add_argument('files', nargs='*', type=Path,
+                       help='AHB Dokumente, ohne Angabe ein synthetisches AHB aus edi_generator')
+    lexer.add_argument('--repeat', type=int, default=3)
+
+    pid = sub.add_parser('pids', help='Zuordnung der Bedingungen zu PIDs messen')
+    pid.add_argument('--counts', nargs='+', type=int, default=[4, 24, 48], help='Anzahl PIDs je Anwendungsfall')
+    pid.add_argument('--fragments', type=int, default=100000, help='Anzahl zugeordneter Positionen')
+
+    lay = sub.add_parser('layout', help='Normalisiertes Layout der AHB Anwendungsfälle messen')
+    lay.add_argument('files', nargs='*', type=Path,
+                     help='AHB Dokumente, ohne Angabe ein synthetisches AHB aus edi_generator')
+    lay.add_argument('--pids', type=int, default=24, help='Anzahl PIDs je Anwendungsfall im synthetischen AHB')
+    lay.add_argument('--format', nargs='+', default=['excel'], choices=sink.FORMATS)
+
+    rows = sub.add_parser('rows', help='Spaltenweises Sammeln der Zeilen mit column_builder messen')
+    rows.add_argument('files', nargs='*', type=Path,
+                      help='Dokumente, gemessen werden das größte AHB und das größte EBD. Ohne Angabe ein '
+                           'synthetisches Release aus edi_generator')
+    rows.add_argument('--scale', type=int, default=4, help='Größe des synthetischen Releases')
+    rows.add_argument('--pids', type=int, default=24, help='Anzahl PIDs je Anwendungsfall im synthetischen AHB')
+
+    dl = sub.add_parser('download', help='Verzeichnis und Download gegen einen lokalen Server messen')
+    dl.add_argument('--counts', nargs='+', type=int, default=[10, 50, 200])
+    dl.add_argument('--jobs', nargs='+', type=int, default=[1, download.JOBS])
+    dl.add_argument('--latency', type=float, default=0.01, help='Verzögerung je Anfrage in Sekunden')
+    dl.add_argument('--size', type=int, default=64 * 1024, help='Größe der Dokumente in Bytes')
+
+    args = parser.parse_args()
+    match args.command:
+        case 'parser':
+            print(f'{"Datei":<45}{"Parser":<15}{"Parsen":>10}{"Index":>10}')
+            for name, backend, parse_time, index_time in bench_parser(args.files, args.backends, args.repeat):
+                print(f'{name[:44]:<45}{backend:<15}{parse_time:>10.3f}{index_time:>10.3f}')
+
+        case 'stream':
+            print(f'{"Datei":<45}{"MB":>8}  {"Variante":<26}{"Sekunden":>10}{"Spitze MB":>10}')
+            for name, size, variant, seconds, peak in bench_stream(args.files, args.format):
+                print(f'{name[:44]:<45}{size:>8.1f}  {variant:<26}{seconds:>10.2f}{peak:>10.1f}')
+
+        case 'extract':
+            print(f'{"Extraktor":<10}{"Skala":>6}{"MB":>8}  {"Schritt":<9}{"Sekunden":>10}{"MB/s":>8}{"Spitze MB":>10}')
+            for name, scale, size, stage, seconds, throughput, peak in bench_extract(args.scales, args.repeat,
+                                                                                     tuple(args.format)):
+                print(f'{name:<10}{scale:>6}{size:>8.2f}  {stage:<9}{seconds:>10.3f}{throughput:>8.2f}{peak:>10.1f}')
+
+        case 'convert':
+            print(f'{"Worker":>8}{"Sekunden":>10}{"je Dokument":>13}')
+            for workers, seconds, per_document in bench_conversion(args.count, args.workers, args.delay):
+                print(f'{workers:>8}{seconds:>10.2f}{per_document:>13.3f}')
+
+        case 'lexer':
+            with tempfile.TemporaryDirectory() as tmp:
+                files = args.files or [file for file in edi_generator.write_release(Path(tmp), scaled_config(1))
+                                       if '_AHB_' in file.stem]
+                cells, count, seconds, per_second = bench_lexer(files, args.repeat)
+                print(f'{"Spalten":>10}{"Token":>10}{"Sekunden":>10}{"Token/s":>12}')
+                print(f'{cells:>10}{count:>10}{seconds:>10.3f}{per_second:>12.0f}')
+
+        case 'pids':
+            print(f'{"PIDs":>6}{"Sortieren":>10}{"PidColumns":>12}{"Faktor":>8}')
+            for count, sorting, seconds in bench_pid_columns(args.counts, args.fragments):
+                print(f'{count:>6}{sorting:>10.3f}{seconds:>12.3f}{sorting / seconds:>8.1f}')
+
+        case 'layout':
+            with tempfile.TemporaryDirectory() as tmp:
+                config = scaled_config(1)
+                config.pids = args.pids
+                files = args.files or [file for file in edi_generator.write_release(Path(tmp), config)
+                                       if '_AHB_' in file.stem]
+                print(f'{"Datei":<45}{"Layout":<12}{"Sekunden":>10}{"Spitze MB":>10}{"Ausgabe MB":>12}')
+                for name, layout, seconds, peak, size in bench_layout(files, tuple(args.format)):
+                    print(f'{name[:44]:<45}{layout:<12}{seconds:>10.2f}{peak:>10.1f}{size:>12.2f}')
+
+        case 'rows':
+            with tempfile.TemporaryDirectory() as tmp:
+                config = scaled_config(args.scale)
+                config.pids = args.pids
+                files = args.files or edi_generator.write_release(Path(tmp), config)
+                print(f'{"Datei":<40}{"Tabelle":<17}{"Zeilen":>8}  {"Variante":<18}{"Sekunden":>10}{"Spitze MB":>10}')
+                for name, table, count, variant, seconds, peak in bench_rows(files):
+                    print(f'{name[:39]:<40}{table:<17}{count:>8}  {variant:<18}{seconds:>10.3f}{peak:>10.1f}')
+
+        case 'download':
+            print(f'{"Dokumente":>10}{"Parallel":>10}{"Verzeichnis":>13}{"Download":>10}{"Aktualisieren":>15}')
+            for count, jobs, crawl, seconds, refresh in bench_download(args.counts, args.jobs, args.latency,
+                                                                       args.size):
+                print(f'{count:>10}{jobs:>10}{crawl:>13.2f}{seconds:>10.2f}{refresh:>15.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Spaltenweiser Aufbau der Tabellen, die die Extraktoren schreiben.
+
+Bisher wurde je Zeile ein Objekt (Dataclass, dict oder namedtuple) angelegt und die Liste am Ende an pd.DataFrame
+übergeben. ColumnBuilder hängt die Werte einer Zeile direkt an je eine Liste pro Spalte an, pandas erhält die
+Spalten als dict. Texte werden dabei mit sys.intern zusammengelegt: Werte wie 'Muss', PIDs, Segmente und
+Kapitelüberschriften kommen in einem Dokument tausendfach vor und werden so nur einmal gehalten.
+"""
+from dataclasses import MISSING, fields
+import sys
+import pandas as pd
+
+def intern(value):
+    """
+    Gleiche Texte werden zu einem Objekt zusammengelegt, andere Werte bleiben unverändert.
+    Unterklassen von str (z.B. NavigableString aus BeautifulSoup) werden dabei zu str.
+    """
+    return sys.intern(str(value)) if isinstance(value, str) else value
+
+class ColumnBuilder:
+    def __init__(self, columns, defaults=None):
+        """
+        :param columns: Spaltennamen in der Reihenfolge des DataFrames
+        :param defaults: dict Spalte -> Wert für Spalten, die bei add fehlen (ohne Angabe '')
+        """
+        self.columns = {name: [] for name in columns}
+        self.defaults = {name: '' for name in self.columns} | (defaults or {})
+
+    @classmethod
+    def from_dataclass(cls, dataclass_type):
+        """
+        Spalten und Vorgabewerte aus den Feldern einer Dataclass, z.B. ColumnBuilder.from_dataclass(DataClassEBD)
+        """
+        return cls([f.name for f in fields(dataclass_type)],
+                   {f.name: f.default for f in fields(dataclass_type) if f.default is not MISSING})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def append(self, *values):
+        """
+        Hängt eine Zeile an, die Werte in der Reihenfolge der Spalten
+        """
+        if len(values) != len(self.columns):
+            raise TypeError(f'{len(values)} Werte für {len(self.columns)} Spalten')
+        for column, value in zip(self.columns.values(), values):
+            column.append(intern(value))
+
+    def add(self, **values):
+        """
+        Hängt eine Zeile an. Nicht angegebene Spalten erhalten ihren Vorgabewert.
+        """
+        if not values.keys() <= self.columns.keys():
+            raise TypeError(f'Unbekannte Spalten {sorted(values.keys() - self.columns.keys())}')
+        for name, column in self.columns.items():
+            column.append(intern(values.get(name, self.defaults[name])))
+
+    def fill(self, name, value):
+        """
+        Setzt eine Spalte in allen bisherigen Zeilen auf value
+        """
+        self.columns[name] = [intern(value)] * len(self)
+
+    def clear(self):
+        for column in self.columns.values():
+            column.clear()
+
+    def frame(self, columns=None):
+        """
+        :param columns: dict Spalte -> Spaltenüberschrift, ohne Angabe bleiben die Spaltennamen
+        :return: pd.DataFrame. Ohne Zeilen wie pd.DataFrame([]) ohne Spalten, damit leere Sheets unverändert bleiben.
+        """
+        if len(self) == 0:
+            return pd.DataFrame()
+        df = pd.DataFrame(self.columns)
+        if columns is not None:
+            df.rename(columns=columns, inplace=True)
+        return df
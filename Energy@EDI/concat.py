@@ -1,54 +1,250 @@
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import shutil
 import pandas as pd
+import extract_ahb
+import instrument
+import manifest
+import sink
+
+# Version der Zusammenführung für das Manifest. Muss erhöht werden, wenn sich die erzeugten Dateien ändern.
+VERSION = '1'
+
+# Verzeichnis in _Extractions, in dem die gelesenen Sheets jedes Excel Extraktes als Parquet Dateien
+# zwischengespeichert werden. Für unveränderte Extrakte muss die Excel Datei dann nicht erneut gelesen werden.
+CACHE_DIR = '.concat_cache'
+
+# Dokumententypen MIG/AHB/EBD und die für diese in den Excel Extrakten enthaltenen Sheets
+DOC_SHEETS = {'MIG': ('Segmentlayout', 'Nachrichtenstruktur', 'Segmentlayout_Qual'),
+              'AHB': ('Anwendungsfälle', 'Bedingungen'),
+              'EBD': ('EBD', 'CodeLists')}
+
+def get_sheets(file):
+    """
+    Sheets, die aus einem Excel Extrakt gelesen werden. Die Änderungshistorie ist in allen Extrakten enthalten.
+    """
+    return [sheet for doc_type, sheets in DOC_SHEETS.items() if doc_type in file.stem
+            for sheet in sheets] + ['Änderungshistorie']
 
 
 # neuer kommentar
 
-def write_concat_file(sheet, concat_files, path, doc_type=''):
-    # Tabellen zusammenführen
-    result = pd.concat(concat_files)
-    # Datum und File als Index setzen, damit sie in die ersten beiden Spalten geschrieben werden.
-    # Gleichzeitig den alten, bei der Erstellung der ursprünglichen Excel Dateien übernommenen
-    # Index löschen
-    result = result.set_index(['datum', 'file'])
+def concat_file(sheet, path, doc_type=''):
     if doc_type != '':
         doc_type = doc_type +  '_'
-    new_file = path / 'Zusammenführung' / f'{doc_type}{sheet}.xlsx'
-    result.to_excel(new_file, sheet_name=sheet, merge_cells=False)
+    return path / 'Zusammenführung' / f'{doc_type}{sheet}.xlsx'
+
+def is_up_to_date(concatenated, files, outputs):
+    """
+    Die Zusammenführung ist aktuell, wenn seit dem letzten Lauf keine Excel Extrakte hinzugekommen, entfernt oder
+    geändert wurden und alle zusammengeführten Dateien noch vorhanden sind.
+    :param concatenated: Manifest der Zusammenführung
+    :param files: Excel Extrakte
+    :param outputs: zusammengeführte Dateien
+    """
+    if {concatenated.key(file) for file in files} != set(concatenated.entries):
+        return False
+    if not all(output.exists() for output in outputs):
+        return False
+    return all(concatenated.is_up_to_date(file, VERSION, outputs) for file in files)
+
+def cache_dir(file):
+    return file.parent / CACHE_DIR / file.stem
+
+def load_cached_sheets(file, sheets):
+    """
+    Liest die Sheets eines Excel Extraktes aus dem Cache. Der Cache gilt, solange Größe und Änderungszeitpunkt
+    der Excel Datei gleich sind. Haben sich diese geändert, entscheidet der Hash der Datei.
+    :param file: Excel Extrakt
+    :param sheets: benötigte Sheets
+    :return: dict Sheet -> DataFrame oder None, wenn der Cache nicht passt
+    """
+    key_file = cache_dir(file) / 'key.json'
+    if not key_file.exists():
+        return None
+    with open(key_file, 'r') as f:
+        key = json.load(f)
+    if not set(sheets) <= set(key['sheets']):
+        return None
+
+    stat = file.stat()
+    if key['size'] != stat.st_size or key['mtime_ns'] != stat.st_mtime_ns:
+        if key['hash'] != manifest.file_hash(file):
+            return None
+        # Nur der Änderungszeitpunkt hat sich geändert
+        key.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        with open(key_file, 'w') as f:
+            json.dump(key, f)
+
+    try:
+        return {sheet: pd.read_parquet(cache_dir(file) / f'{sheet}.parquet') for sheet in sheets}
+    except (ImportError, OSError, ValueError) as err:
+        logging.debug(f'Cache für {file} nicht lesbar: {err}')
+        return None
+
+def save_cached_sheets(file, frames):
+    """
+    Speichert die gelesenen Sheets eines Excel Extraktes als Parquet Dateien im Cache.
+    Ohne pyarrow oder wenn eine Spalte nicht als Parquet gespeichert werden kann (z.B. Zahlen und Texte gemischt),
+    wird der Extrakt nicht zwischengespeichert.
+    """
+    stat = file.stat()
+    directory = cache_dir(file)
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+    try:
+        for sheet, df in frames.items():
+            df.to_parquet(directory / f'{sheet}.parquet')
+    except (ImportError, TypeError, ValueError) as err:
+        logging.debug(f'Cache für {file} nicht möglich: {err}')
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+
+    # Der Schlüssel wird zuletzt geschrieben. Fehlt er, gilt der Cache als ungültig.
+    with open(directory / 'key.json', 'w') as f:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': manifest.file_hash(file),
+                   'sheets': list(frames)}, f)
 
-def main():
+def read_sheets(file, sheets):
+    """
+    Liest die Sheets eines Excel Extraktes aus dem Cache oder mit einem einzigen read_excel Aufruf.
+    Wird auch in den Prozessen des ProcessPoolExecutor ausgeführt.
+    :param file: Excel Extrakt
+    :param sheets: Liste der Sheets
+    :return: dict Sheet -> DataFrame
+    """
+    frames = load_cached_sheets(file, sheets)
+    if frames is None:
+        frames = read_excel_sheets(file, sheets)
+        save_cached_sheets(file, frames)
+    return frames
+
+def read_excel_sheets(file, sheets):
+    """
+    Liest die Sheets eines Excel Extraktes. AHB Extrakte im normalisierten Layout enthalten statt des Sheets
+    'Anwendungsfälle' die Elemente und die Bedingungen je PID, aus denen das Sheet aufgebaut wird.
+    :return: dict Sheet -> DataFrame
+    """
+    with pd.ExcelFile(file) as workbook:
+        normalized = extract_ahb.USE_CASE_SHEET in sheets and extract_ahb.USE_CASE_SHEET not in workbook.sheet_names
+        if not normalized:
+            return pd.read_excel(workbook, sheet_name=list(sheets))
+        names = [sheet for sheet in sheets if sheet != extract_ahb.USE_CASE_SHEET]
+        frames = pd.read_excel(workbook, sheet_name=names + [extract_ahb.ELEMENT_SHEET, extract_ahb.PID_SHEET])
+    wide = extract_ahb.wide_use_cases(frames.pop(extract_ahb.ELEMENT_SHEET), frames.pop(extract_ahb.PID_SHEET))
+    return {sheet: wide if sheet == extract_ahb.USE_CASE_SHEET else frames[sheet] for sheet in sheets}
+
+def read_sheets_recorded(file, sheets, memory=False, profile=None):
+    """
+    read_sheets mit Messung von Laufzeit und Spitzenspeicher
+    :param memory: Spitzenspeicher mit tracemalloc messen
+    :param profile: Verzeichnis, in das ein cProfile des Lesens geschrieben wird
+    :return: dict Sheet -> DataFrame, Messwerte der Datei als dict
+    """
+    recorder = instrument.Recorder(memory)
+    with instrument.profiled(profile, f'{sink.release_dir(file).name}_{file.stem}'), instrument.recording(recorder):
+        with instrument.stage('read'):
+            frames = read_sheets(file, sheets)
+    return frames, {'file': str(file), 'stages': recorder.stage_seconds(), 'memory': recorder.stage_memory()}
+
+def read_workbooks(files, sheet_lists, jobs=1, memory=False, profile=None):
+    """
+    Liest die Excel Extrakte seriell (jobs=1) oder parallel in jobs Prozessen
+    :return: Liste mit dict Sheet -> DataFrame in der Reihenfolge der Dateien, Liste der Messwerte je Datei
+    """
+    n = len(files)
+    if jobs <= 1:
+        results = list(map(read_sheets_recorded, files, sheet_lists, [memory] * n, [profile] * n))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(read_sheets_recorded, files, sheet_lists, [memory] * n, [profile] * n))
+    return [frames for frames, _ in results], [record for _, record in results]
+
+def write_concat_file(sheet, concat_files, path, doc_type=''):
+    with instrument.stage('concat'):
+        # Tabellen zusammenführen
+        result = pd.concat(concat_files)
+        # Datum und File als Index setzen, damit sie in die ersten beiden Spalten geschrieben werden.
+        # Gleichzeitig den alten, bei der Erstellung der ursprünglichen Excel Dateien übernommenen
+        # Index löschen
+        result = result.set_index(['datum', 'file'])
+    with instrument.stage('write'):
+        new_file = concat_file(sheet, path, doc_type)
+        result.to_excel(new_file, sheet_name=sheet, merge_cells=False)
+
+def main(jobs=os.cpu_count(), metrics=None, memory=False, profile=None):
+    """
+    :param jobs: Anzahl paralleler Prozesse zum Lesen der Excel Extrakte
+    :param metrics: Datei, in die Laufzeit und Speicher je Extrakt und der Zusammenführung als JSON Lines
+                    geschrieben werden
+    :param memory: Spitzenspeicher je Schritt mit tracemalloc messen
+    :param profile: Verzeichnis für je ein cProfile je Extrakt und der Zusammenführung
+    """
+    recorder = instrument.Recorder(memory)
+    with instrument.profiled(profile, 'Zusammenführung'), instrument.recording(recorder):
+        # Beim seriellen Lesen ist das Lesen bereits in diesem Profil enthalten. Ein zweites cProfile kann
+        # nicht gleichzeitig aktiv sein.
+        records = concat_all(jobs, memory, profile if jobs > 1 else None)
+    if records is None:
+        return
+    records.append({'file': 'Zusammenführung', 'stages': recorder.stage_seconds(),
+                    'memory': recorder.stage_memory()})
+    logging.info('Zusammenführung: ' + ", ".join(f'{stage} {seconds:.2f}s'
+                                                 for stage, seconds in recorder.stage_seconds().items()))
+    if metrics:
+        instrument.write_jsonl(metrics, records)
+
+def concat_all(jobs, memory=False, profile=None):
+    """
+    Führt die Sheets aller Excel Extrakte zusammen
+    :return: Messwerte je Extrakt oder None, wenn die Zusammenführung aktuell ist
+    """
     change_hists = []
     path = Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY')
 
     # Datenstruktur mit den Dokumententype MIG/AHB/EBD und den für diese in den
     # Excel Extrakten enthaltenen Sheets
-    concat_dict = {'MIG': {'Segmentlayout': [],
-                           'Nachrichtenstruktur': [],
-                           'Segmentlayout_Qual': []},
-                   'AHB': {'Anwendungsfälle': [],
-                           'Bedingungen': []},
-                   'EBD': {'EBD': [],
-                           'CodeLists': []}}
+    concat_dict = {doc_type: {sheet: [] for sheet in sheets} for doc_type, sheets in DOC_SHEETS.items()}
 
     # Alle Excel Tabellen in den Extraktions Verzeichnissen
-    for file in path.rglob('_Extractions/*.xlsx'):
-        # Je noch Dokumentenart verschiedenen Sheet zusammenführen
-        for doc_type, file_dict in concat_dict.items():
-            if doc_type in file.stem:
-                for sheet, concat_files in file_dict.items():
-                    # Sheet lesen
-                    df = pd.read_excel(file, sheet_name=sheet)
-                    # Dateiname und Datum aus übergeordneten Ordner als Spalten hinzufügen
-                    df['file'] = file.stem
-                    df['datum'] = file.parent.parent.stem
-                    concat_files.append(df)
-
-        # Änderungshistorie lesen
-        df = pd.read_excel(file, sheet_name='Änderungshistorie')
-        # Dateiname und Datum aus übergeordneten Ordner als Spalten hinzufügen
-        df['file'] = file.stem
-        df['datum'] = file.parent.parent.stem
-        change_hists.append(df)
+    files = list(path.rglob('_Extractions/*.xlsx'))
+
+    # Wenn sich keine der Excel Tabellen geändert hat, muss nichts zusammengeführt werden
+    concatenated = manifest.Manifest(path)
+    outputs = [concat_file('Änderungshistorie', path)] + [concat_file(sheet, path, doc_type)
+                                                          for doc_type, file_dict in concat_dict.items()
+                                                          for sheet in file_dict]
+    if is_up_to_date(concatenated, files, outputs):
+        logging.info('Zusammenführung ist aktuell')
+        return None
+
+    # Alle benötigten Sheets einer Datei werden in einem Aufruf gelesen, die Dateien parallel
+    with instrument.stage('read'):
+        workbooks, records = read_workbooks(files, [get_sheets(file) for file in files], jobs, memory, profile)
+
+    with instrument.stage('concat'):
+        for file, frames in zip(files, workbooks):
+            # Je noch Dokumentenart verschiedenen Sheet zusammenführen
+            for doc_type, file_dict in concat_dict.items():
+                if doc_type in file.stem:
+                    for sheet, concat_files in file_dict.items():
+                        # Sheet lesen
+                        df = frames[sheet]
+                        # Dateiname und Datum aus übergeordneten Ordner als Spalten hinzufügen
+                        df['file'] = file.stem
+                        df['datum'] = file.parent.parent.stem
+                        concat_files.append(df)
+
+            # Änderungshistorie lesen
+            df = frames['Änderungshistorie']
+            # Dateiname und Datum aus übergeordneten Ordner als Spalten hinzufügen
+            df['file'] = file.stem
+            df['datum'] = file.parent.parent.stem
+            change_hists.append(df)
 
     # Die Änderungshistorien liegen in diversen Dokumentenarten vor (AHB,MIG, EBD ...) vor. Sie werden hier in eine
     # Excel zusammengeführt.
@@ -58,5 +254,18 @@ def main():
         for sheet, concat_files in file_dict.items():
             write_concat_file(sheet, concat_files, path, doc_type=doc_type)
 
+    concatenated.entries = {}
+    for file in files:
+        concatenated.record(file, VERSION, outputs)
+    concatenated.save()
+    return records
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Zusammenführung der Excel Extrakte aller Releases')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Anzahl paralleler Prozesse')
+    parser.add_argument('--metrics', type=Path, help='Laufzeit und Speicher als JSON Lines speichern')
+    parser.add_argument('--memory', action='store_true', help='Spitzenspeicher je Schritt messen')
+    parser.add_argument('--profile', type=Path, help='cProfile je Extrakt in diesem Verzeichnis speichern')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    main(args.jobs, args.metrics, args.memory, args.profile)
\ No newline at end of file
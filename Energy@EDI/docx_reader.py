@@ -0,0 +1,432 @@
+"""
+Liest Word Dokumente (.docx) direkt, ohne Word und ohne den Umweg über den HTML Export von Word.
+
+word/document.xml wird mit iterparse aus dem Zip Archiv gestreamt. Jeder Absatz und jede Tabelle auf oberster
+Ebene wird, sobald sie vollständig gelesen ist, in HTML übersetzt und danach verworfen. Das erzeugte HTML hat
+den Aufbau, den die Extraktoren vom HTML Export von Word kennen:
+
+- Überschriften (Formatvorlagen 'heading 1' ... 'heading 6') als h1 ... h6, mit Nummerierung aus numbering.xml
+- Absätze als p mit margin-left (Einzug in pt), Fettdruck als <b><span>, Schriftfarbe als color
+  (die 16 HTML Grundfarben mit Namen, z.B. gray, sonst #RRGGBB)
+- Tabellenzellen als td mit background (Schattierung), rowspan (vertikal verbundene Zellen) und colspan
+- Tabulatoren als geschützte Leerzeichen bis zum nächsten Tabstopp
+
+Wie beim HTML Export von Word werden nur direkte Formatierungen (und Zeichenformatvorlagen für Fettdruck)
+als Style ausgegeben, nicht die Formatierungen der Absatzformatvorlagen.
+"""
+from dataclasses import dataclass, field
+from html import escape
+from pathlib import Path
+import xml.etree.ElementTree as ET
+import zipfile
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# Word misst Einzüge und Tabstopps in twips (1/20 pt)
+TWIPS_PER_PT = 20
+# Angenommene mittlere Zeichenbreite, um Tabstopps in Zeichenpositionen umzurechnen
+TWIPS_PER_CHAR = 100
+# Standard Tabstopp von Word (1,25 cm), wenn der Absatz keine eigenen Tabstopps hat
+DEFAULT_TAB_STOP = 708
+# extract_ahb trennt Token an Folgen von mindestens drei Leerzeichen. Ein Tabulator wird daher
+# durch mindestens so viele Leerzeichen ersetzt.
+MIN_TAB_SPACES = 3
+
+# Farben, die Word im HTML Export mit Namen schreibt
+COLOR_NAMES = {
+    '000000': 'black', '808080': 'gray', 'C0C0C0': 'silver', 'FFFFFF': 'white',
+    '800000': 'maroon', 'FF0000': 'red', '800080': 'purple', 'FF00FF': 'fuchsia',
+    '008000': 'green', '00FF00': 'lime', '808000': 'olive', 'FFFF00': 'yellow',
+    '000080': 'navy', '0000FF': 'blue', '008080': 'teal', '00FFFF': 'aqua',
+}
+
+# Teile eines Absatzes, deren Text nicht angezeigt wird (gelöschter Text, Formatierungen, Kommentare)
+SKIPPED = {W + 'pPr', W + 'rPr', W + 'del', W + 'moveFrom', W + 'commentRangeStart', W + 'commentRangeEnd',
+           W + 'proofErr', W + 'bookmarkStart', W + 'bookmarkEnd'}
+
+HEADER = ("<html>\n<head>\n<meta http-equiv=Content-Type content='text/html; charset=utf-8'>\n</head>\n"
+          "<body lang=DE>\n<div class=WordSection1>\n")
+FOOTER = "</div>\n</body>\n</html>\n"
+
+def attr(elem, name, default=None):
+    if elem is None:
+        return default
+    return elem.get(W + name, default)
+
+def is_on(elem):
+    """
+    Schalter wie <w:b/>, <w:b w:val="0"/> oder <w:b w:val="false"/>
+    """
+    return elem is not None and attr(elem, 'val', 'true') not in ('0', 'false', 'off')
+
+def css_color(value):
+    """
+    Word Farbwert (RRGGBB oder 'auto') als CSS Farbe, wie sie der HTML Export von Word schreibt
+    :return: z.B. 'gray' oder '#D8DFE4', None bei 'auto'
+    """
+    if value is None or value == 'auto':
+        return None
+    value = value.upper()
+    return COLOR_NAMES.get(value, f'#{value}')
+
+def format_pt(twips):
+    return f'{int(twips) / TWIPS_PER_PT:g}pt'
+
+@dataclass
+class DataClassStyle:
+    based_on: str = None
+    # Ebene der Überschrift (1 ... 6), 0 wenn die Formatvorlage keine Überschrift ist
+    heading: int = 0
+    bold: bool = None
+    num_id: str = None
+    ilvl: str = None
+
+@dataclass
+class DataClassNumberingLevel:
+    fmt: str = 'decimal'
+    text: str = ''
+    start: int = 1
+
+def to_roman(number):
+    result = ''
+    for value, letters in ((1000, 'm'), (900, 'cm'), (500, 'd'), (400, 'cd'), (100, 'c'), (90, 'xc'), (50, 'l'),
+                           (40, 'xl'), (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i')):
+        while number >= value:
+            result += letters
+            number -= value
+    return result
+
+def format_number(number, fmt):
+    match fmt:
+        case 'decimal':
+            return str(number)
+        case 'lowerLetter':
+            return chr(ord('a') + (number - 1) % 26)
+        case 'upperLetter':
+            return chr(ord('A') + (number - 1) % 26)
+        case 'lowerRoman':
+            return to_roman(number)
+        case 'upperRoman':
+            return to_roman(number).upper()
+        case _:
+            return ''
+
+class Numbering:
+    """
+    Nummerierung der Absätze aus word/numbering.xml. Die Zähler laufen in Dokumentreihenfolge mit.
+    Aufzählungszeichen (bullet) erzeugen keinen Text.
+    """
+    def __init__(self, root=None):
+        abstract = {}
+        self.nums = {}
+        if root is not None:
+            for abstract_num in root.iter(W + 'abstractNum'):
+                levels = {}
+                for lvl in abstract_num.iter(W + 'lvl'):
+                    levels[attr(lvl, 'ilvl')] = DataClassNumberingLevel(
+                        fmt=attr(lvl.find(W + 'numFmt'), 'val', 'decimal'),
+                        text=attr(lvl.find(W + 'lvlText'), 'val', ''),
+                        start=int(attr(lvl.find(W + 'start'), 'val', 1)))
+                abstract[attr(abstract_num, 'abstractNumId')] = levels
+            for num in root.iter(W + 'num'):
+                self.nums[attr(num, 'numId')] = (attr(num.find(W + 'abstractNumId'), 'val'),
+                                                  abstract.get(attr(num.find(W + 'abstractNumId'), 'val'), {}))
+        # Zähler je abstractNumId und Ebene
+        self.counters = {}
+
+    def label(self, num_id, ilvl):
+        """
+        Zählt die Ebene ilvl der Liste num_id weiter und liefert den Text der Nummer, z.B. '3.2'
+        """
+        if num_id not in self.nums:
+            return ''
+        abstract_id, levels = self.nums[num_id]
+        level = int(ilvl or 0)
+        counters = self.counters.setdefault(abstract_id, {})
+        current = levels.get(str(level), DataClassNumberingLevel())
+        counters[level] = counters.get(level, current.start - 1) + 1
+        for deeper in [key for key in counters if key > level]:
+            del counters[deeper]
+        if current.fmt in ('bullet', 'none'):
+            return ''
+
+        text = current.text
+        for n in range(level + 1):
+            lvl = levels.get(str(n), DataClassNumberingLevel())
+            text = text.replace(f'%{n + 1}', format_number(counters.get(n, lvl.start), lvl.fmt))
+        return text
+
+def read_styles(root):
+    """
+    Formatvorlagen aus word/styles.xml. Eigenschaften werden über basedOn aufgelöst.
+    :return: dict styleId -> DataClassStyle
+    """
+    styles = {}
+    if root is None:
+        return styles
+    for style in root.iter(W + 'style'):
+        entry = DataClassStyle(based_on=attr(style.find(W + 'basedOn'), 'val'))
+        name = attr(style.find(W + 'name'), 'val', '').lower()
+        if name.startswith('heading ') and name[8:].isdigit() and 1 <= int(name[8:]) <= 6:
+            entry.heading = int(name[8:])
+        r_pr = style.find(W + 'rPr')
+        if r_pr is not None and r_pr.find(W + 'b') is not None:
+            entry.bold = is_on(r_pr.find(W + 'b'))
+        num_pr = style.find(f'{W}pPr/{W}numPr')
+        if num_pr is not None:
+            entry.num_id = attr(num_pr.find(W + 'numId'), 'val')
+            entry.ilvl = attr(num_pr.find(W + 'ilvl'), 'val')
+        styles[attr(style, 'styleId')] = entry
+
+    def resolve(style_id, seen=()):
+        entry = styles[style_id]
+        if entry.based_on in styles and entry.based_on not in seen:
+            parent = resolve(entry.based_on, seen + (style_id,))
+            if entry.bold is None:
+                entry.bold = parent.bold
+            if entry.num_id is None:
+                entry.num_id, entry.ilvl = parent.num_id, parent.ilvl
+        return entry
+
+    for style_id in styles:
+        resolve(style_id)
+    return styles
+
+@dataclass
+class DataClassDocxContext:
+    styles: dict = field(default_factory=dict)
+    numbering: Numbering = field(default_factory=Numbering)
+
+def read_part(archive, name):
+    """
+    Liest einen kleinen Teil des Archivs (Formatvorlagen, Nummerierung) vollständig
+    :return: Wurzelelement oder None, wenn das Dokument den Teil nicht enthält
+    """
+    try:
+        with archive.open(name) as f:
+            return ET.parse(f).getroot()
+    except KeyError:
+        return None
+
+def get_tab_stops(p_pr):
+    if p_pr is None:
+        return []
+    return sorted(int(attr(tab, 'pos')) for tab in p_pr.iterfind(f'{W}tabs/{W}tab')
+                  if attr(tab, 'val') != 'clear' and attr(tab, 'pos') is not None)
+
+def expand_tab(column, tab_stops):
+    """
+    Anzahl Leerzeichen für einen Tabulator an der Zeichenposition column
+    """
+    position = column * TWIPS_PER_CHAR
+    stop = next((s for s in tab_stops if s > position), None)
+    if stop is None:
+        stop = (position // DEFAULT_TAB_STOP + 1) * DEFAULT_TAB_STOP
+    return max(MIN_TAB_SPACES, round((stop - position) / TWIPS_PER_CHAR))
+
+def iter_runs(elem):
+    """
+    Runs eines Absatzes in Dokumentreihenfolge, auch innerhalb von Hyperlinks, Einfügungen und Feldern
+    """
+    for child in elem:
+        if child.tag == W + 'r':
+            yield child
+        elif child.tag not in SKIPPED:
+            yield from iter_runs(child)
+
+def paragraph_html(p, context):
+    """
+    Übersetzt einen Absatz (w:p) in h1 ... h6 oder p
+    """
+    p_pr = p.find(W + 'pPr')
+    style = context.styles.get(attr(p_pr.find(W + 'pStyle') if p_pr is not None else None, 'val'),
+                               DataClassStyle())
+    tag = f'h{style.heading}' if style.heading else 'p'
+
+    styles = []
+    ind = p_pr.find(W + 'ind') if p_pr is not None else None
+    left = attr(ind, 'left', attr(ind, 'start'))
+    if left is not None:
+        styles.append(f'margin-left:{format_pt(left)}')
+
+    num_pr = p_pr.find(W + 'numPr') if p_pr is not None else None
+    num_id, ilvl = style.num_id, style.ilvl
+    if num_pr is not None:
+        num_id = attr(num_pr.find(W + 'numId'), 'val', num_id)
+        ilvl = attr(num_pr.find(W + 'ilvl'), 'val', ilvl)
+    label = context.numbering.label(num_id, ilvl) if num_id not in (None, '0') else ''
+
+    # Aufeinanderfolgende Runs mit gleicher Formatierung werden wie im HTML Export von Word
+    # in einem Span zusammengefasst
+    spans = []
+    column = 0
+    tab_stops = get_tab_stops(p_pr)
+    if label:
+        spans.append([(False, None), escape(label) + '\xa0' * MIN_TAB_SPACES])
+        column += len(label) + MIN_TAB_SPACES
+    for run in iter_runs(p):
+        r_pr = run.find(W + 'rPr')
+        bold = None
+        if r_pr is not None:
+            r_style = context.styles.get(attr(r_pr.find(W + 'rStyle'), 'val'))
+            if r_style is not None and r_style.bold is not None:
+                bold = r_style.bold
+            if r_pr.find(W + 'b') is not None:
+                bold = is_on(r_pr.find(W + 'b'))
+        color = css_color(attr(r_pr.find(W + 'color') if r_pr is not None else None, 'val'))
+
+        parts = []
+        for item in run:
+            match item.tag.removeprefix(W):
+                case 't':
+                    parts.append(escape(item.text or '', quote=False))
+                    column += len(item.text or '')
+                case 'tab':
+                    spaces = expand_tab(column, tab_stops)
+                    parts.append('\xa0' * spaces)
+                    column += spaces
+                case 'br' | 'cr':
+                    parts.append('<br>\n')
+                    column = 0
+                case 'noBreakHyphen':
+                    parts.append('-')
+                    column += 1
+        if not parts:
+            continue
+        if spans and spans[-1][0] == (bool(bold), color):
+            spans[-1][1] += "".join(parts)
+        else:
+            spans.append([(bool(bold), color), "".join(parts)])
+
+    html = []
+    for (bold, color), text in spans:
+        span = f"<span style='color:{color}'>{text}</span>" if color else f'<span>{text}</span>'
+        html.append(f'<b>{span}</b>' if bold else span)
+    if not html:
+        # Leere Absätze enthalten im HTML Export von Word ein geschütztes Leerzeichen
+        html.append('\xa0')
+
+    style_attr = f" style='{';'.join(styles)}'" if styles else ''
+    css_class = ' class=MsoNormal' if tag == 'p' else ''
+    return f'<{tag}{css_class}{style_attr}>{"".join(html)}</{tag}>\n'
+
+def cell_background(tc_pr, default=None):
+    shd = tc_pr.find(W + 'shd') if tc_pr is not None else None
+    if shd is None:
+        return default
+    if attr(shd, 'val') == 'solid':
+        return css_color(attr(shd, 'color'))
+    return css_color(attr(shd, 'fill'))
+
+@dataclass
+class DataClassCell:
+    elem: object = None
+    column: int = 0
+    colspan: int = 1
+    rowspan: int = 1
+    # Fortsetzung einer vertikal verbundenen Zelle, wird nicht ausgegeben
+    merged: bool = False
+
+def table_html(tbl, context):
+    """
+    Übersetzt eine Tabelle (w:tbl) einschließlich verschachtelter Tabellen. Vertikal verbundene Zellen
+    (w:vMerge) werden zu einer Zelle mit rowspan.
+    """
+    default_background = cell_background(tbl.find(W + 'tblPr'))
+    rows = []
+    # Zuletzt begonnene verbundene Zelle je Spalte
+    open_merges = {}
+    for tr in tbl.iterfind(W + 'tr'):
+        cells = []
+        column = int(attr(tr.find(f'{W}trPr/{W}gridBefore'), 'val', 0))
+        for tc in tr.iterfind(W + 'tc'):
+            tc_pr = tc.find(W + 'tcPr')
+            cell = DataClassCell(elem=tc, column=column,
+                                 colspan=int(attr(tc_pr.find(W + 'gridSpan') if tc_pr is not None else None,
+                                                  'val', 1)))
+            v_merge = tc_pr.find(W + 'vMerge') if tc_pr is not None else None
+            if v_merge is not None and attr(v_merge, 'val', 'continue') == 'continue' and column in open_merges:
+                cell.merged = True
+                open_merges[column].rowspan += 1
+            elif v_merge is not None:
+                open_merges[column] = cell
+            else:
+                open_merges.pop(column, None)
+            cells.append(cell)
+            column += cell.colspan
+        rows.append(cells)
+
+    html = ["<table class=MsoNormalTable border=1 cellspacing=0 cellpadding=0>\n"]
+    for cells in rows:
+        html.append('<tr>\n')
+        for cell in filter(lambda c: not c.merged, cells):
+            tc_pr = cell.elem.find(W + 'tcPr')
+            span = f' rowspan={cell.rowspan}' if cell.rowspan != 1 else ''
+            span += f' colspan={cell.colspan}' if cell.colspan != 1 else ''
+            background = cell_background(tc_pr, default_background)
+            style_attr = f" style='background:{background}'" if background else ''
+            html.append(f'<td valign=top{span}{style_attr}>\n')
+            html.extend(block_html(child, context) for child in cell.elem if child.tag != W + 'tcPr')
+            html.append('</td>\n')
+        html.append('</tr>\n')
+    html.append('</table>\n')
+    return "".join(html)
+
+def block_html(elem, context):
+    """
+    Übersetzt ein Element auf Blockebene (Absatz, Tabelle, Inhaltssteuerelement)
+    """
+    match elem.tag.removeprefix(W):
+        case 'p':
+            return paragraph_html(elem, context)
+        case 'tbl':
+            return table_html(elem, context)
+        case 'sdt':
+            content = elem.find(W + 'sdtContent')
+            return "".join(block_html(child, context) for child in content) if content is not None else ''
+        case _:
+            return ''
+
+def iter_html(path):
+    """
+    Liefert das HTML eines Word Dokumentes stückweise: Kopf, je ein Stück für jeden Absatz und jede Tabelle
+    auf oberster Ebene, Ende. Es wird immer nur ein Element der obersten Ebene im Speicher gehalten.
+    :param path: .docx Datei
+    """
+    with zipfile.ZipFile(path) as archive:
+        context = DataClassDocxContext(styles=read_styles(read_part(archive, 'word/styles.xml')),
+                                       numbering=Numbering(read_part(archive, 'word/numbering.xml')))
+        yield HEADER
+        depth = 0
+        body = None
+        with archive.open('word/document.xml') as f:
+            for event, elem in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 2 and elem.tag == W + 'body':
+                        body = elem
+                    continue
+                depth -= 1
+                if depth == 2 and body is not None:
+                    # Element direkt unterhalb von w:body ist vollständig gelesen
+                    yield block_html(elem, context)
+                    body.remove(elem)
+        yield FOOTER
+
+def read_docx(path):
+    """
+    HTML eines Word Dokumentes, wie es util.parse_html erwartet
+    :param path: .docx Datei
+    :return: str
+    """
+    return "".join(iter_html(path))
+
+def write_html(source, target):
+    """
+    Schreibt das HTML eines Word Dokumentes in eine Datei (Ersatz für den HTML Export von Word)
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        for chunk in iter_html(source):
+            f.write(chunk)
@@ -1,74 +1,249 @@
-import subprocess
+"""
+Konvertierung der Word Dokumente (.docx) eines Releases in HTML Dateien in <Release>/_Extractions.
+
+Die Dokumente werden als Aufträge (DataClassConversionJob) in eine Warteschlange gestellt und von einer
+begrenzten Anzahl Worker Threads abgearbeitet. Jeder Auftrag bekommt ein eigenes Arbeitsverzeichnis,
+in das das Dokument kopiert und in dem das HTML erzeugt wird. Erst nach erfolgreicher Konvertierung wird das
+HTML in das Zielverzeichnis übernommen.
+
+Wie konvertiert wird, bestimmt der Konverter:
+
+word:        Word über die mit Apple Script erzeugte App (nur macOS). Das Word Makro liest immer temp.docx
+             und schreibt temp.html, deshalb wird immer nur ein Dokument gleichzeitig konvertiert.
+libreoffice: LibreOffice ohne Oberfläche, jeder Auftrag mit eigenem Benutzerprofil
+native:      docx_reader, ohne externes Programm
+fake:        kopiert in einem eigenen Prozess ein minimales HTML, zum Testen der Warteschlange
+
+Ob ein Auftrag fertig ist, ergibt sich aus dem Ende des Konverter Prozesses und seinem Exit Status. Nur bei Word
+endet der Prozess (die Apple Script App) vor dem Schreiben des HTML, dort wird auf die fertige Datei gewartet.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+import argparse
+import logging
+import os
 import shutil
+import subprocess
+import sys
+import tempfile
 import time
-import os
+import docx_reader
+import sink
 
 # work_dir = Path('/EDI@ENERGY/EDI_ENERGY/temp')
 work_dir = Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/temp')
+WORD_APP = Path('../docx_to_html.app')
+
+# Sekunden, die eine einzelne Konvertierung höchstens dauern darf
+TIMEOUT = 120
+
+# Word schreibt temp.html erst nach dem Ende der App. Fertig ist die Datei, wenn sie nicht leer ist und sich ihre
+# Größe STABLE_SECONDS lang nicht mehr geändert hat. Geprüft wird alle POLL_SECONDS Sekunden.
+STABLE_SECONDS = 3
+POLL_SECONDS = 0.5
 
-def run_word(source, target_dir):
-    # in dem Working Directory wird jede PDF Datei nach temp.kopiert und dann
-    # ein mit APPLE Script erzeugt APP aufgerufen, die ein Word-Macro aufruft.
-    # Das Word Macro offnet die temp.pdf Datei und speichert sie unter temp.html
-    # wieder ab. Danach wird temp.html
+@dataclass
+class DataClassConversionJob:
+    source: Path = None
+    # HTML Datei in <Release>/_Extractions
+    target: Path = None
 
-    DUMMY_TEXT = 'ist leer'
-    temp_docx = work_dir / 'temp.docx'
-    temp_html = work_dir / 'temp.html'
+@dataclass
+class DataClassConversionResult:
+    source: Path = None
+    target: Path = None
+    ok: bool = True
+    error: str = ""
+    duration: float = 0.0
 
-    shutil.copy(source, temp_docx)
+class ConversionError(Exception):
+    pass
 
-    with open(temp_html, 'w') as f:
-        data = DUMMY_TEXT
-        f.write(data)
+def run_process(args, timeout=TIMEOUT, **kwargs):
+    """
+    Startet den Konverter Prozess und wartet auf sein Ende
+    :raise ConversionError: bei Exit Status ungleich 0 oder Zeitüberschreitung
+    """
+    try:
+        completed = subprocess.run(args, capture_output=True, text=True, timeout=timeout, **kwargs)
+    except subprocess.TimeoutExpired:
+        raise ConversionError(f'{args[0]} nach {timeout}s abgebrochen')
+    if completed.returncode != 0:
+        raise ConversionError(f'{args[0]} beendet mit Status {completed.returncode}: {completed.stderr.strip()}')
 
-    subprocess.run(["open", "../docx_to_html.app"])
+def wait_for_file(path, timeout=TIMEOUT, stable=STABLE_SECONDS, poll=POLL_SECONDS):
+    """
+    Wartet, bis die Datei nicht leer ist und sich ihre Größe stable Sekunden lang nicht geändert hat
+    :return: Größe der Datei
+    :raise ConversionError: wenn die Datei nach timeout Sekunden nicht fertig ist
+    """
+    deadline = time.monotonic() + timeout
+    size = 0
+    since = time.monotonic()
+    while True:
+        now = time.monotonic()
+        current = path.stat().st_size if path.exists() else 0
+        if current != size:
+            size = current
+            since = now
+        elif size > 0 and now - since >= stable:
+            return size
+        if now >= deadline:
+            raise ConversionError(f'{path.name} nach {timeout}s nicht fertig geschrieben ({size} Bytes)')
+        time.sleep(poll)
 
-    # Subprocess wird beim Aufruf der APP beendet, wenn der Launcher fertig ist und nicht wenn
-    # Word beendet ist.
-    # Deshalb wird hier geprüft, ob Word die Datei geschrieben hat.
-    # temp.html muss aber schon vor Aufruf von Word vorhanden sein, weil es
-    # sonst ein Berechtigungs Problem gibt. Dieses tritt nur auf, wenn das
-    # Word Macro über die Apple-Script APP gestartet wird.
-    file_filled = False
-    for _ in range(120):
+class WordAppConverter:
+    name = 'word'
+    max_workers = 1
+
+    def __init__(self, work_dir=work_dir, app=WORD_APP, timeout=TIMEOUT, stable=STABLE_SECONDS):
+        self.work_dir = Path(work_dir)
+        self.app = app
+        self.timeout = timeout
+        self.stable = stable
+
+    def convert(self, source, job_dir):
+        temp_docx = self.work_dir / 'temp.docx'
+        temp_html = self.work_dir / 'temp.html'
+        shutil.copy(source, temp_docx)
+        # temp.html muss schon vor Aufruf von Word vorhanden sein, weil es sonst ein Berechtigungs Problem gibt.
+        # Dieses tritt nur auf, wenn das Word Macro über die Apple-Script APP gestartet wird.
+        temp_html.write_bytes(b'')
         try:
-            with open(temp_html, 'r') as f:
-                data = f.read()
-            if data == DUMMY_TEXT:
-                time.sleep(1)
-            else:
-                file_filled = True
-                break
-        except UnicodeDecodeError:
-            file_filled = True
-            break
-
-    if file_filled == False:
-        raise Exception(f"PDF {source.name} konnte nicht in HTML konvertiert werden.")
-
-    time.sleep(3)
-    target_file = source.stem + '.HTML'
-    target = target_dir / target_file
-
-    os.makedirs(os.path.dirname(target), exist_ok=True)
-    shutil.copy(temp_html, target)
-    temp_html.unlink()
-    temp_docx.unlink()
+            # open -W wartet nur auf den Apple Script Launcher, nicht auf Word. Fertig ist die Konvertierung erst,
+            # wenn Word temp.html vollständig geschrieben hat.
+            start = time.monotonic()
+            run_process(['open', '-W', str(self.app)], self.timeout)
+            try:
+                wait_for_file(temp_html, max(0.0, self.timeout - (time.monotonic() - start)), self.stable)
+            except ConversionError as err:
+                raise ConversionError(f'Word hat {source.name} nicht in HTML konvertiert: {err}')
+            html = job_dir / f'{source.stem}.html'
+            shutil.move(temp_html, html)
+            return html
+        finally:
+            temp_docx.unlink(missing_ok=True)
+            temp_html.unlink(missing_ok=True)
+
+class LibreOfficeConverter:
+    name = 'libreoffice'
+    max_workers = os.cpu_count()
+
+    def __init__(self, program='soffice', timeout=TIMEOUT):
+        self.program = program
+        self.timeout = timeout
+
+    def convert(self, source, job_dir):
+        # Ein eigenes Benutzerprofil je Auftrag, damit mehrere Instanzen parallel laufen können
+        profile = (job_dir / 'profile').as_uri()
+        run_process([self.program, f'-env:UserInstallation={profile}', '--headless', '--convert-to', 'html',
+                     '--outdir', str(job_dir), str(source)], self.timeout)
+        return job_dir / f'{source.stem}.html'
+
+class NativeConverter:
+    name = 'native'
+    max_workers = os.cpu_count()
+
+    def convert(self, source, job_dir):
+        html = job_dir / f'{source.stem}.html'
+        docx_reader.write_html(source, html)
+        return html
+
+class FakeConverter:
+    """
+    Schreibt nach delay Sekunden ein minimales HTML mit dem Namen des Dokumentes. Dokumente, deren Name
+    in fail steht, enden mit Exit Status 1.
+    """
+    name = 'fake'
+    # Der Fake Konverter wartet nur, die Anzahl paralleler Aufträge ist daher nicht durch die Prozessoren begrenzt
+    max_workers = None
+
+    def __init__(self, delay=0.0, fail=(), timeout=TIMEOUT):
+        self.delay = delay
+        self.fail = set(fail)
+        self.timeout = timeout
+
+    def convert(self, source, job_dir):
+        html = job_dir / f'{source.stem}.html'
+        script = ('import sys, time\n'
+                  'time.sleep(float(sys.argv[1]))\n'
+                  'if sys.argv[4] == "1":\n'
+                  '    sys.exit("Konvertierung fehlgeschlagen")\n'
+                  'open(sys.argv[3], "w").write(f"<html><body><p>{sys.argv[2]}</p></body></html>")\n')
+        run_process([sys.executable, '-c', script, str(self.delay), source.name, str(html),
+                     '1' if source.name in self.fail else '0'], self.timeout)
+        return html
+
+CONVERTERS = {'word': WordAppConverter, 'libreoffice': LibreOfficeConverter, 'native': NativeConverter,
+              'fake': FakeConverter}
+
+def run_job(job, converter, work_root=None):
+    """
+    Konvertiert ein Dokument in einem eigenen Arbeitsverzeichnis und übernimmt das HTML in das Ziel
+    :param job: DataClassConversionJob
+    :param converter: Konverter, z.B. NativeConverter()
+    :param work_root: Verzeichnis, unter dem die Arbeitsverzeichnisse angelegt werden (Standard temp)
+    :return: DataClassConversionResult
+    """
+    result = DataClassConversionResult(source=job.source, target=job.target)
+    start = time.perf_counter()
+    job_dir = Path(tempfile.mkdtemp(prefix=f'{job.source.stem[:40]}_', dir=work_root))
+    try:
+        source = job_dir / job.source.name
+        shutil.copy(job.source, source)
+        html = converter.convert(source, job_dir)
+        if not html.exists():
+            raise ConversionError(f'{converter.name} hat keine HTML Datei erzeugt')
+        job.target.parent.mkdir(parents=True, exist_ok=True)
+        part = job.target.with_name(job.target.name + '.part')
+        shutil.copy(html, part)
+        os.replace(part, job.target)
+    except Exception as err:
+        result.ok = False
+        result.error = f'{type(err).__name__}: {err}'
+        logging.error(f'{job.source.name}: {result.error}')
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+    result.duration = time.perf_counter() - start
+    return result
+
+def convert_all(jobs, converter, workers=os.cpu_count(), work_root=None):
+    """
+    Arbeitet die Aufträge mit höchstens workers parallelen Konvertierungen ab
+    (bzw. so vielen, wie der Konverter erlaubt, max_workers None = unbegrenzt)
+    :param jobs: Liste der DataClassConversionJob
+    :return: Liste der DataClassConversionResult in der Reihenfolge der Aufträge
+    """
+    workers = max(1, min(workers, converter.max_workers or workers))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: run_job(job, converter, work_root), jobs))
+
+def release_jobs(path):
+    """
+    Aufträge für alle Word Dokumente eines Release Verzeichnisses
+    """
+    target = path / sink.EXTRACTIONS_DIR
+    return [DataClassConversionJob(source=file, target=target / f'{file.stem}.HTML')
+            for file in path.rglob('*.docx') if not file.name.startswith('~$')]
 
 def main():
-    paths = list()
-    #paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20221001'))
-    #paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230401'))
-    paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20231001'))
-
-    for path in paths:
-        target = path / '_Extractions'
-        file_list = path.rglob('*.docx')
-        for file in file_list:
-            source = file.parent / file.name
-            run_word(source, target)
+    parser = argparse.ArgumentParser(description='Word Dokumente eines oder mehrerer Releases in HTML konvertieren')
+    parser.add_argument('paths', nargs='*', type=Path,
+                        default=[Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20231001')],
+                        help='Release Verzeichnisse')
+    parser.add_argument('--converter', choices=CONVERTERS, default='word', help='Konverter')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Anzahl paralleler Konvertierungen')
+    parser.add_argument('--work-dir', type=Path, help='Verzeichnis für die Arbeitsverzeichnisse der Aufträge')
+    args = parser.parse_args()
+
+    jobs = [job for path in args.paths for job in release_jobs(path)]
+    results = convert_all(jobs, CONVERTERS[args.converter](), args.jobs, args.work_dir)
+    failed = [r for r in results if not r.ok]
+    print(f'{len(results) - len(failed)} Dokumente konvertiert, {len(failed)} fehlerhaft')
+    for r in failed:
+        print(f'  {r.source}: {r.error}')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    logging.basicConfig(level=logging.ERROR)
+    main()
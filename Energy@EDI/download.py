@@ -1,12 +1,139 @@
 # # für den Download folgendermaßen vorgehen
 #import urllib.request
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+import numpy as np
 import pandas as pd
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+import gzip
+import json
+import logging
+import os
 import re
+import threading
+
+BASE_URL = 'https://www.edi-energy.de'
+
+# Anzahl paralleler Anfragen an den Server
+JOBS = 8
+# Sekunden bis Verbindungsaufbau bzw. bis zur nächsten Antwort des Servers
+TIMEOUT = (10, 60)
+CHUNK_SIZE = 1024 * 1024
+
+# Datei im Release Verzeichnis, in der ETag, Last-Modified und Länge der heruntergeladenen Dokumente stehen
+CACHE_NAME = '.download_cache.json'
+
+# Ansichten auf edi-energy.de
+VIEWS = ('now', 'future', 'archive')
+# Ein Verzeichnis Snapshot wird so lange verwendet, bevor das Verzeichnis erneut gelesen wird
+SNAPSHOT_TTL = timedelta(hours=12)
+# Gültig bis 'Offen'
+OPEN_END = date(9999, 12, 31)
+
+def create_session(retries=5, backoff_factor=0.5, pool_size=JOBS):
+    """
+    Session mit Connection Pool und Wiederholung fehlgeschlagener Anfragen (mit exponentiell wachsender Wartezeit)
+    :param retries: maximale Anzahl Wiederholungen je Anfrage
+    :param backoff_factor: Wartezeit vor der n-ten Wiederholung backoff_factor * 2^(n-1) Sekunden
+    :param pool_size: Anzahl Verbindungen, die offen gehalten werden
+    :return: requests.Session
+    """
+    retry = Retry(total=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('HEAD', 'GET', 'POST'))
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+@dataclass
+class DataClassDownloadResult:
+    url: str = ""
+    path: Path = None
+    ok: bool = True
+    error: str = ""
+    # Anzahl übertragener Bytes
+    size: int = 0
+    # Dokument ist laut Server unverändert (304) und wurde nicht erneut übertragen
+    skipped: bool = False
+    # Ein abgebrochener Download wurde fortgesetzt
+    resumed: bool = False
+
+@dataclass
+class DataClassCacheEntry:
+    etag: str = ""
+    last_modified: str = ""
+    # Länge des vollständigen Dokumentes, -1 wenn der Server keine Länge liefert
+    content_length: int = -1
+    # Pfad relativ zum Release Verzeichnis
+    path: str = ""
+    # False, solange der Download noch nicht abgeschlossen ist (.part Datei)
+    complete: bool = False
+
+class DownloadCache:
+    """
+    HTTP Metadaten der heruntergeladenen Dokumente eines Release Verzeichnisses, je URL.
+    Damit werden unveränderte Dokumente mit bedingten Anfragen (If-None-Match, If-Modified-Since) erkannt und
+    abgebrochene Downloads mit Range Anfragen fortgesetzt. Wird von mehreren Download Threads verwendet.
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.file = self.directory / CACHE_NAME
+        self.entries = {}
+        self.lock = threading.Lock()
+        if self.file.exists():
+            with open(self.file, 'r') as f:
+                self.entries = {url: DataClassCacheEntry(**entry) for url, entry in json.load(f).items()}
+
+    def get(self, url):
+        with self.lock:
+            return self.entries.get(url)
+
+    def set(self, url, entry, save=False):
+        with self.lock:
+            self.entries[url] = entry
+            if save:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Erst in eine temporäre Datei schreiben, damit ein abgebrochener Lauf keinen defekten Cache hinterlässt
+        tmp = self.file.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({url: asdict(entry) for url, entry in self.entries.items()}, f, indent=1)
+        os.replace(tmp, self.file)
+
+def get_request_headers(entry, f_path, part):
+    """
+    Header für eine bedingte Anfrage bzw. die Fortsetzung eines abgebrochenen Downloads
+    :param entry: DataClassCacheEntry oder None
+    :return: (Header, Position ab der fortgesetzt wird)
+    """
+    if entry is None:
+        return {}, 0
+    if entry.complete and f_path.exists() and entry.content_length in (-1, f_path.stat().st_size):
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers, 0
+    if not entry.complete and part.exists() and (entry.etag or entry.last_modified):
+        offset = part.stat().st_size
+        # Mit If-Range liefert der Server das ganze Dokument, wenn es sich inzwischen geändert hat
+        return {'Range': f'bytes={offset}-', 'If-Range': entry.etag or entry.last_modified}, offset
+    return {}, 0
 
 @dataclass
 class DataClassEdiDoc:
@@ -20,22 +147,102 @@ class DataClassEdiDoc:
     filename: Path = None
     view: str = ""
 
-    def download(self, subdirectory):
-        f_path = Path.cwd() / "EDI_ENERGY" / subdirectory / self.domain / self.filename
-        r = requests.get(self.url)
-        print(f_path)
+    def download(self, subdirectory, session=None, root=None, cache=None):
+        """
+        Lädt das Dokument herunter. Der Inhalt wird stückweise in eine .part Datei geschrieben, die erst nach
+        vollständigem Download umbenannt wird.
+        Mit cache wird ein unverändertes Dokument nicht erneut übertragen und eine vorhandene .part Datei
+        eines abgebrochenen Downloads fortgesetzt.
+        :param subdirectory: Release Verzeichnis, z.B. 20231001
+        :param session: requests.Session, Standard ist eine neue Session aus create_session
+        :param root: Basisverzeichnis, Standard ist EDI_ENERGY im aktuellen Verzeichnis
+        :param cache: DownloadCache des Release Verzeichnisses oder None
+        :return: DataClassDownloadResult
+        """
+        if session is None:
+            session = create_session()
+        if root is None:
+            root = Path.cwd() / "EDI_ENERGY"
+        f_path = Path(root) / subdirectory / self.domain / self.filename
+        part = f_path.with_name(f_path.name + '.part')
         Path(f_path.parent).mkdir(parents=True, exist_ok=True)
-        with open(f_path, 'wb') as f:
-            f.write(r.content)
 
-filter_values = DataClassEdiDoc
+        result = DataClassDownloadResult(url=self.url, path=f_path)
+        entry = cache.get(self.url) if cache is not None else None
+        headers, offset = get_request_headers(entry, f_path, part)
+        # Content-Length, Range und die Größe der .part Datei beziehen sich nur ohne Content-Encoding auf dieselben
+        # Bytes, daher wird das Dokument unkomprimiert angefordert
+        headers['Accept-Encoding'] = 'identity'
+        with session.get(self.url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+            if r.status_code == 304:
+                result.skipped = True
+                return result
+            if r.status_code == 416:
+                # Die .part Datei passt nicht mehr zum Dokument auf dem Server
+                part.unlink()
+                cache.set(self.url, DataClassCacheEntry())
+                return self.download(subdirectory, session, root, cache)
+            r.raise_for_status()
+            logging.info(f'{f_path}')
+
+            if r.status_code == 206:
+                result.resumed = True
+                mode = 'ab'
+            else:
+                offset = 0
+                mode = 'wb'
+            # Sendet der Server trotzdem komprimiert, zählt Content-Length die komprimierten Bytes, iter_content
+            # liefert aber die entpackten. Die Größe wird dann nicht geprüft und der Download nicht fortgesetzt.
+            encoded = r.headers.get('Content-Encoding', 'identity') != 'identity'
+            length = r.headers.get('Content-Length')
+            entry = DataClassCacheEntry(etag=r.headers.get('ETag', ''),
+                                        last_modified=r.headers.get('Last-Modified', ''),
+                                        content_length=-1 if length is None or encoded else offset + int(length),
+                                        path=f_path.relative_to(Path(root) / subdirectory).as_posix())
+            if cache is not None and not encoded:
+                # Sofort speichern, damit ein abgebrochener Download beim nächsten Lauf fortgesetzt werden kann
+                cache.set(self.url, entry, save=True)
+
+            with open(part, mode) as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    result.size += len(chunk)
+
+        if entry.content_length != -1 and part.stat().st_size != entry.content_length:
+            raise OSError(f'{part} hat {part.stat().st_size} statt {entry.content_length} Bytes')
+        os.replace(part, f_path)
+        if cache is not None:
+            entry.complete = True
+            cache.set(self.url, entry)
+        return result
+
+def get_filename(session, url):
+    """
+    Dateiname aus dem Content-Disposition Header (attachment; filename="...")
+    """
+    r = session.head(url, allow_redirects=True, timeout=TIMEOUT)
+    r.raise_for_status()
+    dispo = r.headers['Content-Disposition']
+    return dispo[dispo.find('=') + 2:-1]
 
-def get_view(view):
+def get_view(view, session=None, base_url=BASE_URL, jobs=JOBS):
+    """
+    Liest das Verzeichnis einer Ansicht von edi-energy.de. Die Dateinamen der Dokumente werden mit jobs
+    parallelen HEAD Anfragen ermittelt.
+    :param view: 'now', 'future' oder 'archive'
+    :param session: requests.Session, Standard ist eine neue Session aus create_session
+    :param base_url: Adresse des Servers
+    :param jobs: Anzahl paralleler Anfragen
+    :return: Liste der DataClassEdiDoc
+    """
+    if session is None:
+        session = create_session(pool_size=jobs)
     directory = []
-    url = 'https://www.edi-energy.de/index.php'
+    url = f'{base_url}/index.php'
     data = {'tx_bdew_bdew[view]': view, 'tx_bdew_bdew[group]' : '1', 'id': '38'}
 
-    r = requests.post(url, data=data)
+    r = session.post(url, data=data, timeout=TIMEOUT)
+    r.raise_for_status()
 
     idx = BeautifulSoup(r.text, 'html.parser')
     table = idx.find('table')
@@ -50,15 +257,10 @@ def get_view(view):
         ediDoc.domain = dom
 
         ediDoc.description = " ".join(cols[0].string.split())
-        ediDoc.from_date = cols[1].string.strip()
-        ediDoc.to_date = cols[2].string.strip()
-        if ediDoc.to_date == 'Offen':
-            ediDoc.to_date = '31.12.9999'
+        ediDoc.from_date = parse_date(cols[1].string)
+        ediDoc.to_date = parse_date(cols[2].string)
         href = cols[3].find('a')
-        ediDoc.url = 'https://www.edi-energy.de' + cols[3].find('a')['href']
-        r = requests.head(ediDoc.url)
-        dispo = r.headers['Content-Disposition']
-        ediDoc.filename = dispo[dispo.find('=') + 2:-1]
+        ediDoc.url = base_url + cols[3].find('a')['href']
         directory.append(ediDoc)
         if re.match('^[A-Z]{6} ', ediDoc.description):
             ediDoc.format = " ".join(re.findall('[A-Z]{6} ', ediDoc.description)).strip()
@@ -68,74 +270,277 @@ def get_view(view):
         else:
             ediDoc.format = " "
 
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for ediDoc, filename in zip(directory, executor.map(lambda d: get_filename(session, d.url), directory)):
+            ediDoc.filename = filename
     return directory
 
-def load_web_directory_to_excel():
+def download_docs(docs, subdirectory, session=None, root=None, jobs=JOBS, use_cache=True):
+    """
+    Lädt die Dokumente mit jobs parallelen Downloads herunter. Ein fehlgeschlagener Download bricht die
+    übrigen nicht ab, sondern wird im Ergebnis festgehalten.
+    :param docs: Liste der DataClassEdiDoc
+    :param subdirectory: Release Verzeichnis, z.B. 20231001
+    :param use_cache: nur neue oder geänderte Dokumente übertragen (DownloadCache im Release Verzeichnis)
+    :return: Liste der DataClassDownloadResult
+    """
+    if session is None:
+        session = create_session(pool_size=jobs)
+    if root is None:
+        root = Path.cwd() / "EDI_ENERGY"
+    cache = DownloadCache(Path(root) / subdirectory) if use_cache else None
+
+    def download(ediDoc):
+        try:
+            return ediDoc.download(subdirectory, session, root, cache)
+        except (requests.RequestException, OSError) as err:
+            logging.error(f'Download {ediDoc.url} fehlgeschlagen: {err}')
+            return DataClassDownloadResult(url=ediDoc.url, ok=False, error=f'{type(err).__name__}: {err}')
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(download, docs))
+    finally:
+        if cache is not None:
+            cache.save()
+
+@dataclass
+class DataClassDirectoryDiff:
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    # Paare (alt, neu) von Dokumenten, deren Gültigkeit oder Ansicht sich geändert hat
+    changed: list = field(default_factory=list)
+
+    def delta(self):
+        """
+        Dokumente, die seit dem vorherigen Snapshot neu sind oder deren Gültigkeit sich geändert hat
+        """
+        return self.added + [new for old, new in self.changed]
+
+    def report(self):
+        lines = [f'{len(self.added)} neu, {len(self.removed)} entfernt, {len(self.changed)} geändert']
+        lines.extend(f'+ {doc.description} ({doc.from_date} - {doc.to_date}, {doc.view})' for doc in self.added)
+        lines.extend(f'- {doc.description} ({doc.from_date} - {doc.to_date}, {doc.view})' for doc in self.removed)
+        lines.extend(f'~ {new.description} ({old.from_date} - {old.to_date}, {old.view} -> '
+                     f'{new.from_date} - {new.to_date}, {new.view})' for old, new in self.changed)
+        return "\n".join(lines)
+
+def snapshot_files(path):
+    """
+    Gespeicherte Verzeichnis Snapshots, ältester zuerst
+    """
+    return sorted(Path(path).glob('EDI_Directory_*.json.gz'))
+
+def save_snapshot(directory, path, created=None):
+    """
+    Speichert das Verzeichnis als gzip komprimiertes JSON
+    :param directory: Liste der DataClassEdiDoc
+    :param path: Verzeichnis der Snapshots
+    :return: Datei des Snapshots
+    """
+    if created is None:
+        created = datetime.now()
+    file = Path(path) / f'EDI_Directory_{created.strftime("%Y-%m-%dT%H%M%S")}.json.gz'
+    tmp = file.with_suffix('.tmp')
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        json.dump({'created': created.isoformat(),
+                   'documents': [{**asdict(doc), 'filename': str(doc.filename), 'from_date': str(doc.from_date),
+                                  'to_date': str(doc.to_date)} for doc in directory]}, f)
+    os.replace(tmp, file)
+    return file
+
+def load_snapshot(file):
+    """
+    :return: (Zeitpunkt des Snapshots, Liste der DataClassEdiDoc)
+    """
+    with gzip.open(file, 'rt', encoding='utf-8') as f:
+        snapshot = json.load(f)
     directory = []
-    directory.extend(get_view('now'))
-    directory.extend(get_view('future'))
-    directory.extend(get_view('archive'))
+    for doc in snapshot['documents']:
+        doc['from_date'] = parse_date(doc['from_date'])
+        doc['to_date'] = parse_date(doc['to_date'])
+        directory.append(DataClassEdiDoc(**doc))
+    return datetime.fromisoformat(snapshot['created']), directory
+
+def get_directory(path, ttl=SNAPSHOT_TTL, session=None, base_url=BASE_URL, jobs=JOBS):
+    """
+    Verzeichnis aller Ansichten. Ist der letzte Snapshot jünger als ttl, wird er verwendet, ansonsten wird das
+    Verzeichnis von edi-energy.de gelesen, mit dem letzten Snapshot verglichen und als neuer Snapshot gespeichert.
+    :param path: Verzeichnis der Snapshots
+    :return: (Liste der DataClassEdiDoc, DataClassDirectoryDiff zum vorherigen Snapshot). Der Vergleich ist None,
+             wenn der Snapshot innerhalb der TTL verwendet wurde. Ohne vorherigen Snapshot sind alle Dokumente neu.
+    """
+    previous = []
+    files = snapshot_files(path)
+    if files:
+        created, previous = load_snapshot(files[-1])
+        if datetime.now() - created < ttl:
+            return previous, None
+
+    if session is None:
+        session = create_session(pool_size=jobs)
+    directory = []
+    for view in VIEWS:
+        directory.extend(get_view(view, session, base_url, jobs))
+    save_snapshot(directory, path)
+    return directory, diff_directories(previous, directory)
+
+def diff_directories(old, new):
+    """
+    Vergleicht zwei Verzeichnisse. Dokumente werden über ihre URL identifiziert.
+    :param old: Liste der DataClassEdiDoc des älteren Snapshots
+    :param new: Liste der DataClassEdiDoc des neueren Snapshots
+    :return: DataClassDirectoryDiff
+    """
+    old_docs = {doc.url: doc for doc in old}
+    new_docs = {doc.url: doc for doc in new}
+    diff = DataClassDirectoryDiff()
+    diff.added = [doc for url, doc in new_docs.items() if url not in old_docs]
+    diff.removed = [doc for url, doc in old_docs.items() if url not in new_docs]
+    for url, doc in new_docs.items():
+        before = old_docs.get(url)
+        if before is not None and (before.from_date, before.to_date, before.view) != (doc.from_date, doc.to_date,
+                                                                                      doc.view):
+            diff.changed.append((before, doc))
+    return diff
+
+def diff_snapshots(old_file, new_file):
+    return diff_directories(load_snapshot(old_file)[1], load_snapshot(new_file)[1])
 
+def load_web_directory_to_excel():
     path = Path('/EDI@ENERGY/EDI_ENERGY')
+    directory, diff = get_directory(path)
+    if diff is not None:
+        logging.info(diff.report())
+
     today = datetime.today().strftime('%Y-%m-%d')
     file_name = path / f'EDI_Directory_{today}.xlsx'
     pd.DataFrame(directory).to_excel(file_name, sheet_name='EDI_Directory', index=False)
     # get_directory_from_web().to_excel(file_name, sheet_name='EDI_Directory', index=False)
 
-def conv_date(date):
+def parse_date(value):
     """
-    Wenn man die CSV Datei mit Excel speichert werden die Datumsfelder im Format dd.mm.yy gespeichert.
-    Das wird hier bei Bedarf wieder in das Format dd.mm.yyyy zurück verwandelt. Dabei wird davon ausgegangen, dass
-    das Jahr 99 im 99 Jahrhundert liegt (31.12.9999)
-    :param date:
-    :return:
+    Wandelt ein Datum aus dem Verzeichnis in ein date. Die Umwandlung erfolgt einmal beim Einlesen, so dass
+    beim Filtern nicht mehr mit Zeichenketten gerechnet werden muss.
+    Wenn man das Verzeichnis mit Excel speichert, werden die Datumsfelder im Format dd.mm.yy gespeichert. Dabei wird
+    davon ausgegangen, dass das Jahr 99 im 99 Jahrhundert liegt (31.12.9999).
+    :param value: 'dd.mm.yyyy', 'dd.mm.yy', 'yyyy-mm-dd', 'Offen', date, datetime oder pd.Timestamp
+    :return: date
     """
-    if len(date) == 8:
-        if date[6:8] == '99':
-            cc = '99'
-        else:
-            cc = '20'
-        date = date[:6] + cc + date[6:8]
-    return date
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    if value == 'Offen':
+        return OPEN_END
+    if '-' in value:
+        return date.fromisoformat(value[:10])
+    day, month, year = value.split('.')
+    if len(year) == 2:
+        year = ('99' if year == '99' else '20') + year
+    return date(int(year), int(month), int(day))
+
+class DirectoryIndex:
+    """
+    Index über das Verzeichnis der Dokumente.
+    Format, Typ und Ansicht werden einmal auf die Positionen der Dokumente abgebildet, die Gültigkeit liegt in einem
+    IntervalIndex (Tage seit 01.01.0001, da pd.Timestamp den 31.12.9999 nicht darstellen kann). Eine Abfrage
+    schneidet nur noch diese Positionsmengen, statt alle Dokumente erneut zu prüfen.
+    Der Index wird nach dem Aufbau nicht mehr verändert und kann von beliebig vielen Abfragen gleichzeitig
+    verwendet werden.
+    """
+    def __init__(self, directory):
+        self.documents = list(directory)
+        self.frame = pd.DataFrame({
+            'format': [doc.format for doc in self.documents],
+            'type': [doc.type for doc in self.documents],
+            'view': [doc.view for doc in self.documents],
+            'from_date': [doc.from_date for doc in self.documents],
+            'to_date': [doc.to_date for doc in self.documents],
+        })
+        self.validity = pd.IntervalIndex.from_arrays(
+            np.array([d.toordinal() for d in self.frame['from_date']], dtype=np.int64),
+            np.array([d.toordinal() for d in self.frame['to_date']], dtype=np.int64), closed='both')
+        # Ein Dokument kann mehrere Formate haben, z.B. 'UTILMD MSCONS'
+        self.formats = self.positions(doc.format.split() for doc in self.documents)
+        self.types = self.positions([doc.type] for doc in self.documents)
+        self.views = self.positions([doc.view] for doc in self.documents)
+
+    @staticmethod
+    def positions(keys_per_document):
+        """
+        :return: dict Schlüssel -> sortiertes numpy Array der Positionen
+        """
+        positions = {}
+        for pos, keys in enumerate(keys_per_document):
+            for key in keys:
+                positions.setdefault(key, []).append(pos)
+        return {key: np.array(value, dtype=np.int64) for key, value in positions.items()}
+
+    def valid_on(self, day):
+        """
+        Positionen der Dokumente, die am Tag day gültig sind (von <= day <= bis)
+        """
+        found, _ = self.validity.get_indexer_non_unique(pd.Index([parse_date(day).toordinal()]))
+        return np.unique(found[found >= 0])
+
+    def query(self, valid_on=None, format=None, type=None, view=None):
+        """
+        Dokumente, die allen angegebenen Bedingungen entsprechen, z.B.
+        query(valid_on=date(2023, 10, 1), format='UTILMD', type='AHB')
+        :param valid_on: Stichtag, an dem das Dokument gültig ist
+        :param format: EDIFACT Format, z.B. 'UTILMD'
+        :param type: 'AHB' oder 'MIG'
+        :param view: 'now', 'future' oder 'archive'
+        :return: Liste der DataClassEdiDoc in der Reihenfolge des Verzeichnisses
+        """
+        selected = None
+        for positions in (None if format is None else self.formats.get(format, np.array([], dtype=np.int64)),
+                          None if type is None else self.types.get(type, np.array([], dtype=np.int64)),
+                          None if view is None else self.views.get(view, np.array([], dtype=np.int64)),
+                          None if valid_on is None else self.valid_on(valid_on)):
+            if positions is None:
+                continue
+            selected = positions if selected is None else np.intersect1d(selected, positions, assume_unique=True)
+        if selected is None:
+            return list(self.documents)
+        return [self.documents[pos] for pos in selected]
 
 def get_directory_from_excel(file):
     dir = []
-    df = pd.read_excel(file, sheet_name='EDI_Directory')
+    df = pd.read_excel(file, sheet_name='EDI_Directory', dtype={'from_date': object, 'to_date': object})
+    # Leere Zellen (z.B. Typ bei Dokumenten ohne MIG/AHB) wieder als leere Zeichenkette
+    df = df.fillna('')
 
     for ediDoc in df.to_dict(orient='records'):
-        ediDoc['from_date'] = conv_date(ediDoc['from_date'])
-        ediDoc['to_date'] = conv_date(ediDoc['to_date'])
+        ediDoc['from_date'] = parse_date(ediDoc['from_date'])
+        ediDoc['to_date'] = parse_date(ediDoc['to_date'])
         dir.append(DataClassEdiDoc(**ediDoc))
     return dir
 
-def fltr(ediDoc):
-    if filter_values.from_date != None:
-        from_date = datetime.strptime(ediDoc.from_date, '%d.%m.%Y').date()
-        to_date = datetime.strptime(ediDoc.to_date, '%d.%m.%Y').date()
-        if from_date > filter_values.from_date:
-            return False
-
-        if to_date < filter_values.from_date:
-            return False
-
-    if filter_values.view != "":
-        if ediDoc.view != filter_values.view:
-            return False
-    return True
-
-def down_load_files(file):
-    dir = get_directory_from_excel(file)
-    # filter_values.from_date = date(2022,10,1)
-    filter_values.view = 'future'
-
-    for ediDoc in filter(fltr, dir):
-        # ediDoc.download(filter_values.from_date.strftime('%Y%m%d'))
-        ediDoc.download('20231001')
+def down_load_files(path, subdirectory, view='future', ttl=SNAPSHOT_TTL, root=None, base_url=BASE_URL, jobs=JOBS):
+    """
+    Liest das Verzeichnis (get_directory) und lädt alle Dokumente der Ansicht herunter. Ob ein Dokument übertragen
+    werden muss, entscheidet der DownloadCache des Release Verzeichnisses mit bedingten Anfragen: unveränderte
+    Dokumente werden übersprungen, fehlgeschlagene beim nächsten Lauf erneut angefragt. Der Vergleich mit dem
+    vorherigen Snapshot wird nur protokolliert.
+    :param path: Verzeichnis der Snapshots
+    :param subdirectory: Release Verzeichnis, z.B. 20231001
+    :param view: 'now', 'future', 'archive' oder None für alle Ansichten
+    :return: Liste der DataClassDownloadResult
+    """
+    session = create_session(pool_size=jobs)
+    directory, diff = get_directory(path, ttl, session, base_url, jobs)
+    if diff is not None:
+        logging.info(diff.report())
+    # Ein Dokument, das in mehreren Ansichten steht, wird nur einmal geladen
+    docs = list({doc.url: doc for doc in DirectoryIndex(directory).query(view=view)}.values())
+    return download_docs(docs, subdirectory, session, root, jobs)
 
 def main():
     #load_web_directory_to_excel()
-    #down_load_files('/EDI@ENERGY/EDI_ENERGY/EDI_Directory_2023-04-12.xlsx')
-    down_load_files('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/EDI_Directory_2023-04-12.xlsx')
+    down_load_files('/EDI@ENERGY/EDI_ENERGY', '20231001')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,430 @@
+"""
+Gemeinsamer Einstiegspunkt für die Extraktion eines Releases.
+
+Bisher haben extract_mig, extract_ahb, extract_ebd und extract_other jeweils eigene Durchläufe
+über die Release Verzeichnisse gemacht. Hier wird jedes Release Verzeichnis nur einmal durchlaufen.
+Jedes Dokument wird einmal gelesen und geparst, die Tabellen werden in einem Durchlauf
+klassifiziert (get_table_index des jeweiligen Extraktors) und an den passenden Extraktor übergeben.
+Die Laufzeiten der einzelnen Schritte werden pro Extraktor gesammelt und am Ende ausgegeben.
+
+Mit --jobs N werden die Dokumente in N Prozessen parallel extrahiert. Erfolg, Fehler und Laufzeit
+jeder Datei werden in einer DataClassRunSummary gesammelt.
+
+Word Dokumente (.docx), zu denen es im Release noch keine HTML Datei gibt, werden mit docx_reader direkt
+gelesen. Dafür werden weder Word noch der HTML Export benötigt.
+
+Die Laufzeiten (und mit --memory der Spitzenspeicher) der Schritte read, parse, index, extract und write
+werden mit instrument erfasst. --metrics schreibt sie als JSON Lines, eine Zeile je Datei, --profile legt je
+Datei ein cProfile ab, --slowest gibt die langsamsten Tabellen mit Klassifikation und Überschrift aus und
+--progress zeigt während des Laufs Fortschritt und Durchsatz.
+
+Mit --ahb-layout normalized werden die Anwendungsfälle der AHB nicht mit einer Zeile je PID geschrieben, sondern
+als Elemente und Bedingungen je PID (siehe extract_ahb.LAYOUTS). Die Zusammenführung baut daraus wieder das
+Sheet 'Anwendungsfälle' auf.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import logging
+import os
+import time
+import docx_reader
+import instrument
+import extract_ahb
+import extract_ebd
+import extract_mig
+import extract_other
+import manifest
+import sink
+import util
+
+STAGES = ('read', 'parse', 'index', 'extract', 'write')
+
+@dataclass
+class DataClassOptions:
+    # Parser, siehe util.PARSER_BACKENDS
+    backend: str = 'html.parser'
+    # Dokumente tabellenweise lesen, wenn der Extraktor das unterstützt
+    stream: bool = False
+    # Ausgabeformate, siehe sink.FORMATS
+    formats: tuple = ('excel',)
+    # Spitzenspeicher je Schritt mit tracemalloc messen (verlangsamt die Extraktion)
+    memory: bool = False
+    # Verzeichnis, in das je Datei ein cProfile geschrieben wird
+    profile: Path = None
+    # Layout der Ausgabe für Extraktoren, die mehrere Layouts kennen, siehe extract_ahb.LAYOUTS
+    layout: str = 'wide'
+
+@dataclass
+class DataClassExtractor:
+    name: str = ""
+    # Prüft anhand des Dateinamens, ob der Extraktor zuständig ist
+    matches: Callable = None
+    get_table_index: Callable = None
+    extract: Callable = None
+    # Tags, die beim Parsen mit Strainer erhalten bleiben
+    strainer_tags: tuple = ()
+    # Version des Extraktors für das Manifest
+    version: str = ""
+    # Tabellenweise Extraktion mit stream_reader (nur für AHB)
+    extract_stream: Callable = None
+    # extract_ebd liest die Datei binär, die übrigen Extraktoren als Text
+    binary: bool = False
+    # Ausgabelayouts, die der Extraktor zusätzlich zu den Ausgabeformaten annimmt (nur für AHB)
+    layouts: tuple = ()
+
+@dataclass
+class DataClassTimings:
+    stages: dict = field(default_factory=dict)
+
+    def add(self, extractor, stage, seconds):
+        stages = self.stages.setdefault(extractor, dict.fromkeys(STAGES, 0.0))
+        stages[stage] += seconds
+
+@dataclass
+class DataClassFileResult:
+    file: str = ""
+    extractor: str = ""
+    ok: bool = True
+    # Datei war laut Manifest bereits aktuell extrahiert
+    skipped: bool = False
+    error: str = ""
+    duration: float = 0.0
+    stages: dict = field(default_factory=dict)
+    # Treffer und Fehlzugriffe von util.parse_style während der Extraktion der Datei
+    style_cache: dict = field(default_factory=dict)
+    # Spitzenspeicher je Schritt in MB, nur mit DataClassOptions.memory
+    memory: dict = field(default_factory=dict)
+    # Langsamste Tabellen der Datei, siehe instrument.DataClassTableRecord
+    tables: list = field(default_factory=list)
+    # Zähler der Extraktoren, siehe instrument.count
+    counts: dict = field(default_factory=dict)
+
+@dataclass
+class DataClassRunSummary:
+    walk: float = 0.0
+    results: list = field(default_factory=list)
+
+    def add(self, result):
+        if not result.ok:
+            logging.error(f'File {result.file}. Fehler {result.error}')
+        self.results.append(result)
+
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    def report(self):
+        stages = {}
+        files = {}
+        for r in filter(lambda r: not r.skipped, self.results):
+            files[r.extractor] = files.get(r.extractor, 0) + 1
+            extractor_stages = stages.setdefault(r.extractor, dict.fromkeys(STAGES, 0.0))
+            for stage, seconds in r.stages.items():
+                extractor_stages[stage] += seconds
+
+        lines = [f'{"Extraktor":<10}{"Dateien":>8}' + "".join(f'{s:>10}' for s in STAGES) + f'{"Summe":>10}']
+        for name, extractor_stages in stages.items():
+            lines.append(f'{name:<10}{files[name]:>8}' + "".join(f'{extractor_stages[s]:>10.2f}' for s in STAGES) +
+                         f'{sum(extractor_stages.values()):>10.2f}')
+        memory = {}
+        for r in self.results:
+            for stage, peak_mb in r.memory.items():
+                memory[stage] = max(memory.get(stage, 0.0), peak_mb)
+        if memory:
+            lines.append('Spitzenspeicher (MB): ' + ", ".join(f'{s} {memory[s]:.1f}' for s in STAGES if s in memory))
+        counts = {}
+        for r in self.results:
+            for name, n in r.counts.items():
+                counts[name] = counts.get(name, 0) + n
+        for name, n in counts.items():
+            lines.append(f'{name}: {n}')
+        lines.append(f'Verzeichnisse durchlaufen in {self.walk:.2f}s')
+        hits = sum(r.style_cache.get('hits', 0) for r in self.results)
+        misses = sum(r.style_cache.get('misses', 0) for r in self.results)
+        if hits + misses > 0:
+            lines.append(f'Style Cache: {hits} Treffer, {misses} Fehlzugriffe ({hits / (hits + misses):.1%} Treffer)')
+        skipped = sum(r.skipped for r in self.results)
+        lines.append(f'{len(self.results) - len(self.failed()) - skipped} Dateien erfolgreich, '
+                     f'{skipped} unverändert übersprungen, {len(self.failed())} fehlerhaft')
+        for r in self.failed():
+            lines.append(f'  {r.file}: {r.error}')
+        return "\n".join(lines)
+
+    def to_json(self, file):
+        with open(file, 'w') as f:
+            json.dump({'walk': self.walk, 'results': [asdict(r) for r in self.results]}, f, indent=2)
+
+    def to_jsonl(self, file):
+        """
+        Messwerte als JSON Lines, eine Zeile je extrahierter Datei
+        """
+        instrument.write_jsonl(file, (asdict(r) for r in self.results if not r.skipped))
+
+    def slowest_tables(self, limit=10):
+        return instrument.format_slowest_tables(instrument.slowest_tables(self.results, limit))
+
+# Die Reihenfolge ist relevant: extract_other ist für alle übrigen Dokumente zuständig
+EXTRACTORS = (
+    DataClassExtractor('MIG', lambda stem: '_MIG_' in stem, extract_mig.get_table_index,
+                       extract_mig.extract_mig_tables, extract_mig.STRAINER_TAGS, extract_mig.VERSION),
+    DataClassExtractor('AHB', lambda stem: '_AHB_' in stem, extract_ahb.get_table_index,
+                       extract_ahb.extract_ahb_tables, extract_ahb.STRAINER_TAGS, extract_ahb.VERSION,
+                       extract_stream=extract_ahb.extract_ahb_stream, layouts=extract_ahb.LAYOUTS),
+    DataClassExtractor('EBD', lambda stem: 'EBD_' in stem, extract_ebd.get_table_index,
+                       extract_ebd.extract_ebd_tables, extract_ebd.STRAINER_TAGS, extract_ebd.VERSION,
+                       binary=True),
+    DataClassExtractor('Other', lambda stem: True, extract_other.get_table_index,
+                       extract_other.extract_other_tables, extract_other.STRAINER_TAGS, extract_other.VERSION),
+)
+
+def output_args(extractor, options):
+    """
+    Argumente der Extraktoren hinter Tabellenindex und Pfad: die Ausgabeformate und, wenn der Extraktor das
+    gewünschte Layout kennt, das Layout. Sie bestimmen auch die Version im Manifest.
+    """
+    if options.layout in extractor.layouts:
+        return options.formats, options.layout
+    return (options.formats,)
+
+def get_extractor(file):
+    for extractor in EXTRACTORS:
+        if extractor.matches(file.stem):
+            return extractor
+
+def extract_file(file, extractor, timings, options=DataClassOptions(), recorder=None):
+    """
+    Liest und parst ein Dokument einmal und übergibt die klassifizierten Tabellen an den Extraktor
+    :param file: Pfad der HTML oder .docx Datei
+    :param extractor: DataClassExtractor
+    :param timings: DataClassTimings, wird um die Laufzeiten der einzelnen Schritte ergänzt
+    :param options: DataClassOptions
+    :param recorder: instrument.Recorder, in dem Schritte und Tabellen erfasst werden
+    :return: instrument.Recorder
+    """
+    if recorder is None:
+        recorder = instrument.Recorder(options.memory)
+    try:
+        with instrument.recording(recorder):
+            if options.stream and extractor.extract_stream is not None:
+                # Lesen, Parsen und Extrahieren erfolgen hier tabellenweise in einem Schritt
+                with instrument.stage('extract'):
+                    extractor.extract_stream(file, *output_args(extractor, options))
+                return recorder
+
+            with instrument.stage('read'):
+                if is_docx(file):
+                    data = docx_reader.read_docx(file)
+                else:
+                    with open(file, 'rb' if extractor.binary else 'r') as f:
+                        data = f.read()
+
+            with instrument.stage('parse'):
+                edi_doc = util.parse_html(data, options.backend, keep=extractor.strainer_tags)
+
+            with instrument.stage('index'):
+                table_index = extractor.get_table_index(edi_doc)
+
+            with instrument.stage('extract'):
+                extractor.extract(table_index, file, *output_args(extractor, options))
+            return recorder
+    finally:
+        for stage, seconds in recorder.stage_seconds().items():
+            timings.add(extractor.name, stage, seconds)
+
+def run_file(file, options=DataClassOptions()):
+    """
+    Extrahiert ein Dokument. Fehler werden nicht weitergereicht, sondern im Ergebnis festgehalten,
+    damit ein fehlerhaftes Dokument die übrigen Dokumente nicht beeinflusst.
+    Die Funktion wird auch in den Prozessen des ProcessPoolExecutor ausgeführt.
+    :param file: Pfad der HTML Datei
+    :param options: DataClassOptions
+    :return: DataClassFileResult
+    """
+    extractor = get_extractor(file)
+    timings = DataClassTimings()
+    recorder = instrument.Recorder(options.memory)
+    result = DataClassFileResult(file=str(file), extractor=extractor.name)
+    style_cache = util.style_cache_info()
+    start = time.perf_counter()
+    try:
+        # Gleichnamige Dokumente mehrerer Releases dürfen ihre Profile nicht überschreiben
+        with instrument.profiled(options.profile, f'{sink.release_dir(file).name}_{file.stem}'):
+            extract_file(file, extractor, timings, options, recorder)
+    except Exception as err:
+        result.ok = False
+        result.error = f'{type(err).__name__}: {err}'
+    result.duration = time.perf_counter() - start
+    result.stages = timings.stages.get(extractor.name, {})
+    result.memory = recorder.stage_memory()
+    result.tables = recorder.slowest_tables()
+    result.counts = recorder.counts
+    result.style_cache = {key: util.style_cache_info()[key] - style_cache[key] for key in ('hits', 'misses')}
+    return result
+
+def extract_files(files, summary, options=DataClassOptions(), jobs=1, progress=False):
+    """
+    Extrahiert die Dokumente seriell (jobs=1) oder parallel in jobs Prozessen
+    :param files: Liste der HTML Dateien
+    :param summary: DataClassRunSummary, in der die Ergebnisse gesammelt werden
+    :param options: DataClassOptions
+    :param jobs: Anzahl paralleler Prozesse
+    :param progress: Fortschritt und Durchsatz auf stderr ausgeben
+    :return: DataClassRunSummary
+    """
+    sizes = {str(file): file.stat().st_size for file in files}
+    tracker = instrument.Progress(len(files)) if progress and files else None
+
+    def add(result):
+        summary.add(result)
+        if tracker is not None:
+            tracker.update(sizes.get(result.file, 0), result.ok)
+
+    try:
+        run_files(files, add, options, jobs, sizes)
+        return summary
+    finally:
+        if tracker is not None:
+            tracker.close()
+
+def run_files(files, add, options, jobs, sizes):
+    """
+    Führt run_file für alle Dateien aus und übergibt jedes Ergebnis an add
+    """
+    if jobs <= 1:
+        for file in files:
+            add(run_file(file, options))
+        return
+
+    # Große Dateien zuerst starten, damit am Ende nicht ein einzelnes großes AHB alleine läuft
+    files = sorted(files, key=lambda f: sizes[str(f)], reverse=True)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_file, file, options): file for file in files}
+        for future in as_completed(futures):
+            try:
+                add(future.result())
+            except Exception as err:
+                # z.B. BrokenProcessPool, wenn ein Prozess abgestürzt ist
+                file = futures[future]
+                add(DataClassFileResult(file=str(file), extractor=get_extractor(file).name, ok=False,
+                                        error=f'{type(err).__name__}: {err}'))
+
+def is_docx(file):
+    return file.suffix.lower() == '.docx'
+
+def walk_release(path, summary):
+    """
+    Durchläuft ein Release Verzeichnis einmal und liefert alle HTML Dokumente sowie die Word Dokumente,
+    zu denen es keine HTML Datei gibt. Sperrdateien von Word (~$...) werden übergangen.
+    """
+    start = time.perf_counter()
+    files = []
+    docx_files = []
+    for file in path.rglob('*'):
+        if file.suffix == '.HTML':
+            files.append(file)
+        elif is_docx(file) and not file.name.startswith('~$'):
+            docx_files.append(file)
+    html_stems = {file.stem for file in files}
+    files.extend(file for file in docx_files if file.stem not in html_stems)
+    summary.walk += time.perf_counter() - start
+    return files
+
+def extract_release(path, summary=None, options=DataClassOptions(), jobs=1, force=False, progress=False):
+    """
+    Extrahiert alle HTML Dokumente eines Release Verzeichnisses
+    :param path: Release Verzeichnis, z.B. .../EDI_ENERGY/20231001
+    :param summary: DataClassRunSummary, in der die Ergebnisse gesammelt werden
+    :param options: DataClassOptions
+    :param jobs: Anzahl paralleler Prozesse
+    :param force: auch Dateien extrahieren, die laut Manifest aktuell sind
+    :param progress: Fortschritt und Durchsatz auf stderr ausgeben
+    :return: DataClassRunSummary
+    """
+    return extract_releases([path], summary, options, jobs, force, progress)
+
+def extract_releases(paths, summary=None, options=DataClassOptions(), jobs=1, force=False, progress=False):
+    """
+    Extrahiert alle geänderten HTML Dokumente mehrerer Release Verzeichnisse in einem gemeinsamen Lauf.
+    Unveränderte Dokumente werden anhand des Manifests im Release Verzeichnis übersprungen.
+    :return: DataClassRunSummary
+    """
+    if summary is None:
+        summary = DataClassRunSummary()
+
+    manifests = {}
+    files = []
+    for path in paths:
+        extracted = manifest.Manifest(path)
+        for file in walk_release(path, summary):
+            extractor = get_extractor(file)
+            if not force and extracted.is_up_to_date(file, manifest.output_version(extractor.version,
+                                                                                    *output_args(extractor, options)),
+                                                     manifest.output_files(file, options.formats)):
+                summary.add(DataClassFileResult(file=str(file), extractor=extractor.name, skipped=True))
+                continue
+            manifests[str(file)] = extracted
+            files.append(file)
+
+    summary_new = extract_files(files, DataClassRunSummary(), options, jobs, progress)
+
+    for result in summary_new.results:
+        extracted = manifests[result.file]
+        file = Path(result.file)
+        if result.ok:
+            extractor = get_extractor(file)
+            extracted.record(file, manifest.output_version(extractor.version, *output_args(extractor, options)),
+                             manifest.output_files(file, options.formats))
+        else:
+            extracted.remove(file)
+    for extracted in set(manifests.values()):
+        extracted.save()
+
+    summary.results.extend(summary_new.results)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Extraktion der EDI@Energy Dokumente eines oder mehrerer Releases')
+    parser.add_argument('paths', nargs='*', type=Path,
+                        default=[Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20231001')],
+                        help='Release Verzeichnisse')
+    parser.add_argument('--parser', choices=util.PARSER_BACKENDS, default='html.parser',
+                        help='HTML Parser, mit dem die Dokumente gelesen werden')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Anzahl paralleler Prozesse (0 = Anzahl der Prozessorkerne)')
+    parser.add_argument('--summary', type=Path, help='Ergebnis je Datei als JSON Datei speichern')
+    parser.add_argument('--force', action='store_true',
+                        help='Alle Dateien extrahieren, auch wenn sie laut Manifest aktuell sind')
+    parser.add_argument('--stream', action='store_true',
+                        help='AHB Dokumente tabellenweise lesen, ohne den ganzen Dokumentbaum aufzubauen. Tabellen '
+                             'mit bereits geschriebenen PIDs werden dabei als eigener Block angehängt')
+    parser.add_argument('--format', nargs='+', choices=sink.FORMATS, default=['excel'],
+                        help='Ausgabeformate, z.B. --format parquet excel')
+    parser.add_argument('--ahb-layout', choices=extract_ahb.LAYOUTS, default='wide',
+                        help='Anwendungsfälle als breites Sheet (eine Zeile je PID) oder normalisiert als Elemente '
+                             'und Bedingungen je PID')
+    parser.add_argument('--metrics', type=Path, help='Laufzeit und Speicher je Datei als JSON Lines speichern')
+    parser.add_argument('--memory', action='store_true',
+                        help='Spitzenspeicher je Schritt messen (tracemalloc, verlangsamt die Extraktion)')
+    parser.add_argument('--profile', type=Path, help='Je Datei ein cProfile <Release>_<Dokument>.prof in diesem Verzeichnis speichern')
+    parser.add_argument('--slowest', type=int, default=0, help='Die N langsamsten Tabellen ausgeben')
+    parser.add_argument('--progress', action='store_true', help='Fortschritt und Durchsatz ausgeben')
+    args = parser.parse_args()
+
+    options = DataClassOptions(backend=args.parser, stream=args.stream, formats=tuple(args.format),
+                               memory=args.memory, profile=args.profile, layout=args.ahb_layout)
+    summary = extract_releases(args.paths, options=options, jobs=args.jobs or os.cpu_count(), force=args.force,
+                               progress=args.progress)
+    print(summary.report())
+    if args.slowest:
+        print(summary.slowest_tables(args.slowest))
+    if args.summary:
+        summary.to_json(args.summary)
+    if args.metrics:
+        summary.to_jsonl(args.metrics)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.ERROR)
+    main()
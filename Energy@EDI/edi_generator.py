@@ -0,0 +1,280 @@
+"""
+Erzeugt synthetische EDI@Energy Dokumente im HTML-Format, wie Word sie beim Speichern als HTML schreibt.
+
+Die Dokumente enthalten genau die Strukturen, die von extract_mig, extract_ahb und extract_ebd erwartet werden:
+grau (#D8DFE4) hinterlegte Kopfzellen, Anwendungsfälle mit "EDIFACT Struktur" und PIDs im Kopf,
+Segmentlayouts, EBD Tabellen mit rowspan und Änderungshistorien ("Änd-ID").
+Die Größe der Dokumente (Anzahl PIDs, Segmente, Tabellen) ist einstellbar.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+import argparse
+import random
+
+GREY = '#D8DFE4'
+TD_STYLE = "width:60.0pt;border:solid windowtext 1.0pt;background:{bg};padding:0cm 5.4pt 0cm 5.4pt"
+
+@dataclass
+class DataClassGeneratorConfig:
+    seed: int = 1
+    # AHB
+    use_cases: int = 10
+    pids: int = 4
+    segment_groups: int = 8
+    qualifiers: int = 3
+    rows_per_table: int = 25
+    malformed_rate: float = 0.0
+    # MIG
+    segments: int = 40
+    # EBD
+    ebds: int = 40
+    steps: int = 6
+    code_lists: int = 10
+    # Änderungshistorie
+    changes: int = 20
+    # Nach jeder n-ten Tabelle beginnt ein neuer Abschnitt (div WordSection), wie bei Abschnittsumbrüchen in Word.
+    # 0: das ganze Dokument in einem Abschnitt
+    section_tables: int = 0
+
+def td(content, bg='white', rowspan=1):
+    span = f' rowspan={rowspan}' if rowspan != 1 else ''
+    return f"<td valign=top{span} style='{TD_STYLE.format(bg=bg)}'>\n{content}</td>\n"
+
+def p(text, margin='0pt'):
+    return f"<p class=MsoNormal style='margin-left:{margin}'><span style='color:black'>{text}</span></p>\n"
+
+def p_bold(text, margin='0pt'):
+    return f"<p class=MsoNormal style='margin-left:{margin}'><b><span style='color:black'>{text}</span></b></p>\n"
+
+def tr(*cols):
+    return "<tr>\n" + "".join(cols) + "</tr>\n"
+
+def table(rows):
+    return "<table class=MsoNormalTable border=1 cellspacing=0 cellpadding=0>\n" + "".join(rows) + "</table>\n"
+
+def heading(level, text):
+    return f"<h{level}><span>{text}</span></h{level}>\n"
+
+def document(body, section_tables=0):
+    sections = []
+    tables = 0
+    for part in body:
+        sections.append(part)
+        if part.startswith('<table'):
+            tables += 1
+            if section_tables and tables % section_tables == 0:
+                sections.append(f"</div>\n<div class=WordSection{tables // section_tables + 1}>\n")
+    return "<html>\n<head>\n<meta http-equiv=Content-Type content='text/html; charset=utf-8'>\n</head>\n" \
+           "<body lang=DE>\n<div class=WordSection1>\n" + "".join(sections) + "</div>\n</body>\n</html>\n"
+
+def change_history(rnd, changes):
+    rows = [tr(*[td(p(t), bg=GREY) for t in ('Änd-ID', 'Ort', 'Bisher', 'Neu', 'Grund der Anpassung', 'Status')]),
+            tr(*[td(p(t), bg=GREY) for t in ('', '', '', '', '', '')])]
+    for i in range(changes):
+        rows.append(tr(td(p(str(10000 + i))), td(p(f'Kapitel {rnd.randint(1, 9)}')), td(p('alter Text')),
+                       td(p('neuer Text')), td(p('Fehlerkorrektur')), td(p('genehmigt'))))
+        if rnd.random() < 0.2:
+            # Fortsetzung auf der nächsten Seite
+            rows.append(tr(td(p('')), td(p('Fortsetzung')), td(p('')), td(p('mehr Text')), td(p('')), td(p(''))))
+    return [heading(1, 'Änderungshistorie'), table(rows)]
+
+# ---------------------------------------------------------------------------------------------------------------------
+# AHB
+# ---------------------------------------------------------------------------------------------------------------------
+def _columns(pid_count):
+    # Startpositionen der PID Spalten innerhalb einer Zeile der Datenelementspalte
+    return [30 + 10 * i for i in range(pid_count)]
+
+def _line(cols, texts, prefix=''):
+    line = prefix
+    for col, text in zip(cols, texts):
+        line = line.ljust(max(col, len(line) + 3)) + text
+    return line
+
+def _status_row(rnd, structure, cols, statuses, condition=''):
+    return tr(td(structure), td(p(_line(cols, statuses))), td(p(condition)))
+
+def _de_row(structure, name, cols, conds, condition=''):
+    line = _line(cols, conds, prefix=' ' * len(name))[len(name):]
+    para = f"<p class=MsoNormal style='margin-left:0pt'><span style='color:gray'>{name}</span>" \
+           f"<span style='color:black'>{line}</span></p>\n"
+    return tr(td(structure), td(para), td(p(condition)))
+
+def _qual_row(rnd, structure, cols, quals, malformed_rate):
+    paras = []
+    for qual, descr in quals:
+        cond_line = _line(cols, ['X'] * len(cols), prefix=' ' * (len(qual) + 3 + len(descr)))
+        rest = cond_line[len(qual):]
+        sep = '' if rnd.random() < malformed_rate else '   '
+        rest = sep + descr + rest[3 + len(descr):]
+        paras.append(f"<p class=MsoNormal style='margin-left:0pt'><b><span style='color:black'>{qual}</span></b>"
+                     f"<span style='color:black'>{rest}</span></p>\n")
+        if rnd.random() < 0.3:
+            paras.append(f"<p class=MsoNormal style='margin-left:35.4pt'><span style='color:black'>"
+                         f"Fortsetzung {descr}</span></p>\n")
+    return tr(td(structure), td("".join(paras)), td(p('')))
+
+def _structure(*tokens):
+    # Das erste Token ist fett, die folgenden nicht
+    first, *rest = tokens
+    html = f"<b><span style='color:black'>{first}</span></b>"
+    for t in rest:
+        html += f"<span style='color:black'> {t}</span>"
+    return f"<p class=MsoNormal style='margin-left:0pt'>{html}</p>\n"
+
+def ahb_use_case_rows(rnd, pids, cfg):
+    cols = _columns(len(pids))
+    rows = [tr(td(p('Nachrichten-Kopfsegment')), td(p('')), td(p(''))),
+            _status_row(rnd, _structure('UNH'), cols, ['Muss'] * len(cols)),
+            _de_row(_structure('UNH', '0062'), 'Nachrichten-Referenz', cols, ['X'] * len(cols)),
+            _qual_row(rnd, _structure('UNH', '0065'), cols, [('UTILMD', 'Netzanschluss')], 0.0)]
+    cond_no = 1
+    for g in range(cfg.segment_groups):
+        sgr = f'SG{g + 2}'
+        sub = sorted(rnd.sample(range(len(cols)), rnd.randint(1, len(cols))))
+        sub_cols = [cols[i] for i in sub]
+        rows.append(tr(td(p(f'Segmentgruppe {g}')), td(p('')), td(p(''))))
+        rows.append(_status_row(rnd, _structure(sgr), sub_cols, [rnd.choice(('Muss', 'Kann', 'Soll')) for _ in sub],
+                                f'[{cond_no}] Wenn Bedingung {cond_no} erfüllt'))
+        cond_no += 1
+        for seg in ('NAD', 'RFF', 'DTM'):
+            rows.append(_status_row(rnd, _structure(sgr, seg), sub_cols,
+                                    [f'Muss [{cond_no}]' for _ in sub], f'[{cond_no}] Wenn Segment vorhanden'))
+            cond_no += 1
+            rows.append(_de_row(_structure(sgr, seg, '3035'), 'Beteiligter', sub_cols, ['X'] * len(sub)))
+            quals = [(rnd.choice(('Z01', 'Z02', 'MS', 'MR', 'DP', 'ZZ9')), f'Qualifier {q}')
+                     for q in range(cfg.qualifiers)]
+            rows.append(_qual_row(rnd, _structure(sgr, seg, '1153'), sub_cols, quals, cfg.malformed_rate))
+    rows.append(tr(td(p('Nachrichten-Endesegment')), td(p('')), td(p(''))))
+    rows.append(_status_row(rnd, _structure('UNT'), cols, ['Muss'] * len(cols)))
+    rows.append(_de_row(_structure('UNT', '0074'), 'Anzahl Segmente', cols, ['X'] * len(cols)))
+    return rows
+
+def ahb(cfg=DataClassGeneratorConfig()):
+    rnd = random.Random(cfg.seed)
+    body = change_history(rnd, cfg.changes)
+    body.append(heading(1, 'Anwendungsfälle'))
+    for u in range(cfg.use_cases):
+        pids = [str(11001 + u * cfg.pids + i) for i in range(cfg.pids)]
+        body.append(heading(2, f'Anwendungsfall {u + 1}'))
+        header = tr(td(p('EDIFACT Struktur'), bg=GREY),
+                    td(p('Beschreibung') + p('Prüfidentifikator') + p('   '.join(pids)), bg=GREY),
+                    td(p('Bedingung'), bg=GREY))
+        rows = ahb_use_case_rows(rnd, pids, cfg)
+        chunks = [rows[i:i + cfg.rows_per_table] for i in range(0, len(rows), cfg.rows_per_table)]
+        body.append(table([header] + chunks[0]))
+        for chunk in chunks[1:]:
+            body.append(p(''))
+            body.append(table(chunk))
+    return document(body, cfg.section_tables)
+
+# ---------------------------------------------------------------------------------------------------------------------
+# MIG
+# ---------------------------------------------------------------------------------------------------------------------
+SEGMENTS = ('UNH', 'BGM', 'DTM', 'NAD', 'RFF', 'LOC', 'QTY', 'STS', 'IDE', 'CCI')
+
+def _struct_line(counter, no, seg):
+    return f"        {counter:04d}   {no}   {seg}   M   R   1   1   0   Segment {seg}"
+
+def mig(cfg=DataClassGeneratorConfig()):
+    rnd = random.Random(cfg.seed)
+    body = change_history(rnd, cfg.changes)
+    body.append(heading(1, 'Nachrichtenstruktur'))
+    segs = [(10 * (i + 1), i + 1, SEGMENTS[i % len(SEGMENTS)]) for i in range(cfg.segments)]
+    struct_rows = [tr(td(p('Status'), bg=GREY), td(p('Standard'), bg=GREY))]
+    for counter, no, seg in segs:
+        struct_rows.append(tr(td(p(_struct_line(counter, no, seg).replace(' ', '&nbsp;'))), td(p(''))))
+    body.append(table(struct_rows))
+
+    body.append(heading(1, 'Segmentlayout'))
+    for counter, no, seg in segs:
+        rows = [tr(td(p('Standard'), bg=GREY)),
+                tr(td(p(_struct_line(counter, no, seg)))),
+                tr(td(p('Standard')), td(p('BDEW'))),
+                tr(*[td(p(t)) for t in ('Bez', 'Name', 'Status', 'Format', 'Status', 'Format', 'Beschreibung')]),
+                tr(*[td(p(t)) for t in (seg, 'Segment', 'M', '', 'M', '', '')])]
+        rows.append(tr(td(p('C_S009')), td(p('Nachrichten-Kennung')), td(p('M')), td(p('')),
+                       td(p('M')), td(p('')), td(p(''))))
+        for d in range(3):
+            rows.append(tr(td(p(f'{65 + d:04d}', margin='7.2pt')), td(p(f'Datenelement {d}')), td(p('M')),
+                           td(p('an..6')), td(p('M')), td(p('an6')),
+                           td(p_bold(f'Z{d:02d}   Qualifier {d}') + p(f'Beschreibung Qualifier {d}'))))
+            rows.append(tr(td(p('')), td(p('')), td(p('')), td(p('')), td(p('')), td(p('')),
+                           td(p_bold(f'Z9{d}   Weiterer Qualifier'))))
+        rows.append(tr(td(p('0062')), td(p('Referenz')), td(p('M')), td(p('an..14')), td(p('M')), td(p('an..14')),
+                       td(p('Eindeutige Referenz'))))
+        rows.extend([tr(td(p('Bemerkung:'))), tr(td(p(f'Bemerkung zu {seg}'))),
+                     tr(td(p('Beispiel:'))), tr(td(p(f"{seg}+1+UTILMD:D:11A:UN:S2.1'")))])
+        body.append(p(''))
+        body.append(table(rows))
+    return document(body, cfg.section_tables)
+
+# ---------------------------------------------------------------------------------------------------------------------
+# EBD
+# ---------------------------------------------------------------------------------------------------------------------
+def ebd(cfg=DataClassGeneratorConfig()):
+    rnd = random.Random(cfg.seed)
+    body = change_history(rnd, cfg.changes)
+    for e in range(cfg.ebds):
+        if e % 10 == 0:
+            body.append(heading(1, f'Festlegung {e // 10 + 1}'))
+        if e % 3 == 0:
+            body.append(heading(2, f'AD: Aktivität {e // 3 + 1}'))
+        body.append(heading(3, f'E_{400 + e:04d}_Prüfen, ob Vorgang {e} zulässig'))
+        rows = [tr(td(p('Prüfende Rolle: NB'), bg=GREY)),
+                tr(*[td(p(t), bg=GREY) for t in ('Nr.', 'Prüfschritt', 'Prüfergebnis', 'Code', 'Hinweis')])]
+        tables = [rows]
+        for s in range(cfg.steps):
+            level = rnd.choice(('white', '#BFBFBF', '#92D050', 'yellow'))
+            rows.append(tr(td(p(str(s + 1)), bg=level, rowspan=2), td(p(f'Ist Bedingung {s} erfüllt?'), rowspan=2),
+                           td(p('ja')), td(p(f'A{s:02d}')), td(p('Ablehnung'))))
+            rows.append(tr(td(p('nein')), td(p('')), td(p(f'Weiter mit {s + 2}'))))
+            if s == cfg.steps // 2:
+                # Seitenumbruch: Fortsetzung in neuer Tabelle
+                rows = []
+                tables.append(rows)
+        for rows in tables:
+            body.append(p(''))
+            body.append(table(rows))
+        if e < cfg.code_lists:
+            body.append(p(f'S_{e:04d}_Codeliste {e}'))
+            rows = [tr(*[td(p(t), bg=GREY) for t in ('Code', 'Nutzung', 'Bedingung', 'Name')])]
+            for c in range(cfg.steps):
+                rows.append(tr(td(p(f'Z{c:02d}')), td(p('X')), td(p(f'[{c}]')), td(p(f'Code {c}'))))
+            body.append(table(rows))
+    return document(body, cfg.section_tables)
+
+def write(path, html):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return path
+
+def write_release(path, cfg=DataClassGeneratorConfig()):
+    """
+    Schreibt ein synthetisches Release Verzeichnis (je ein MIG, AHB und EBD Dokument sowie ein sonstiges Dokument)
+    :param path: Release Verzeichnis, z.B. .../EDI_ENERGY/20231001
+    :return: Liste der geschriebenen Dateien
+    """
+    path = Path(path) / '_Extractions'
+    return [write(path / 'UTILMD_MIG_S2_1_synthetisch.HTML', mig(cfg)),
+            write(path / 'UTILMD_AHB_Strom_2_1_synthetisch.HTML', ahb(cfg)),
+            write(path / 'EBD_4_0_synthetisch.HTML', ebd(cfg)),
+            write(path / 'Allgemeine_Festlegungen_synthetisch.HTML', document(change_history(random.Random(cfg.seed),
+                                                                                             cfg.changes),
+                                                                              cfg.section_tables))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetisches Release Verzeichnis für Benchmarks erzeugen')
+    parser.add_argument('path', nargs='?', type=Path, default=Path('EDI_ENERGY/20991231'), help='Release Verzeichnis')
+    defaults = DataClassGeneratorConfig()
+    for name, value in vars(defaults).items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=type(value), default=value)
+    args = vars(parser.parse_args())
+    path = args.pop('path')
+    for file in write_release(path, DataClassGeneratorConfig(**args)):
+        print(file)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Zusammengeführte Extrakte aller Releases in einer SQLite Datenbank.
+
+Für jedes Sheet (Anwendungsfälle, Segmentlayout, EBD, Änderungshistorie ...) gibt es eine Tabelle mit den
+Spalten datum (Release Verzeichnis) und file (Name des Extraktes) sowie den Spalten des Sheets.
+In der Tabelle sources wird festgehalten, aus welcher Excel Datei (Hash) die Zeilen eines Extraktes stammen.
+
+Beim Einlesen werden nur neue oder geänderte Extrakte gelesen. Die Zeilen eines Extraktes werden in einer
+Transaktion gelöscht und neu geschrieben, so dass eine Abfrage nie einen halb ersetzten Extrakt sieht.
+Auf PID, Format, Segment, Datenelement, Qualifier und Änd-ID liegt jeweils ein Index zusammen mit datum.
+
+Beispiele:
+    python edi_store.py --path /.../EDI_ENERGY ingest
+    python edi_store.py query Anwendungsfälle --where PID=55001 --datum 20231001
+    python edi_store.py query Anwendungsfälle --where PID=55001 --explain
+"""
+from pathlib import Path
+import argparse
+import json
+import logging
+import sqlite3
+import pandas as pd
+import concat
+import manifest
+import sink
+
+STORE_NAME = 'edi_store.sqlite'
+
+# Spalten, auf die ein Index gelegt wird, sofern sie im Sheet vorkommen
+INDEX_COLUMNS = ('PID', 'Format', 'Segment', 'Datenelement', 'Qualifier', 'Änd-ID')
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def db_value(value):
+    # Ganzzahlige Werte, die pandas wegen fehlender Werte als float liest, als Ganzzahl speichern (55001 statt 55001.0)
+    value = sink.cell_value(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def connect(file):
+    """
+    Öffnet die Datenbank. Transaktionen werden explizit mit BEGIN/COMMIT gesteuert.
+    """
+    connection = sqlite3.connect(file, isolation_level=None)
+    connection.execute("""CREATE TABLE IF NOT EXISTS sources (
+                              datum TEXT NOT NULL,
+                              file TEXT NOT NULL,
+                              hash TEXT,
+                              size INTEGER,
+                              mtime_ns INTEGER,
+                              sheets TEXT,
+                              PRIMARY KEY (datum, file))""")
+    return connection
+
+def get_columns(connection, table):
+    """
+    Spalten einer Tabelle. SQLite unterscheidet bei Spaltennamen nicht zwischen Groß- und Kleinschreibung.
+    :return: dict Spaltenname in Kleinbuchstaben -> Spaltenname
+    """
+    return {row[1].lower(): row[1] for row in connection.execute(f'PRAGMA table_info({quote(table)})')}
+
+def ensure_table(connection, sheet, columns):
+    """
+    Legt die Tabelle eines Sheets an bzw. ergänzt fehlende Spalten und Indizes
+    """
+    existing = get_columns(connection, sheet)
+    if not existing:
+        connection.execute(f'CREATE TABLE {quote(sheet)} (datum TEXT NOT NULL, file TEXT NOT NULL)')
+        connection.execute(f'CREATE INDEX {quote(f"ix_{sheet}_source")} ON {quote(sheet)} (datum, file)')
+        existing = get_columns(connection, sheet)
+
+    for column in columns:
+        if str(column).lower() not in existing:
+            connection.execute(f'ALTER TABLE {quote(sheet)} ADD COLUMN {quote(column)} TEXT')
+            existing[str(column).lower()] = str(column)
+
+    for column in INDEX_COLUMNS:
+        if column.lower() in existing:
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {quote(f"ix_{sheet}_{column}")} '
+                               f'ON {quote(sheet)} ({quote(existing[column.lower()])}, datum)')
+
+def source_key(file):
+    # Release (Verzeichnis über _Extractions) und Name des Extraktes
+    return file.parent.parent.stem, file.stem
+
+def is_up_to_date(connection, file):
+    datum, name = source_key(file)
+    row = connection.execute('SELECT hash, size, mtime_ns FROM sources WHERE datum = ? AND file = ?',
+                             (datum, name)).fetchone()
+    if row is None:
+        return False
+    stat = file.stat()
+    if (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+        return True
+    if row[0] != manifest.file_hash(file):
+        return False
+    # Nur der Änderungszeitpunkt hat sich geändert
+    connection.execute('UPDATE sources SET size = ?, mtime_ns = ? WHERE datum = ? AND file = ?',
+                       (stat.st_size, stat.st_mtime_ns, datum, name))
+    return True
+
+def replace_source(connection, file, frames):
+    """
+    Ersetzt die Zeilen eines Extraktes in allen Sheet Tabellen in einer Transaktion
+    :param file: Excel Extrakt
+    :param frames: dict Sheet -> DataFrame
+    """
+    datum, name = source_key(file)
+    for sheet, df in frames.items():
+        ensure_table(connection, sheet, df.columns)
+
+    stat = file.stat()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        for sheet in tables(connection):
+            connection.execute(f'DELETE FROM {quote(sheet)} WHERE datum = ? AND file = ?', (datum, name))
+        for sheet, df in frames.items():
+            columns = ['datum', 'file'] + [str(c) for c in df.columns]
+            connection.executemany(f'INSERT INTO {quote(sheet)} ({", ".join(map(quote, columns))}) '
+                                   f'VALUES ({", ".join("?" * len(columns))})',
+                                   ([datum, name] + [db_value(v) for v in row]
+                                    for row in df.itertuples(index=False, name=None)))
+        connection.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)',
+                           (datum, name, manifest.file_hash(file), stat.st_size, stat.st_mtime_ns,
+                            json.dumps(list(frames), ensure_ascii=False)))
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+
+def remove_source(connection, datum, name):
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        for sheet in tables(connection):
+            connection.execute(f'DELETE FROM {quote(sheet)} WHERE datum = ? AND file = ?', (datum, name))
+        connection.execute('DELETE FROM sources WHERE datum = ? AND file = ?', (datum, name))
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+
+def tables(connection):
+    """
+    Tabellen der Sheets (ohne sources)
+    """
+    return [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                                 "AND name != 'sources' ORDER BY name")]
+
+def ingest(connection, path, prune=True):
+    """
+    Liest alle neuen oder geänderten Excel Extrakte unterhalb von path in die Datenbank
+    :param path: Verzeichnis mit den Release Verzeichnissen, z.B. .../EDI_ENERGY
+    :param prune: Extrakte entfernen, deren Excel Datei nicht mehr vorhanden ist
+    :return: (Anzahl eingelesen, Anzahl unverändert, Anzahl entfernt)
+    """
+    files = list(Path(path).rglob('_Extractions/*.xlsx'))
+    read = 0
+    unchanged = 0
+    for file in files:
+        if is_up_to_date(connection, file):
+            unchanged += 1
+            continue
+        logging.info(f'Einlesen {file}')
+        frames = concat.read_sheets(file, concat.get_sheets(file))
+        replace_source(connection, file, frames)
+        read += 1
+
+    removed = 0
+    if prune:
+        current = {source_key(file) for file in files}
+        for datum, name in connection.execute('SELECT datum, file FROM sources').fetchall():
+            if (datum, name) not in current:
+                remove_source(connection, datum, name)
+                removed += 1
+    return read, unchanged, removed
+
+def build_query(connection, sheet, where=None, datum=None):
+    """
+    SQL für die Zeilen eines Sheets, die allen Bedingungen entsprechen
+    :param where: dict Spalte -> Wert
+    :param datum: Release, z.B. '20231001'
+    :return: (SQL, Parameter)
+    """
+    columns = get_columns(connection, sheet)
+    if not columns:
+        raise ValueError(f'Sheet {sheet} ist nicht in der Datenbank. Vorhanden sind {tables(connection)}')
+
+    conditions = []
+    params = []
+    for column, value in (where or {}).items():
+        if column.lower() not in columns:
+            raise ValueError(f'Spalte {column} gibt es in {sheet} nicht')
+        conditions.append(f'{quote(columns[column.lower()])} = ?')
+        params.append(str(value))
+    if datum is not None:
+        conditions.append('datum = ?')
+        params.append(str(datum))
+
+    sql = f'SELECT * FROM {quote(sheet)}'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    return sql, params
+
+def query(connection, sheet, where=None, datum=None):
+    """
+    Zeilen eines Sheets, z.B. query(connection, 'Anwendungsfälle', {'PID': '55001'}, '20231001')
+    :return: DataFrame
+    """
+    sql, params = build_query(connection, sheet, where, datum)
+    return pd.read_sql_query(sql, connection, params=params)
+
+def explain(connection, sheet, where=None, datum=None):
+    """
+    Abfrageplan von SQLite, z.B. um zu prüfen, dass ein Index verwendet wird
+    """
+    sql, params = build_query(connection, sheet, where, datum)
+    return [row[-1] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+def parse_where(conditions):
+    """
+    Wandelt ['PID=55001', 'Segment=NAD'] in {'PID': '55001', 'Segment': 'NAD'}
+    """
+    where = {}
+    for condition in conditions:
+        column, sep, value = condition.partition('=')
+        if sep == '':
+            raise argparse.ArgumentTypeError(f'Bedingung {condition} hat nicht die Form Spalte=Wert')
+        where[column.strip()] = value.strip()
+    return where
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite Datenbank der zusammengeführten Extrakte')
+    parser.add_argument('--store', type=Path, help=f'Datenbank, Standard <path>/{STORE_NAME}')
+    parser.add_argument('--path', type=Path,
+                        default=Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY'),
+                        help='Verzeichnis mit den Release Verzeichnissen')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = sub.add_parser('ingest', help='Neue und geänderte Extrakte einlesen')
+    ingest_parser.add_argument('--keep', action='store_true', help='Entfernte Extrakte nicht löschen')
+
+    query_parser = sub.add_parser('query', help='Zeilen eines Sheets abfragen')
+    query_parser.add_argument('sheet')
+    query_parser.add_argument('--where', nargs='*', default=[], help='Bedingungen der Form Spalte=Wert')
+    query_parser.add_argument('--datum', help='Release, z.B. 20231001')
+    query_parser.add_argument('--csv', type=Path, help='Ergebnis als CSV Datei speichern')
+    query_parser.add_argument('--explain', action='store_true', help='Nur den Abfrageplan ausgeben')
+
+    sub.add_parser('sources', help='Eingelesene Extrakte anzeigen')
+
+    args = parser.parse_args()
+    connection = connect(args.store or args.path / STORE_NAME)
+    match args.command:
+        case 'ingest':
+            read, unchanged, removed = ingest(connection, args.path, prune=not args.keep)
+            print(f'{read} Extrakte eingelesen, {unchanged} unverändert, {removed} entfernt')
+
+        case 'query':
+            where = parse_where(args.where)
+            if args.explain:
+                print(*explain(connection, args.sheet, where, args.datum), sep='\n')
+                return
+            df = query(connection, args.sheet, where, args.datum)
+            if args.csv:
+                df.to_csv(args.csv, index=False)
+            else:
+                print(df.to_string(index=False))
+
+        case 'sources':
+            print(pd.read_sql_query('SELECT datum, file, sheets FROM sources ORDER BY datum, file',
+                                    connection).to_string(index=False))
+    connection.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
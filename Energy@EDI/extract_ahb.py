@@ -1,17 +1,36 @@
-from bs4 import BeautifulSoup
 import re
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from dataclasses import dataclass, field
 from itertools import filterfalse
 import logging
+import ahb_lexer
+import column_builder
+import instrument
+import manifest
+import sink
+import stream_reader
 import util
 
+# Tags, die der Extraktor liest und die beim Parsen mit Strainer erhalten bleiben:
+# Tabellen und Überschriften (für das Kapitel der Anwendungsfälle)
+STRAINER_TAGS = ('table',) + util.HEADINGS
+
+# siehe manifest
+VERSION = '2'
+
 re_ahb_status = re.compile(r'Muss|Kann|Soll')
 @dataclass
 class DataClassContext:
     path: str = ''
     format: str = ''
+    # Behobene Syntaxfehler in den Datenelementspalten
+    recovered: int = 0
+    # Bedingungen, die keiner PID zugeordnet werden konnten (##nicht ermittelbar##)
+    undetermined: int = 0
+    # Anzahl der geschriebenen Datenelemente, ergibt im normalisierten Layout die Spalte 'Element'
+    elements: int = 0
 
 # @dataclass
 # class DataClassChangeHistory:
@@ -34,29 +53,71 @@ class DataClassQualifier:
     qual_descr: str = ""
     operands: list[str] = field(default_factory=list)
 
+# Felder der Bedingungen eines Datenelementes bzw. Qualifiers für eine PID
+PID_FIELDS = ('pid', 'sgr_cond', 'seg_cond', 'condition')
+
 @dataclass
 class DataClassDataElement:
+    """
+    Spalten eines Datenelementes bzw. Qualifiers einer Zeile des Anwendungsfalls, die für alle PIDs gleich sind.
+    Die Datenelemente werden spaltenweise in DataClassUseCase.elements gesammelt, die Bedingungen je PID
+    (PID_FIELDS) in DataClassUseCase.pid_rows.
+    """
     format: str = ""
     head: str = ""
-    pid: str = ""
     seg_name: str = ""
     sgr: str = ""
-    sgr_cond: str = ""
     seg: str = ""
-    seg_cond: str = ""
     de: str = ""
     de_descr: str = ""
     qual: str = ""
     qual_descr: str = ""
-    condition: str = ""
     raw_condition: str = ""
     error: str = ""
     raw: str = ""
 
+# Ausgabe der Anwendungsfälle:
+# wide:       ein Sheet 'Anwendungsfälle' mit einer Zeile je Datenelement und PID
+# normalized: die Datenelemente einmal in 'Anwendungsfälle_Elemente' und die Bedingungen je PID in
+#             'Anwendungsfälle_PID', verbunden über die Spalte 'Element'. wide_use_cases baut daraus das
+#             Sheet 'Anwendungsfälle' auf.
+LAYOUTS = ('wide', 'normalized')
+
+USE_CASE_SHEET = 'Anwendungsfälle'
+ELEMENT_SHEET = 'Anwendungsfälle_Elemente'
+PID_SHEET = 'Anwendungsfälle_PID'
+
+# Spalten des Sheets 'Anwendungsfälle' (Feld in DataClassDataElement bzw. PID_FIELDS -> Spaltenüberschrift)
+USE_CASE_COLUMNS = {'format': 'format',
+                    'head': 'Kapitel',
+                    'pid': 'PID',
+                    'seg_name': 'Segmentname',
+                    'sgr': 'Segmentgruppe',
+                    'sgr_cond': 'Segmentgruppe Bedingung',
+                    'seg': 'Segment',
+                    'seg_cond': 'Segment Bedingung',
+                    'de': 'Datenelement',
+                    'de_descr': 'Datenelement Beschreibung',
+                    'qual': 'Qualifier',
+                    'qual_descr': 'Qualifier Beschreibung',
+                    'condition': 'Bedingung',
+                    'raw_condition': 'Bedingung (ohne PID Zuordnung)',
+                    'error': 'Fehler',
+                    'raw': 'Fehlerdaten'}
+
+# Spalte, die Elemente und Bedingungen je PID verbindet
+ELEMENT_ID = 'Element'
+
+# Felder von DataClassDataElement, die im normalisierten Layout in 'Anwendungsfälle_Elemente' stehen
+ELEMENT_FIELDS = [name for name in USE_CASE_COLUMNS if name not in PID_FIELDS]
+
+# Spalten der Sheets 'Anwendungsfälle_Elemente' und 'Anwendungsfälle_PID' im normalisierten Layout
+ELEMENT_COLUMNS = [ELEMENT_ID] + [USE_CASE_COLUMNS[name] for name in ELEMENT_FIELDS]
+PID_COLUMNS = [ELEMENT_ID] + [USE_CASE_COLUMNS[name] for name in PID_FIELDS]
+
 def filter_white_rows(row):
     for col in row.find_all('td'):
-        for style_option in col['style'].split(';'):
-            key, value = style_option.split(':')
+        for key, value in util.get_style_dict(col).items():
             if key.endswith('background'):
                 if value == 'white':
                     return True
@@ -85,65 +146,85 @@ def get_pids_from_header(row):
         pid_tuple = ('PID_1', 'PID_2', 'PID_3', 'PID_4', 'PID_5',)
     return pid_tuple
 
-def get_head_str(headers, sourceline):
-    _, header = max([(h.sourceline, h) for h in headers if h.sourceline < sourceline])
+def heading_str(header):
     if header == None:
         return ""
     else:
         return " ".join(header.strings).strip().replace('\n', '')
 
+def get_head_str(heading_index, sourceline):
+    """
+    Überschrift (Kapitel) zu einer Tabelle
+    :param heading_index: util.DataClassHeadingIndex des Dokumentes
+    :param sourceline: Zeile, in der die Tabelle beginnt
+    """
+    return heading_str(heading_index.preceding(sourceline))
+
+def classify_table(t, pids):
+    """
+    Ordnet eine Tabelle der Änderungshistorie oder einem Anwendungsfall zu
+    :param t: Tabelle
+    :param pids: PIDs des zuletzt gelesenen Anwendungsfalls. Folgetabellen werden diesem zugeordnet.
+    :return: ('ChangeHist'|'UseCase'|None, PIDs des Anwendungsfalls)
+    """
+    first_row = t.find('tr')
+    # Lesen der ersten Spalte, die nicht leer ist.
+    # Hintergrund: für die Änderungshistorie, wird manchmal eine zusätzliche Spalte
+    # eingschoben, die überlesen werden muss
+    col_it = first_row.find_all('td').__iter__()
+    try:
+        while True:
+            first_col = col_it.__next__()
+            first_text = util.get_text(first_col).replace('\n', '').strip()
+            if first_text != '':
+                break
+    except StopIteration:
+        return None, pids
+
+
+    # first_col = first_row.find('td')
+    style_dict_first_col = util.get_style_dict(first_col)
+
+    first_text = util.get_text(first_col).replace('\n', '').strip()
+
+    # Prüfen, ob die erste Spalte grau hinterlegt ist
+    if style_dict_first_col.get('background', ' ') == '#D8DFE4':
+        # Lesen des ersten Textes in der ersten Spalte
+        if first_text.startswith('Änd-ID'):
+            return 'ChangeHist', pids
+
+        # Header-Tabelle eines Anwendungsfalls
+        elif re.match(r'^EDIFACT\s+Struktur', first_text):
+            return 'UseCase', get_pids_from_header(first_row)
+
+    else:
+        # Wenn Spalte nicht grau hinterlegt ist, die Anzahl der Spalten prüfen.
+        # Das ist ein schwaches Kriterium, aber ein besseres fällt mir im Moment nicht ein,
+        # um die Folgetabellen der Anwendungsfälle zu identifizieren
+        if len(first_row.find_all('td')) == 3:
+            return 'UseCase', pids
+
+    return None, pids
+
 def get_table_index(edi_doc):
     change_hist = []
     use_cases = {}
     pids = ()
 
-    headers = list(edi_doc.find_all(re.compile("^h\d")))
+    heading_index = util.get_heading_index(edi_doc, re.compile("^h\d"))
     for t in edi_doc.find_all('table'):
-        first_row = t.find('tr')
-        # Lesen der ersten Spalte, die nicht leer ist.
-        # Hintergrund: für die Änderungshistorie, wird manchmal eine zusätzliche Spalte
-        # eingschoben, die überlesen werden muss
-        col_it = first_row.find_all('td').__iter__()
-        try:
-            while True:
-                first_col = col_it.__next__()
-                first_text = util.get_text(first_col).replace('\n', '').strip()
-                if first_text != '':
-                    break
-        except StopIteration:
-            continue
-
-
-        # first_col = first_row.find('td')
-        style_dict_first_col = util.get_style_dict(first_col)
-
-        first_text = util.get_text(first_col).replace('\n', '').strip()
-
-        # Prüfen, ob die erste Spalte grau hinterlegt ist
-        if style_dict_first_col.get('background', ' ') == '#D8DFE4':
-            # Lesen des ersten Textes in der ersten Spalte
-            if first_text.startswith('Änd-ID'):
+        table_type, pids = classify_table(t, pids)
+        match table_type:
+            case 'ChangeHist':
                 change_hist.append(t)
 
-            # Header-Tabelle eines Anwendungsfalls
-            elif re.match(r'^EDIFACT\s+Struktur', first_text):
-                pids = get_pids_from_header(first_row)
-                if pids not in use_cases:
-                    head_str = get_head_str(headers, t.sourceline)
-                    use_cases[pids] = (head_str, [])
-                use_cases[pids][1].append(t)
-
-        else:
-            # Wenn Spalte nicht grau hinterlegt ist, die Anzahl der Spalten prüfen.
-            # Das ist ein schwaches Kriterium, aber ein besseres fällt mir im Moment nicht ein,
-            # um die Folgetabellen der Anwendungsfälle zu identifizieren
-            if len(first_row.find_all('td')) == 3:
+            case 'UseCase':
                 if pids not in use_cases:
-                    head_str = get_head_str(headers, t.sourceline)
+                    head_str = get_head_str(heading_index, t.sourceline)
                     use_cases[pids] = (head_str, [])
                 use_cases[pids][1].append(t)
 
-    return {'ChangeHist': change_hist, 'UseCases': use_cases}
+    return {'ChangeHist': change_hist, 'UseCases': use_cases, 'Headings': heading_index}
 
 def first_col_item(col):
     # Ordnet aus der ersten Spalte den letzten Bezeichner entweder
@@ -195,7 +276,44 @@ def first_col_item(col):
         case _:
             raise Exception('Erste Spalte des Anwendungsfalls kann nicht interpretiert werden')
 
-def segment_pids(pids, start_pos_ref, data_element):
+class PidColumns:
+    """
+    Ordnet Positionen in einer Zeile der Datenelementspalte die PID zu, deren Startposition in der
+    UNH Referenzzeile am nächsten liegt. Bei gleichem Abstand gilt wie beim Sortieren von (Abstand, PID)
+    die kleinere PID.
+
+    Statt für jedes Fragment alle Abstände zu berechnen und zu sortieren, wird die Zuordnung für alle Positionen
+    bis zur letzten Referenzspalte einmal mit NumPy berechnet. Rechts davon liegt immer die letzte Spalte
+    am nächsten.
+    """
+    def __init__(self, start_pos_ref):
+        """
+        :param start_pos_ref: Liste (PID, Startposition) aus der UNH Referenzzeile
+        """
+        self.start_pos_ref = start_pos_ref
+        self.lookup = []
+        self.distance = []
+        if not start_pos_ref:
+            # Ohne Referenzspalten schlägt erst die Zuordnung fehl (IndexError)
+            return
+        pids = [pid for pid, _ in start_pos_ref]
+        ref = np.array([pos for _, pos in start_pos_ref])
+        # Rang der PID in der Sortierung als Text für die Entscheidung bei gleichem Abstand
+        rank = np.argsort(np.argsort(np.array(pids), kind='stable'), kind='stable')
+        distance = np.abs(np.arange(ref.max() + 1)[:, np.newaxis] - ref[np.newaxis, :])
+        nearest = np.argmin(distance * len(pids) + rank, axis=1)
+        self.distance = distance[np.arange(len(nearest)), nearest].tolist()
+        self.lookup = [pids[i] for i in nearest]
+
+    def nearest(self, pos):
+        """
+        :return: (PID, Abstand zur Startposition der PID)
+        """
+        if pos < len(self.lookup):
+            return self.lookup[pos], self.distance[pos]
+        return self.lookup[-1], self.distance[-1] + pos - len(self.lookup) + 1
+
+def segment_pids(pids, pid_columns, data_element):
     """
     Problem: Word ersetzt bei der Umwandlung in HTML die Tabulatoren zwischen den PID Bedingungen in Leerzeichen.
     Aufgrund der nichtproportional Schrift kann die Anzahl der Leerzeichen nicht ohne weiteres verwendet werden,
@@ -211,10 +329,10 @@ def segment_pids(pids, start_pos_ref, data_element):
     Segment verwendet werden, da hier immer für alle PIDs "Muss" angegeben ist. Für jeden AHB-Status
     werden die Zeichen vom Beginn der Zeile an gezählt und der entsprechende  AHb-Status aus der
     UNH-Referenzzeile ausgewählt, dessen Zeichenanzahl sich von diesem am wenigsten unterscheidet.
-    :param pid_tuple_doc:
-    :param unh_ref_line:
-    :param data_element:
-    :return:
+    :param pids: PIDs des Anwendungsfalls
+    :param pid_columns: PidColumns der UNH-Referenzzeile
+    :param data_element: Datenelementspalte der Segmentzeile
+    :return: dict PID -> Startposition und Abstand zur Referenzspalte
     """
     # Startpositionen der AHB-Status in erster Segmentzeile ermitteln
     first_line = get_line(data_element).__next__()
@@ -222,11 +340,8 @@ def segment_pids(pids, start_pos_ref, data_element):
 
     pids_seg = {}
     for sp in start_pos:
-        seq = [(abs(pos - sp), pid) for pid, pos in start_pos_ref]
-        seq.sort()
-        dif = [dif for dif , _ in seq]
         # Pid mit der kleinsten Abweichung nehmen
-        pid = seq[0][1]
+        pid, dif = pid_columns.nearest(sp)
         pids_seg[pid] = {'start': sp, 'dif': dif}
 
     return pids_seg
@@ -248,7 +363,7 @@ def split_pseudo_tab(str):
 
     return [(str[b:e], b) for b, e in zip(new[::2], new[1::2])]
 
-def seg_conditions(dataelement, segment_pids, start_pos_ref):
+def seg_conditions(dataelement, segment_pids, pid_columns):
     """
 
     :param column: Bedingungen für Segmentgruppen oder Segmente
@@ -258,9 +373,7 @@ def seg_conditions(dataelement, segment_pids, start_pos_ref):
     pids_seg = {}
     for line in get_line(dataelement):
         for column in split_pseudo_tab(line):
-            seq = [(abs(pos - column[1]), pid) for pid, pos in start_pos_ref]
-            seq.sort()
-            pid = seq[0][1]
+            pid, _ = pid_columns.nearest(column[1])
             if pid in pids_seg:
                 pids_seg[pid] = " ".join((pids_seg[pid], column[0]))
             else:
@@ -272,119 +385,11 @@ class DataClassCondition:
     name: str = ""
     descr: str = ""
 
-@dataclass
-class DataClassToken:
-    type: str = ""
-    pos: int = 0
-    strng: str = ""
-    line: int = 0
-
-def get_de_token(dataelement):
-    for line_no, p in enumerate(dataelement.find_all('p')):
-        pos = 0
-
-        # Style Optionen aus Paragraph in Dictionary schreiben
-        style_dict = {'color': '', 'margin-left': '0pt'}
-        if 'style' in p.attrs:
-            style_dict.update(dict([tuple(x) for x in [s.strip().split(':') for s in p['style'].split(';')]]))
-
-        look_ahead = " ".join(p.strings) + ' '
-        look_ahead = look_ahead.replace('\n','')
-
-        for ps in p.strings:
-            # Style Optionen aus Parent ( in der Regel SPAN) in Dictionary schreiben
-            if 'style' in ps.parent.attrs:
-                style_dict.update(dict([tuple(x) for x in [s.strip().split(':') for s in ps.parent['style'].split(';')]]))
-
-            # Fettdruck in Style_Dict aufnehmen
-            if ps.parent.parent.name == 'b':
-                style_dict['bold'] = True
-            else:
-                style_dict['bold'] = False
-
-            # Manchmal werden die Operanden nicht durch Strings, sondern innerhalb eines Strings
-            # durch Leerzeichen getrennt. Für diese Leerzeichenfolgen sollen einzelne Token erstellt werden.
-            # Per Definition werden Token ab einer Folge von drei oder mehr Leerzeichen als Trenner erzeugt
-            # re_split_tab = re.compile(r'(\s{3,})')
-            re_split_tab = re.compile(r'(\s{3,})')
-            str_list = re_split_tab.split(ps.replace('\n', ''))
-
-            for s in str_list:
-                if s == '':
-                    continue
-                strng = s.strip().replace('\n', '')
-
-                if s.strip() == '':
-                    type = 'empty'
-                    strng = s
-                elif style_dict['bold'] == True:
-                    # Prüfen ob innerhalb des Paragraphen noch Operanden Definitionen beginnen.
-                    # Dann handelt es sich um den Anfang eines neuen Qualifiers, ansonsten
-                    # wird ein in der Vorzeile beginnnender Qualifier fortgesetzt.
-                    # Kommt vor bei Anwendungsfällen mit vielen PIDs (z.B. 11116). Dort muss ein langer Qualifier
-                    # (z.B. UITLMD) auf die nächste Zeile umgebrochen werden
-                    re_operand = re.compile(r'X |M |S |K ')
-                    # Zeile ab der aktuellen Position
-                    rest_line = look_ahead[look_ahead.find(strng) + len(strng):]
-                    if re_operand.search(rest_line) == None:
-                        type = 'bold'
-                    else:
-                        type = 'bold_x'
-                elif style_dict['color'] == 'gray':
-                    type = 'gray'
-                elif float(style_dict['margin-left'][:-2]) > 20:
-                    type = 'indented'
-                else:
-                    if pos > 29:
-                        type = 'plain_c'
-                    else:
-                        type = 'plain'
-                    # Anhand der Position innerhalb einer Zeile wird unterschieden,
-                    # ob es sich Texte für Bedingungen handelt oder nicht.
-                    # Die Grenze wird bei Position 20 gezogen. Stichproben haben
-                    # ergeben, dass keine X vor 30 liegen und die Anfänge der Qualifier Beschreiber
-                    # höchstens bei 10. 20 liegt dazwischen
-                    # if pos > 20:
-                    if pos > 29:
-                        type = 'plain_c'
-                    else:
-                        type = 'plain'
-
-                    # # Es kann nicht mehr anhand der Position unterschieden werden,
-                    # # ob es sich um Text für Bedingungen handelt oder nicht.
-                    # # Stattdessen wird gegen die in Bedingungen möglichen Zeichen geprüft
-                    # if all(c in u'0123456789[]P.XSMKUB∧∨⊻()usanol ' for c in strng.replace('\xa0', '')):
-                    #     type = 'plain_c'
-                    # else:
-                    #     type = 'plain'
-
-
-                yield DataClassToken(type, pos, strng, line_no)
-
-                pos += len(s)
-        yield DataClassToken('newline', 0, '', line_no)
-
-def parse_conditions(token, tokens, conds):
-    cond = ''
-    while token.type in ('plain_c', 'indented'):
-        cond = "".join((cond, token.strng))
-        token = tokens.__next__()
-        if token.type == 'empty':
-            cond = "".join((cond, token.strng))
-            conds.append((cond, token.strng, token.line))
-            cond = ''
-            token = skip_empty(token, tokens)
-    if token.type != 'newline':
-        raise De_syntax_error(f'Erwartet "newline", empfangen "{token}"')
-    if cond != '':
-        conds.append((cond, '', token.line))
-    token = tokens.__next__()
-    token = skip_empty(token, tokens)
-
-    return token, conds
-
 def map_conditons(conds, pids):
     new_conds = {}
+    if not conds:
+        # Datenelement oder Qualifier ohne Bedingungen
+        return {'cond': new_conds, 'raw': ''}
     lines = {}
     for c in conds:
         if c[2] in lines:
@@ -404,15 +409,236 @@ def map_conditons(conds, pids):
         raw += c[0]
     return {'cond':new_conds, 'raw':raw}
 
-def skip_empty(token, tokens):
-    while token.type == 'empty':
-        token = tokens.__next__()
-    return token
+# Zustände von DataElementParser
+# Vor dem ersten Datenelement bzw. Qualifier
+START = 'start'
+# Zeilenanfang nach einer Zeile des Datenelementes
+DE_LINE = 'de_line'
+# Nach dem Qualifier, erwartet empty
+QUAL_SEP = 'qual_sep'
+# Erwartet die Beschreibung des Qualifiers
+QUAL_DESCR = 'qual_descr'
+# Weitere Teile der Beschreibung des Qualifiers
+QUAL_DESCR_MORE = 'qual_descr_more'
+# Zeilenanfang nach einer Zeile des Qualifiers
+QUAL_LINE = 'qual_line'
+# Nach der Fortsetzung eines Qualifiers (bold) in einer Folgezeile
+QUAL_BOLD = 'qual_bold'
+# Bedingungen bis zum Zeilenende
+COND = 'cond'
+# Nach dem Text einer Bedingung. empty schließt die Bedingung ab.
+COND_NEXT = 'cond_next'
+# Nach einem Syntaxfehler wird der Rest der Zeile überlesen
+SKIP = 'skip'
+
+class DataElementParser:
+    """
+    Zustandsautomat für die Datenelementspalte nach der Grammatik in parse_dataelement.
+    Für jeden Zustand legt TRANSITIONS fest, welche Funktion ein Token verarbeitet (None: alle übrigen Token).
+
+    Syntaxfehler werden lokal behoben: Fehlt beim Qualifier der Trenner oder die Beschreibung, wird mit den
+    Bedingungen fortgesetzt. Text vor Position 30 (plain) nach der Beschreibung gilt als Bedingung. Andere
+    unerwartete Token werden bis zum Zeilenende überlesen. Der Fehler und die überlesenen Texte werden beim
+    Datenelement bzw. Qualifier festgehalten. Nur wenn die Spalte weder Datenelement noch Qualifier enthält,
+    entsteht wie bisher eine reine Fehlerzeile.
+    """
+    def __init__(self, pids, context):
+        self.pids = pids
+        self.context = context
+        self.details_list = []
+        # Datenelement bzw. Qualifier, der gerade gelesen wird
+        self.details = None
+        # Text der aktuellen Bedingung
+        self.cond = ''
+        self.state = START
+        # Zustand am Anfang der nächsten Zeile
+        self.line_state = START
+        # Fehler und überlesene Texte vor dem ersten Datenelement bzw. Qualifier
+        self.errors = []
+        self.skipped = []
+
+    def parse(self, dataelement):
+        for token in ahb_lexer.iter_tokens(dataelement):
+            self.feed(token)
+        return self.finish(dataelement)
+
+    def feed(self, token):
+        handlers = TRANSITIONS[self.state]
+        handlers.get(token.type, handlers[None])(self, token)
+
+    def goto(self, state, token=None):
+        """
+        Wechselt den Zustand und verarbeitet token, falls angegeben, im neuen Zustand
+        """
+        self.state = state
+        if token is not None:
+            self.feed(token)
+
+    def open(self, details, line_state):
+        self.close()
+        details['conds'] = []
+        details['errors'] = self.errors
+        details['skipped'] = self.skipped
+        self.errors = []
+        self.skipped = []
+        self.details = details
+        self.line_state = line_state
+
+    def close(self):
+        if self.details is None:
+            return
+        details = self.details
+        details['conds'] = map_conditons(details['conds'], self.pids)
+        errors = details.pop('errors')
+        skipped = details.pop('skipped')
+        if errors:
+            details['error'] = "\n".join(errors)
+            details['raw'] = " ".join(skipped)
+        self.details_list.append(details)
+        self.details = None
+
+    def finish(self, dataelement):
+        # Die letzte Zeile endet immer mit newline, es steht also keine Bedingung mehr aus
+        self.close()
+        if not self.details_list and self.errors:
+            self.details_list.append({'error': "\n".join(self.errors), 'raw': " ".join(dataelement.strings),
+                                      'conds': {'cond': {}}})
+        return self.details_list
+
+    def error(self, message):
+        self.context.recovered += 1
+        logging.warning(f'Syntaxfehler behoben: {self.context.path} {message}, Pids: {self.pids}')
+        if self.details is None:
+            self.errors.append(message)
+        else:
+            self.details['errors'].append(message)
+
+    def skip(self, token):
+        if token.strng.strip() != '':
+            (self.skipped if self.details is None else self.details['skipped']).append(token.strng)
+
+    # Token Verarbeitung -----------------------------------------------------------------------------------------
+    def ignore(self, token):
+        pass
+
+    def unexpected(self, token):
+        # Unerwartetes Token am Zeilenanfang: Rest der Zeile überlesen
+        self.error(f'Erwartet kein Token, empfangen "{token}"')
+        self.goto(SKIP, token)
+
+    def start_de(self, token):
+        self.open({'de': token.strng}, DE_LINE)
+        self.goto(COND)
+
+    def continue_de(self, token):
+        self.details['de'] = " ".join((self.details['de'], token.strng))
+        self.goto(COND)
+
+    def start_qual(self, token):
+        self.open({'qual': token.strng, 'descr': ''}, QUAL_LINE)
+        self.goto(QUAL_SEP)
+
+    def qual_after_de(self, token):
+        # Qualifier nach der Beschreibung eines Datenelementes
+        self.error(f'Erwartet kein Token, empfangen "{token}"')
+        self.start_qual(token)
 
-class De_syntax_error(Exception):
-    pass
+    def qual_sep(self, token):
+        self.goto(QUAL_DESCR)
 
-def parse_dataelement(dataelement, pids):
+    def missing_sep(self, token):
+        self.error(f'Erwartet "empty", empfangen "{token}"')
+        if token.type == 'plain':
+            # Qualifier und Beschreibung ohne Trenner
+            self.qual_descr(token)
+        else:
+            self.goto(COND, token)
+
+    def qual_descr(self, token):
+        self.details['descr'] = token.strng
+        self.goto(QUAL_DESCR_MORE)
+
+    def missing_descr(self, token):
+        self.error(f'Erwartet "plain", empfangen "{token}"')
+        self.goto(COND, token)
+
+    def qual_descr_more(self, token):
+        self.details['descr'] = ''.join((self.details['descr'], token.strng))
+
+    def qual_indented(self, token):
+        self.details['descr'] = " ".join((self.details['descr'], token.strng))
+        self.goto(COND)
+
+    def qual_bold(self, token):
+        self.details['qual'] = "".join((self.details['qual'], token.strng))
+        self.goto(QUAL_BOLD)
+
+    def qual_bold_descr(self, token):
+        self.details['descr'] = " ".join((self.details['descr'], token.strng))
+        self.goto(COND)
+
+    def to_cond(self, token):
+        self.goto(COND, token)
+
+    def cond_token(self, token):
+        self.cond = "".join((self.cond, token.strng))
+        self.goto(COND_NEXT)
+
+    def cond_end(self, token):
+        # Leerzeichen nach einer Bedingung trennen die Bedingungen der PIDs
+        self.details['conds'].append(("".join((self.cond, token.strng)), token.strng, token.line))
+        self.cond = ''
+        self.goto(COND)
+
+    def end_line(self, token):
+        if self.cond != '':
+            self.details['conds'].append((self.cond, '', token.line))
+            self.cond = ''
+        self.goto(self.line_state)
+
+    def plain_in_cond(self, token):
+        # Ist die Zeile z.B. durch einen fehlenden Trenner nach dem Qualifier verschoben, beginnen die
+        # Bedingungen vor Position 30
+        self.error(f'Erwartet "plain_c", empfangen "{token}"')
+        self.cond_token(token)
+
+    def unexpected_in_cond(self, token):
+        self.error(f'Erwartet "newline", empfangen "{token}"')
+        self.goto(SKIP, token)
+
+    def skip_token(self, token):
+        self.skip(token)
+
+    def skip_end(self, token):
+        if self.details is None:
+            self.cond = ''
+            self.goto(self.line_state)
+        else:
+            self.end_line(token)
+
+TRANSITIONS = {
+    START: {'gray': DataElementParser.start_de, 'bold_x': DataElementParser.start_qual,
+            None: DataElementParser.unexpected},
+    DE_LINE: {'empty': DataElementParser.ignore, 'gray': DataElementParser.continue_de,
+              'plain_c': DataElementParser.to_cond, 'bold_x': DataElementParser.qual_after_de,
+              None: DataElementParser.unexpected},
+    QUAL_SEP: {'empty': DataElementParser.qual_sep, None: DataElementParser.missing_sep},
+    QUAL_DESCR: {'plain': DataElementParser.qual_descr, None: DataElementParser.missing_descr},
+    QUAL_DESCR_MORE: {'plain': DataElementParser.qual_descr_more, None: DataElementParser.to_cond},
+    QUAL_LINE: {'empty': DataElementParser.ignore, 'indented': DataElementParser.qual_indented,
+                'bold': DataElementParser.qual_bold, 'plain_c': DataElementParser.to_cond,
+                'bold_x': DataElementParser.start_qual, None: DataElementParser.unexpected},
+    QUAL_BOLD: {'empty': DataElementParser.ignore, 'plain': DataElementParser.qual_bold_descr,
+                None: DataElementParser.to_cond},
+    COND: {'empty': DataElementParser.ignore, 'plain_c': DataElementParser.cond_token,
+           'indented': DataElementParser.cond_token, 'plain': DataElementParser.plain_in_cond,
+           'newline': DataElementParser.end_line,
+           None: DataElementParser.unexpected_in_cond},
+    COND_NEXT: {'empty': DataElementParser.cond_end, None: DataElementParser.to_cond},
+    SKIP: {'newline': DataElementParser.skip_end, None: DataElementParser.skip_token},
+}
+
+def parse_dataelement(dataelement, pids, context):
     """
         Es wird folgende Syntax verwendet:
         ALT----------------------
@@ -431,98 +657,19 @@ def parse_dataelement(dataelement, pids):
         Qualifier    = bold_x empty plain Condition [Qu_NextLine]*
         Qu_NextLine  = [(bold empty* [plain] empty*) | (indented empty*)] Condition
 
-        :param dataelement:
-        :return:
+        Die Syntax wird von DataElementParser als Zustandsautomat umgesetzt.
+        :param dataelement: Datenelementspalte der Zeile
+        :param pids: PIDs des Segmentes
+        :param context: DataClassContext des Dokumentes (für Fehlermeldungen und Zähler)
+        :return: Liste der Datenelemente bzw. Qualifier als dict
         """
-    # print('#')
-    tokens = get_de_token(dataelement)
-    details_list = []
-    if "".join(dataelement.strings).find('19120') > 0:
-        pass
-    details = {}
-    try:
-        try:
-            # while True:
-            #     print(tokens.__next__())
-
-            token = tokens.__next__()
-            if token.type == 'gray':
-                details['de'] = token.strng
-                details['conds'] = []
-                token = tokens.__next__()
-                token = skip_empty(token, tokens)
-
-                # while token.type == 'plain':
-                token, details['conds'] = parse_conditions(token, tokens, details['conds'])
-
-                while token.type in ('gray', 'plain_c'):
-                    if token.type == 'gray':
-                        details['de'] = " ".join((details['de'], token.strng))
-                        token = tokens.__next__()
-                        token = skip_empty(token, tokens)
-                    token, details['conds'] = parse_conditions(token, tokens, details['conds'])
-
-            # Qualifier
-            elif token.type == 'bold_x':
-                while token.type == 'bold_x':
-                    details = {'qual': token.strng, 'descr':'', 'conds': []}
-                    token = tokens.__next__()
-                    if token.type != 'empty':
-                        raise De_syntax_error(f'Erwartet "empty", empfangen "{token}"')
-                    token = tokens.__next__()
-                    if token.type != 'plain':
-                        raise De_syntax_error(f'Erwartet "plain", empfangen "{token}"')
-                    details['descr'] = token.strng
-                    token = tokens.__next__()
-                    while token.type == 'plain':
-                        details['descr'] = ''.join((details['descr'],token.strng))
-                        token = tokens.__next__()
-
-                    token = skip_empty(token, tokens)
-                    token, details['conds'] = parse_conditions(token, tokens, details['conds'])
-                    # token = skip_empty(token, tokens)
-
-                    while token.type in ('indented', 'plain_c', 'bold'):
-                        match token.type:
-                            case 'indented':
-                                details['descr'] = " ".join((details['descr'], token.strng))
-                                token = tokens.__next__()
-                                token = skip_empty(token, tokens)
-
-                            case 'bold':
-                                details['qual'] = "".join((details['qual'], token.strng))
-                                token = tokens.__next__()
-                                token = skip_empty(token, tokens)
-                                if token.type == 'plain':
-                                    details['descr'] = " ".join((details['descr'], token.strng))
-                                    token = tokens.__next__()
-                                    token = skip_empty(token, tokens)
-
-                        token, details['conds'] = parse_conditions(token, tokens, details['conds'])
-
-                    details['conds'] = map_conditons(details['conds'], pids)
-                    details_list.append(details)
-                    details = {}
-
-            raise De_syntax_error(f'Erwartet kein Token, empfangen "{token}"')
-
-        except StopIteration:
-            if details != {}:
-                details['conds'] = map_conditons(details['conds'], pids)
-                details_list.append(details)
-
-    except De_syntax_error as err:
-        logging.error(f'Syntaxfehler: {context} {err}, Pids: {pids}')
-        details = {'error': str(err), 'raw': " ".join(dataelement.strings), 'conds': {'cond':{}}}
-        details_list.append(details)
-
-    return details_list
-
-def get_segment_group(item, start_pos_ref, sgr_parent, pids, dataelement):
+    return DataElementParser(pids, context).parse(dataelement)
+
+def get_segment_group(item, pid_columns, sgr_parent, pids, dataelement):
     sgr = DataClassSegment()
     sgr.name = item
-    sgr.pids = segment_pids(pids, start_pos_ref, dataelement)
-    sgr.cond = seg_conditions(dataelement, sgr.pids, start_pos_ref)
+    sgr.pids = segment_pids(pids, pid_columns, dataelement)
+    sgr.cond = seg_conditions(dataelement, sgr.pids, pid_columns)
     if sgr_parent.name == sgr.name:
         if sgr.cond != {}:
             sgr_parent = sgr
@@ -533,51 +680,52 @@ def get_segment_group(item, start_pos_ref, sgr_parent, pids, dataelement):
     logging.debug('segmentgruppe parent:%s pids:%s cond:%s', sgr_parent.name, sgr_parent.pids, sgr_parent.cond)
     return sgr, sgr_parent
 
-def get_segment(item, start_pos_ref, pids, dataelement):
+def get_segment(item, pid_columns, pids, dataelement):
     seg = DataClassSegment()
     seg.name = item
-    seg.pids = segment_pids(pids, start_pos_ref, dataelement)
-    seg.cond = seg_conditions(dataelement, seg.pids, start_pos_ref)
+    seg.pids = segment_pids(pids, pid_columns, dataelement)
+    seg.cond = seg_conditions(dataelement, seg.pids, pid_columns)
     logging.debug('Segment:%s', seg)
     return seg
 
-def get_dataelement(item, seg_name, sgr_parent, seg, dataelement, head_str):
-    # details_list = parse_dataelement(dataelement, seg.pids)
-    de_list = []
-    for details in parse_dataelement(dataelement, seg.pids):
+def get_dataelement(item, seg_name, sgr_parent, seg, dataelement, head_str, context, elements, pid_rows):
+    """
+    Hängt die Datenelemente bzw. Qualifier einer Zeile an elements und ihre Bedingungen je PID an pid_rows an
+    :param elements: column_builder.ColumnBuilder mit den Spalten von DataClassDataElement
+    :param pid_rows: column_builder.ColumnBuilder mit der Zeile in elements und den Spalten PID_FIELDS
+    """
+    for details in parse_dataelement(dataelement, seg.pids, context):
         if details['conds']['cond'] == {}:
             cur_pids = seg.pids
         else:
             cur_pids = details['conds']['cond']
-        for pid in cur_pids.keys():
-            de = DataClassDataElement(head=head_str, pid=pid)
-            if 'error' in details:
-                de.error = details['error']
-                de.raw = details['raw']
-                de_list.append(de)
-                continue
-
-            de.de = item
-            if 'de' in details:
-                de.de_descr = details['de']
-            de.seg_name = seg_name
-            de.sgr = sgr_parent.name
-            if pid in sgr_parent.cond:
-                de.sgr_cond = sgr_parent.cond[pid]
-            de.seg = seg.name
-            if pid in seg.cond:
-                de.seg_cond = seg.cond[pid]
-            if 'qual' in details:
-                de.qual = details['qual']
-                de.qual_descr = details['descr']
-            if details['conds']['cond'] == {}:
-                de.condition = '##nicht ermittelbar##'
-            else:
-                de.condition = details['conds']['cond'][pid]
-            de.raw_condition = details['conds']['raw']
-            de_list.append(de)
+        if not cur_pids:
+            continue
+        element = len(elements)
+        if 'de' not in details and 'qual' not in details:
+            # Spalte ohne erkennbares Datenelement oder Qualifier
+            elements.add(head=head_str, error=details.get('error', ''), raw=details.get('raw', ''))
+            for pid in cur_pids:
+                pid_rows.append(element, pid, '', '', '')
+            continue
 
-    return de_list
+        elements.add(head=head_str,
+                     seg_name=seg_name,
+                     sgr=sgr_parent.name,
+                     seg=seg.name,
+                     de=item,
+                     de_descr=details.get('de', ''),
+                     qual=details.get('qual', ''),
+                     qual_descr=details['descr'] if 'qual' in details else '',
+                     raw_condition=details['conds']['raw'],
+                     error=details.get('error', ''),
+                     raw=details.get('raw', ''))
+        conds = details['conds']['cond']
+        if conds == {}:
+            context.undetermined += len(cur_pids)
+        for pid in cur_pids:
+            pid_rows.append(element, pid, sgr_parent.cond.get(pid, ''), seg.cond.get(pid, ''),
+                            conds.get(pid, '##nicht ermittelbar##'))
 
 def get_condition(condtion):
     # ToDo Bedingungen funktionieren nicht, wenn Bedingungen über Seitenwechsel hinaus gehen
@@ -593,100 +741,255 @@ def get_condition(condtion):
         conds.update(split_dict.items())
     return conds
 
-def get_use_case(head_str, tab_list, pids):
-    logging.debug(f'Anwendungsfälle {head_str}')
-    segments=[]
-    conditions=set()
+@dataclass
+class DataClassUseCase:
+    head: str = ""
+    pids: tuple = ()
+    # Datenelemente und Bedingungen je PID, siehe get_dataelement
+    elements: column_builder.ColumnBuilder = field(
+        default_factory=lambda: column_builder.ColumnBuilder.from_dataclass(DataClassDataElement))
+    pid_rows: column_builder.ColumnBuilder = field(
+        default_factory=lambda: column_builder.ColumnBuilder(('element',) + PID_FIELDS))
+    conditions: set = field(default_factory=set)
+    # Im Anwendungsfall (UNH 0065) gefundenes Format, None wenn nicht vorhanden
+    format: str = None
+    # Zustand, der von einer Tabelle des Anwendungsfalls an die nächste weitergegeben wird
+    sgr_parent: DataClassSegment = field(default_factory=DataClassSegment)
+    start_pos_ref: list = None
+    # PidColumns zu start_pos_ref
+    pid_columns: PidColumns = None
+    seg_name: str = None
+    seg: DataClassSegment = None
+
+def add_use_case_table(use_case, table, context):
+    """
+    Liest die Zeilen einer Tabelle eines Anwendungsfalls und ergänzt die Segmente und Bedingungen des Anwendungsfalls
+    :param use_case: DataClassUseCase
+    :param table: Tabelle des Anwendungsfalls
+    :param context: DataClassContext des Dokumentes
+    """
+    pids = use_case.pids
+    for row_no, row in enumerate(filter(filter_white_rows, table.find_all('tr'))):
+        col_it = iter(row.find_all('td'))
+        structure = col_it.__next__()
+        dataelement = col_it.__next__()
+        condition = col_it.__next__()
+
+        match first_col_item(structure):
+            case ('Segmentname', item):
+                use_case.seg_name = item
+                logging.debug('(expliziter)Segmentname:%s', use_case.seg_name)
+                continue
+
+            case ('Segmentgruppe', item):
+                sgr, use_case.sgr_parent = get_segment_group(item, use_case.pid_columns, use_case.sgr_parent, pids,
+                                                             dataelement)
+
+            case ('Segment',item):
+                if item in ('UNB', 'UNH'):
+                    # Aus der ersten Zeile der Datenelementspalte werden die Startpositionen der
+                    # Bedingungen ermittelt. Das UNH Segment enthält für alle PIDs des Anwendungsfalls
+                    # Muss-Bedingungen. Die Startpositionen werden für Ermittlung der darauffolgenden
+                    # Bedingungen von Segementgruppen, Segmenten, Datenelementen und Qualifiern genutzt.
+                    use_case.start_pos_ref = list(zip(pids, [match.start() for match in re_ahb_status.finditer(get_line(dataelement).__next__())]))
+                    use_case.pid_columns = PidColumns(use_case.start_pos_ref)
+                use_case.seg = get_segment(item, use_case.pid_columns, pids, dataelement)
+
+            case ('Dataelement',item):
+                first = len(use_case.elements)
+                get_dataelement(item, use_case.seg_name, use_case.sgr_parent, use_case.seg, dataelement,
+                                use_case.head, context, use_case.elements, use_case.pid_rows)
+                if use_case.seg.name == 'UNH' and len(use_case.elements) > first:
+                    if use_case.elements['de'][first] == '0065':
+                        use_case.format = use_case.elements['qual'][first]
+                        context.format = use_case.format
+
+        use_case.conditions.update(get_condition(condition))
+
+def finish_use_case(use_case, context):
+    """
+    Setzt das Format in allen Segmenten des Anwendungsfalls. Ohne eigenes Format gilt das zuletzt gelesene.
+    """
+    if use_case.format is not None:
+        context.format = use_case.format
+    use_case.elements.fill('format', context.format)
 
-    sgr_parent = DataClassSegment()
+def get_use_case(head_str, tab_list, pids, context):
+    logging.debug(f'Anwendungsfälle {head_str}')
+    use_case = DataClassUseCase(head=head_str, pids=pids)
     for table in tab_list:
-        for row_no, row in enumerate(filter(filter_white_rows, table.find_all('tr'))):
-            col_it = iter(row.find_all('td'))
-            structure = col_it.__next__()
-            dataelement = col_it.__next__()
-            condition = col_it.__next__()
-
-            match first_col_item(structure):
-                case ('Segmentname', item):
-                    seg_name = item
-                    logging.debug('(expliziter)Segmentname:%s', seg_name)
-                    continue
-
-                case ('Segmentgruppe', item):
-                    sgr, sgr_parent = get_segment_group(item, start_pos_ref, sgr_parent, pids, dataelement)
-
-                case ('Segment',item):
-                    if item in ('UNB', 'UNH'):
-                        # Aus der ersten Zeile der Datenelementspalte werden die Startpositionen der
-                        # Bedingungen ermittelt. Das UNH Segment enthält für alle PIDs des Anwendungsfalls
-                        # Muss-Bedingungen. Die Startpositionen werden für Ermittlung der darauffolgenden
-                        # Bedingungen von Segementgruppen, Segmenten, Datenelementen und Qualifiern genutzt.
-                        start_pos_ref = list(zip(pids, [match.start() for match in re_ahb_status.finditer(get_line(dataelement).__next__())]))
-                    seg = get_segment(item, start_pos_ref, pids, dataelement)
-
-                case ('Dataelement',item):
-                    de = get_dataelement(item, seg_name, sgr_parent, seg, dataelement, head_str)
-                    #segments.extend(get_dataelement(item, seg_name, sgr_parent, seg, dataelement, head_str))
-                    if seg.name == 'UNH':
-                        if de[0].de  == '0065':
-                            context.format = de[0].qual
-                    segments.extend(de)
-
-            conditions.update(get_condition(condition))
-    for s in segments:
-        s.format = context.format
-
-    return segments, conditions
-
-def extract_ahb(path):
+        with instrument.table('UseCase', head_str):
+            add_use_case_table(use_case, table, context)
+    finish_use_case(use_case, context)
+
+    return use_case
+
+def extract_ahb(path, backend='html.parser', formats=('excel',), layout='wide'):
     with open(path, 'r') as f:
         data = f.read()
 
     logging.debug('starte %s', path)
 
-    edi_doc = BeautifulSoup(data, 'html.parser')
+    edi_doc = util.parse_html(data, backend, keep=STRAINER_TAGS)
     table_index = get_table_index(edi_doc)
-    new_file = path.parent / f'{path.stem}.xlsx'
-    writer = pd.ExcelWriter(new_file)
+    extract_ahb_tables(table_index, path, formats, layout)
 
-    # Anwendungsfälle
-    use_cases = []
+def extract_ahb_tables(table_index, path, formats=('excel',), layout='wide'):
+    """
+    Schreibt die Ausgabe zu einem AHB aus dem bereits erstellten Tabellenindex
+    :param table_index: Ergebnis von get_table_index
+    :param path: Pfad der HTML Datei
+    :param formats: Ausgabeformate, siehe sink.FORMATS
+    :param layout: Ausgabe der Anwendungsfälle, siehe LAYOUTS
+    """
+    # Der Kontext gilt nur für dieses Dokument. Dadurch können mehrere Dokumente parallel extrahiert werden.
+    context = DataClassContext(path=path)
+
+    # Anwendungsfälle. Jeder Anwendungsfall wird geschrieben, sobald er fertig gelesen ist.
+    out = sink.open_sink(path, formats)
     conds = set()
     for pids, tab_list in table_index['UseCases'].items():
-        segments, conditions = get_use_case(tab_list[0], tab_list[1], pids)
-        use_cases.extend(segments)
-        conds.update(conditions)
-
-    df = pd.DataFrame(use_cases)
-    rn_dict = {'head':'Kapitel', \
-               'pid':'PID',
-               'seg_name':'Segmentname', \
-               'sgr':'Segmentgruppe', \
-               'sgr_cond':'Segmentgruppe Bedingung', \
-               'seg':'Segment', \
-               'seg_cond':'Segment Bedingung', \
-               'de':'Datenelement', \
-               'de_descr': 'Datenelement Beschreibung', \
-               'qual': 'Qualifier', \
-               'qual_descr':'Qualifier Beschreibung', \
-               'condition':'Bedingung', \
-               'raw_condition':'Bedingung (ohne PID Zuordnung)', \
-               'error': 'Fehler', \
-               'raw':'Fehlerdaten'}
-    df.rename(columns=rn_dict, inplace=True)
-    df.to_excel(writer, sheet_name='Anwendungsfälle', index=False)
+        use_case = get_use_case(tab_list[0], tab_list[1], pids, context)
+        write_use_case(out, use_case, context, layout)
+        conds.update(use_case.conditions)
+
+    write_ahb(out, conds, util.get_change_history(table_index['ChangeHist']), path, layout)
+    report_counts(context)
+
+def extract_ahb_stream(path, formats=('excel',), layout='wide'):
+    """
+    Extrahiert ein AHB tabellenweise mit stream_reader, ohne den BeautifulSoup Baum des ganzen Dokumentes aufzubauen.
+    Jede Tabelle wird sofort dem Anwendungsfall hinzugefügt und danach verworfen. Wie in extract_ahb_tables wird
+    ein Anwendungsfall geschrieben, sobald er fertig gelesen ist, hier also sobald sich die PIDs ändern.
+    Die Zeilen stehen daher in der Reihenfolge der zusammenhängenden Blöcke: Folgen später im Dokument weitere
+    Tabellen mit bereits geschriebenen PIDs, werden ihre Zeilen als eigener Block angehängt. extract_ahb_tables
+    ordnet sie dagegen beim ersten Auftreten der PIDs ein. Die Zeilen selbst sind dieselben.
+    :param path: Pfad der HTML Datei
+    :param formats: Ausgabeformate, siehe sink.FORMATS
+    :param layout: Ausgabe der Anwendungsfälle, siehe LAYOUTS
+    """
+    context = DataClassContext(path=path)
+    out = sink.open_sink(path, formats)
+    conds = set()
+
+    def write(use_case):
+        finish_use_case(use_case, context)
+        write_use_case(out, use_case, context, layout)
+        conds.update(use_case.conditions)
+        # Die geschriebenen Datenelemente werden nicht mehr benötigt. Der übrige Zustand bleibt erhalten, falls
+        # später weitere Tabellen mit denselben PIDs folgen.
+        use_case.elements.clear()
+        use_case.pid_rows.clear()
+
+    use_cases = {}
+    use_case = None
+    history = []
+    pids = ()
+    for stream_table in stream_reader.iter_tables(path):
+        table_type, pids = classify_table(stream_table.table, pids)
+        match table_type:
+            case 'ChangeHist':
+                history.extend(util.get_change_history([stream_table.table]))
+
+            case 'UseCase':
+                if use_case is not None and use_case.pids != pids:
+                    write(use_case)
+                if pids not in use_cases:
+                    use_cases[pids] = DataClassUseCase(head=heading_str(stream_table.heading), pids=pids)
+                use_case = use_cases[pids]
+                with instrument.table('UseCase', use_case.head):
+                    add_use_case_table(use_case, stream_table.table, context)
+
+    if use_case is not None:
+        write(use_case)
+    write_ahb(out, conds, history, path, layout)
+    report_counts(context)
+
+def report_counts(context):
+    """
+    Gibt die behobenen Syntaxfehler und die nicht ermittelbaren Bedingungen des Dokumentes aus
+    """
+    if context.recovered or context.undetermined:
+        logging.info(f'{context.path}: {context.recovered} Syntaxfehler behoben, '
+                     f'{context.undetermined} Bedingungen nicht ermittelbar')
+    instrument.count('AHB Syntaxfehler behoben', context.recovered)
+    instrument.count('AHB Bedingungen nicht ermittelbar', context.undetermined)
+
+def use_case_sheets(layout='wide'):
+    """
+    :return: dict Sheet -> Spaltenüberschriften der Anwendungsfälle im angegebenen Layout
+    """
+    match layout:
+        case 'wide':
+            return {USE_CASE_SHEET: list(USE_CASE_COLUMNS.values())}
+        case 'normalized':
+            return {ELEMENT_SHEET: ELEMENT_COLUMNS, PID_SHEET: PID_COLUMNS}
+        case _:
+            raise ValueError(f'Unbekanntes Layout {layout}. Möglich sind {LAYOUTS}')
+
+def write_use_case(out, use_case, context, layout='wide'):
+    """
+    Hängt die Datenelemente eines Anwendungsfalls an die Sheets der Anwendungsfälle an. Die Spalten werden
+    direkt an pandas übergeben, im breiten Layout werden die Spalten der Datenelemente dafür je PID wiederholt.
+    :param out: Senke aus sink.open_sink
+    :param use_case: DataClassUseCase
+    :param context: DataClassContext des Dokumentes, zählt die Elemente für die Spalte 'Element'
+    :param layout: siehe LAYOUTS
+    """
+    elements, pid_rows = use_case.elements, use_case.pid_rows
+    if len(pid_rows) == 0:
+        # Die Sheets werden beim ersten Anwendungsfall mit Datenelementen bzw. in write_ahb angelegt
+        return
+    match layout:
+        case 'wide':
+            index = pid_rows['element']
+            out.append(pd.DataFrame({column: pid_rows[name] if name in PID_FIELDS
+                                     else [elements[name][i] for i in index]
+                                     for name, column in USE_CASE_COLUMNS.items()}), USE_CASE_SHEET)
+        case 'normalized':
+            first_id = context.elements + 1
+            context.elements += len(elements)
+            out.append(pd.DataFrame({ELEMENT_ID: range(first_id, context.elements + 1)} |
+                                    {USE_CASE_COLUMNS[name]: elements[name] for name in ELEMENT_FIELDS}), ELEMENT_SHEET)
+            out.append(pd.DataFrame({ELEMENT_ID: [first_id + i for i in pid_rows['element']]} |
+                                    {USE_CASE_COLUMNS[name]: pid_rows[name] for name in PID_FIELDS}), PID_SHEET)
+        case _:
+            raise ValueError(f'Unbekanntes Layout {layout}. Möglich sind {LAYOUTS}')
+
+def wide_use_cases(elements, pids):
+    """
+    Baut das Sheet 'Anwendungsfälle' aus den Sheets des normalisierten Layouts auf
+    :param elements: DataFrame des Sheets 'Anwendungsfälle_Elemente'
+    :param pids: DataFrame des Sheets 'Anwendungsfälle_PID'
+    :return: DataFrame mit den Spalten des Sheets 'Anwendungsfälle', Zeilen in der Reihenfolge von pids
+    """
+    return pids.merge(elements, on=ELEMENT_ID, how='left', sort=False)[list(USE_CASE_COLUMNS.values())]
+
+def write_ahb(out, conds, history, path, layout='wide'):
+    """
+    Schreibt Bedingungen und Änderungshistorie eines AHB und schließt die Ausgabe
+    :param out: Senke aus sink.open_sink, in die die Anwendungsfälle bereits geschrieben sind
+    :param conds: Set der Bedingungen
+    :param history: Liste der DataClassChangeHistory
+    :param path: Pfad der HTML Datei
+    :param layout: Layout der Anwendungsfälle, siehe LAYOUTS
+    """
+    # AHB ohne Datenelemente erhalten leere Sheets mit den Spaltenüberschriften
+    for sheet, columns in use_case_sheets(layout).items():
+        if sheet not in out.sheets:
+            out.write_rows(sheet, columns, [])
 
     df = pd.DataFrame(conds)
     rn_dict = {0: 'Bedingung', \
                1: 'Beschreibung'}
     df.rename(columns=rn_dict, inplace=True)
-    df.to_excel(writer, sheet_name='Bedingungen', index=False)
+    out.write(df, 'Bedingungen')
 
     #  Änderungshistorie
-    util.change_history_to_excel(table_index['ChangeHist'], writer)
+    util.write_change_history(history, out)
 
-    # close Pandas Excel writer and output the Excel file
-    writer.close()
+    # Ausgabedateien schließen
+    out.close()
     logging.info('%s', path)
 
 def main():
@@ -698,18 +1001,9 @@ def main():
     #paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230401'))
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20231001'))
     # paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230414'))
-    for path in paths:
-        for file in path.rglob('*.HTML'):
-            context.path = file
-            if '_AHB_' in file.stem:
-                source = file.parent / file.name
-                try:
-                    extract_ahb(source)
-                except BaseException as err:
-                    logging.error(f'File {source}. Fehler {err}')
+    manifest.extract_changed(paths, lambda stem: '_AHB_' in stem, extract_ahb, VERSION)
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.ERROR)
-    context = DataClassContext()
     main()
 
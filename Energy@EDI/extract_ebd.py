@@ -1,11 +1,22 @@
-from bs4 import BeautifulSoup
 from dataclasses import dataclass, field
 import re
-import pandas as pd
 from pathlib import Path
 import logging
+import column_builder
+import instrument
+import manifest
+import sink
 import util
 
+# Tags, die der Extraktor liest und die beim Parsen mit Strainer erhalten bleiben:
+# Tabellen, Überschriften h1-h3 und Paragraphen (für die Codelisten vor den Tabellen). get_table_context ordnet
+# Überschriften nur innerhalb desselben Elternelements zu, daher bleiben auch die Abschnitte (div WordSection)
+# mit ihrem Inhalt erhalten. Ohne sie stünden nach einem Abschnittsumbruch fremde Überschriften über der Tabelle.
+STRAINER_TAGS = ('div', 'table', 'h1', 'h2', 'h3', 'p')
+
+# siehe manifest
+VERSION = '1'
+
 @dataclass
 class DataClassEBD:
     """ drei ebenen:
@@ -46,13 +57,50 @@ class DataClassTableIndex:
     # Zwischenüberschrift
     h4: str = ""
     tabs: list = field(default_factory=list)
+    # Letzter Paragraph vor jeder Tabelle in tabs (für die Codelisten vor dem Tabellenkopf)
+    paragraphs: list = field(default_factory=list)
+
+@dataclass
+class DataClassTableContext:
+    # Letzte h1, h2 und h3 Überschrift, die vor der Tabelle auf derselben Ebene steht
+    headings: dict = field(default_factory=dict)
+    # Letzter Paragraph vor der Tabelle (in Dokumentreihenfolge)
+    paragraph: object = None
 
 def has_white_col(row):
     return any([util.get_style_dict(c).get('background', 'white') == 'white' for c in row.find_all('td')])
 
+def get_heading_string(tag):
+    if tag is None:
+        return ""
+    return util.get_string(tag)
+
+def get_table_context(edi_doc):
+    """
+    Durchläuft das Dokument einmal vorwärts und merkt sich für jede Tabelle die darüber liegenden
+    Überschriften und den letzten Paragraphen. Entspricht find_previous_sibling('h1'), ... und find_previous('p'),
+    ohne für jede Tabelle rückwärts durch den Baum zu suchen.
+    :return: dict id(Tabelle) -> DataClassTableContext
+    """
+    contexts = {}
+    # Aktuelle Überschriften je Elternelement, da die Überschriften Geschwister der Tabelle sein müssen
+    headings = {}
+    paragraph = None
+    for tag in edi_doc.find_all(['h1', 'h2', 'h3', 'p', 'table']):
+        match tag.name:
+            case 'p':
+                paragraph = tag
+            case 'table':
+                contexts[id(tag)] = DataClassTableContext(headings=dict(headings.get(id(tag.parent), {})),
+                                                          paragraph=paragraph)
+            case _:
+                headings.setdefault(id(tag.parent), {})[tag.name] = tag
+    return contexts
+
 def get_table_index(edi_doc):
     change_hist = list()
     ebd_tables = list()
+    contexts = get_table_context(edi_doc)
     for t in edi_doc.find_all('table'):
         # Suchen nach Tabellen, bei denen in der ersten Spalte der ersten Zeile "Prüfende Rolle"
         # steht. Von dort aus werden die darüberliegenden Header und alle darunter liegenden
@@ -73,11 +121,13 @@ def get_table_index(edi_doc):
 
         if table.type != '':
             table.tabs.append(t)
+            table.paragraphs.append(contexts[id(t)].paragraph)
 
             # Darüber liegenden Header lesen. Jeweils der erste h1, h2 und h3
-            table.h1 = util.get_string(t.find_previous_sibling('h1'))
-            table.h2 = util.get_string(t.find_previous_sibling('h2'))
-            table.h3 = util.get_string(t.find_previous_sibling('h3'))
+            headings = contexts[id(t)].headings
+            table.h1 = get_heading_string(headings.get('h1'))
+            table.h2 = get_heading_string(headings.get('h2'))
+            table.h3 = get_heading_string(headings.get('h3'))
 
             # alle darunterliegenden Tabellen lesen bis zum nächsten Header
             for next_s in t.next_siblings:
@@ -89,6 +139,7 @@ def get_table_index(edi_doc):
                     if not has_white_col(next_s.find('tr')):
                         break
                     table.tabs.append(next_s)
+                    table.paragraphs.append(contexts[id(next_s)].paragraph)
             ebd_tables.append(table)
 
     return ebd_tables, change_hist
@@ -103,143 +154,157 @@ def get_offset(cols):
             return key
 
 def get_ebd(tab_list):
-    ebd_list = []
+    """
+    :return: column_builder.ColumnBuilder mit den Spalten von DataClassEBD
+    """
+    ebd_list = column_builder.ColumnBuilder.from_dataclass(DataClassEBD)
 
     for tl in filter(lambda t: t.type == 'EBD', tab_list):
         role = ''
         for tab in tl.tabs:
-
-            # Mit der rowspan Option kann sich in HTML eine Spalte über mehrere Zeilen erstrecken.
-            # Beim Lesen einer neuen Zeile muss daher berücksichtigt werden,
-            # welche Spalten aus der vorherigen Zeile übernommen werden müssen.
-            # Das dict row_span enthält für jede Spalte die Anzahl der Zeilen über die es sich erstreckt.
-            # Das dict cols merkt sich die Spalteninhalte aus den vorherigen Zeilen
-            # Für beide dicts werden maximal 20 Einträge vorgesehen. Die EBD Tabellen haben in der Regel fünf
-            # Spalten
-
-            # Initialiseren des row_span dicts
-            row_span = {i: 1 for i in range(20)}
-
-            # Initialiseren des cols dicts
-            cols = {i:None for i in range(20)}
-            for row in tab.find_all('tr'):
-                # Überlesen von Überschrifts- und Kommentarzeilen,
-                # die komplett farbig (z.B. grau) hinterlegt sind.
-                if not has_white_col(row):
-                    first_col = row.find('td')
-                    first_text = util.get_string(first_col)
-                    if first_text.startswith('Prüfende Rolle:'):
-                        role = first_text.split(':')[1].strip()
-                    continue
-
-                ebd = DataClassEBD()
-                ebd.requlation = tl.h1
-                ebd.activity = tl.h2
-                ebd.ident = tl.h3
-                ebd.role = role
-
-                # Bei jeder neuen Zeile die Einträge in row_span um Eins vermindern
-                row_span.update({key:value - 1 for key,value in row_span.items() if value > 0})
-
-                # Kopie von row_span erzeugen mit den Spalten, für die in dieser Zeile
-                # neue Werte erwartet werden.
-                row_span_copy = {key:value for key, value in row_span.items() if value == 0}
-
-                #Spalten initialisieren, die nicht aus Vorzeile übernommen werden sollen
-                cols.update({key:None for key in row_span_copy.keys()})
-
-                for col in row.find_all('td'):
-                    for key, val in row_span_copy.items():
-                        cols[key] = col
-                        row_span_copy.pop(key)
-                        row_span[key] = int(col.get('rowspan', 1))
-                        break
-
-                offset = get_offset(cols)
-                # Nur Zeilen verwenden, die mindestens 5 Spalten haben
-                if len(list(cols.values())) - list(cols.values()).count(None) - offset > 4:
-                    ebd.step = util.get_string(cols[offset])
-                    ebd.step_text = "".join(cols[offset+1].strings).strip()
-                    ebd.step_text = util.get_string(cols[offset+1])
-                    # Die Farbe der ersten Spalte sagt aus, ob die Prüfung auf
-                    # Kopf-, Positions- oder Summenebene stattfinden soll.
-                    match util.get_style_dict(cols[offset]).get('background', 'white'):
-                        # Grau
-                        case '#BFBFBF':
-                            ebd.step_level = 'Kopf'
-                        # Grün
-                        case '#92D050':
-                            ebd.step_level = 'Position'
-                        # Gelb
-                        case 'yellow':
-                            ebd.step_level = 'Summe'
-
-                    ebd.result = util.get_string(cols[offset+2])
-                    ebd.code = util.get_string(cols[offset+3])
-                    ebd.note = util.get_string(cols[offset+4])
-                    ebd.comment = " ".join([util.get_string(col) for key, col in cols.items() if key < offset])
-                    ebd_list.append(ebd)
+            with instrument.table('EBD', tl.h3):
+                # Mit der rowspan Option kann sich in HTML eine Spalte über mehrere Zeilen erstrecken.
+                # Beim Lesen einer neuen Zeile muss daher berücksichtigt werden,
+                # welche Spalten aus der vorherigen Zeile übernommen werden müssen.
+                # Das dict row_span enthält für jede Spalte die Anzahl der Zeilen über die es sich erstreckt.
+                # Das dict cols merkt sich die Spalteninhalte aus den vorherigen Zeilen
+                # Für beide dicts werden maximal 20 Einträge vorgesehen. Die EBD Tabellen haben in der Regel fünf
+                # Spalten
+
+                # Initialiseren des row_span dicts
+                row_span = {i: 1 for i in range(20)}
+
+                # Initialiseren des cols dicts
+                cols = {i:None for i in range(20)}
+                for row in tab.find_all('tr'):
+                    # Überlesen von Überschrifts- und Kommentarzeilen,
+                    # die komplett farbig (z.B. grau) hinterlegt sind.
+                    if not has_white_col(row):
+                        first_col = row.find('td')
+                        first_text = util.get_string(first_col)
+                        if first_text.startswith('Prüfende Rolle:'):
+                            role = first_text.split(':')[1].strip()
+                        continue
+
+                    # Bei jeder neuen Zeile die Einträge in row_span um Eins vermindern
+                    row_span.update({key:value - 1 for key,value in row_span.items() if value > 0})
+
+                    # Kopie von row_span erzeugen mit den Spalten, für die in dieser Zeile
+                    # neue Werte erwartet werden.
+                    row_span_copy = {key:value for key, value in row_span.items() if value == 0}
+
+                    #Spalten initialisieren, die nicht aus Vorzeile übernommen werden sollen
+                    cols.update({key:None for key in row_span_copy.keys()})
+
+                    for col in row.find_all('td'):
+                        for key, val in row_span_copy.items():
+                            cols[key] = col
+                            row_span_copy.pop(key)
+                            row_span[key] = int(col.get('rowspan', 1))
+                            break
+
+                    offset = get_offset(cols)
+                    # Nur Zeilen verwenden, die mindestens 5 Spalten haben
+                    if len(list(cols.values())) - list(cols.values()).count(None) - offset > 4:
+                        # Die Farbe der ersten Spalte sagt aus, ob die Prüfung auf
+                        # Kopf-, Positions- oder Summenebene stattfinden soll.
+                        match util.get_style_dict(cols[offset]).get('background', 'white'):
+                            # Grau
+                            case '#BFBFBF':
+                                step_level = 'Kopf'
+                            # Grün
+                            case '#92D050':
+                                step_level = 'Position'
+                            # Gelb
+                            case 'yellow':
+                                step_level = 'Summe'
+                            case _:
+                                step_level = ''
+
+                        ebd_list.add(requlation=tl.h1,
+                                     activity=tl.h2,
+                                     ident=tl.h3,
+                                     role=role,
+                                     step=util.get_string(cols[offset]),
+                                     step_text=util.get_string(cols[offset+1]),
+                                     step_level=step_level,
+                                     result=util.get_string(cols[offset+2]),
+                                     code=util.get_string(cols[offset+3]),
+                                     note=util.get_string(cols[offset+4]),
+                                     comment=" ".join([util.get_string(col) for key, col in cols.items()
+                                                       if key < offset]))
     return ebd_list
 
 def get_code_lists(tab_list):
+    """
+    :return: column_builder.ColumnBuilder mit den Spalten von DataClassCodeList
+    """
     re_code_list = re.compile(r'[GS]{1,2}_\d{3,4}_')
-    code_list_list = []
+    code_list_list = column_builder.ColumnBuilder.from_dataclass(DataClassCodeList)
 
     for tl in filter(lambda t: t.type == 'Codelist', tab_list):
-        for tab in tl.tabs:
-            for row in tab.find_all('tr'):
-                # Überlesen von Überschriftszeilen,
-                # die komplett farbig (z.B. grau) hinterlegt sind.
-                if not has_white_col(row):
-                    # Wenn für die Aktivität schon ein EBD vorgesehen, aber noch nicht durch den BDEW umgesetzt ist,
-                    # wird die temporär zu nutzenden Codeliste unmittelbar vor dem Tabellenkopf in einer Zwischenüberschrift
-                    # oder in roter Schrift  oder auch ohne besondere Formatierung angegeben.
-                    p = row.find_previous('p')
-                    if re_code_list.match(util.get_string(p)):
-                        cl = util.get_string(p)
-                    else:
-                        cl = ""
-
-                    continue
-                code_list = DataClassCodeList()
-                code_list.requlation = tl.h1
-                code_list.activity = tl.h2
-                code_list.ident = tl.h3
-                code_list.code_list = cl
-
-                cols = row.find_all('td')
-
-                code_list.code = util.get_string(cols[0])
-                code_list.usage = util.get_string(cols[1])
-                # Zwischen den Spalten "Nutzung" und "Name" können mehrere
-                # Bedingungsspalten liegen. Diese werden mit den Trennzeichen "###" miteinander
-                # verbunden
-                code_list.condition = "\n###".join([util.get_string(col) for col in cols[2:-1]])
-
-                code_list.name = util.get_string(cols[-1])
-
-                # Codeliste aus h3 Überschrift extrahieren
-                if code_list.code_list == "":
-                    match = re_code_list.search(code_list.ident)
-                    if match:
-                        code_list.code_list = code_list.ident[match.span()[0]:]
-                code_list_list.append(code_list)
+        for tab, p in zip(tl.tabs, tl.paragraphs):
+            with instrument.table('Codelist', tl.h3):
+                # Zeilen und Paragraphen in Dokumentreihenfolge, damit zu jeder Zeile der letzte Paragraph davor bekannt ist
+                for row in tab.find_all(['tr', 'p']):
+                    if row.name == 'p':
+                        p = row
+                        continue
+                    # Überlesen von Überschriftszeilen,
+                    # die komplett farbig (z.B. grau) hinterlegt sind.
+                    if not has_white_col(row):
+                        # Wenn für die Aktivität schon ein EBD vorgesehen, aber noch nicht durch den BDEW umgesetzt ist,
+                        # wird die temporär zu nutzenden Codeliste unmittelbar vor dem Tabellenkopf in einer Zwischenüberschrift
+                        # oder in roter Schrift  oder auch ohne besondere Formatierung angegeben.
+                        if p is not None and re_code_list.match(util.get_string(p)):
+                            cl = util.get_string(p)
+                        else:
+                            cl = ""
+
+                        continue
+                    cols = row.find_all('td')
+
+                    # Codeliste aus h3 Überschrift extrahieren
+                    code_list = cl
+                    if code_list == "":
+                        match = re_code_list.search(tl.h3)
+                        if match:
+                            code_list = tl.h3[match.span()[0]:]
+
+                    code_list_list.add(requlation=tl.h1,
+                                       activity=tl.h2,
+                                       ident=tl.h3,
+                                       code_list=code_list,
+                                       code=util.get_string(cols[0]),
+                                       usage=util.get_string(cols[1]),
+                                       # Zwischen den Spalten "Nutzung" und "Name" können mehrere
+                                       # Bedingungsspalten liegen. Diese werden mit den Trennzeichen "###"
+                                       # miteinander verbunden
+                                       condition="\n###".join([util.get_string(col) for col in cols[2:-1]]),
+                                       name=util.get_string(cols[-1]))
 
     return code_list_list
 
-def extract_ebd(path):
+def extract_ebd(path, backend='html.parser', formats=('excel',)):
     with open(path, 'rb') as f:
         data = f.read()
 
-    edi_doc = BeautifulSoup(data, 'html.parser')
-    table_index, change_hist = get_table_index(edi_doc)
+    edi_doc = util.parse_html(data, backend, keep=STRAINER_TAGS)
+    extract_ebd_tables(get_table_index(edi_doc), path, formats)
+
+def extract_ebd_tables(table_index, path, formats=('excel',)):
+    """
+    Schreibt die Ausgabe zu einem EBD Dokument aus dem bereits erstellten Tabellenindex
+    :param table_index: Ergebnis von get_table_index (EBD/Codelisten Tabellen und Änderungshistorie)
+    :param path: Pfad der HTML Datei
+    :param formats: Ausgabeformate, siehe sink.FORMATS
+    """
+    table_index, change_hist = table_index
 
-    new_file = path.parent / f'{path.stem}.xlsx'
-    writer = pd.ExcelWriter(new_file)
+    out = sink.open_sink(path, formats)
 
     # EBD
-    ebd_list = get_ebd(table_index)
-    df = pd.DataFrame(ebd_list)
+    df = get_ebd(table_index).frame()
     rn_dict = {'requlation': 'Festlegung',
                'activity': 'Aktivitätsdiagramm',
                'ident': 'EBD',
@@ -252,11 +317,10 @@ def extract_ebd(path):
                'step_level': 'Prüfebene',
                'comment': 'Kommentar'}
     df.rename(columns=rn_dict, inplace=True)
-    df.to_excel(writer, sheet_name='EBD', index=False)
+    out.write(df, 'EBD')
 
     # Codelisten
-    code_lists = get_code_lists(table_index)
-    df = pd.DataFrame(code_lists)
+    df = get_code_lists(table_index).frame()
     rn_dict = {'requlation': 'Festlegung',
                'activity': 'Aktivitätsdiagramm',
                'ident': 'EBD/Codeliste',
@@ -266,11 +330,11 @@ def extract_ebd(path):
                'condition': 'Bedingung',
                'name': 'Name'}
     df.rename(columns=rn_dict, inplace=True)
-    df.to_excel(writer, sheet_name='CodeLists', index=False)
+    out.write(df, 'CodeLists')
 
     #  Änderungshistorie
-    util.change_history_to_excel(change_hist, writer)
-    writer.close()
+    util.change_history_to_excel(change_hist, out)
+    out.close()
 
 def main():
     paths = []
@@ -278,15 +342,7 @@ def main():
     #paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230401'))
     #paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20221001'))
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230419'))
-    for path in paths:
-        for file in path.rglob('*.HTML'):
-            if 'EBD_' in file.stem:
-                source = file.parent / file.name
-                try:
-                    extract_ebd(source)
-                except BaseException as err:
-                    logging.error(f'File {source}. Fehler {err}')
-                    raise err
+    manifest.extract_changed(paths, lambda stem: 'EBD_' in stem, extract_ebd, VERSION, raise_errors=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
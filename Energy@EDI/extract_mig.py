@@ -1,11 +1,20 @@
-from bs4 import BeautifulSoup
 import re
 from collections import namedtuple
-import pandas as pd
 from pathlib import Path
 import logging
+import column_builder
+import instrument
+import manifest
+import sink
 import util
 
+# Tags, die der Extraktor liest und die beim Parsen mit Strainer erhalten bleiben:
+# nur Tabellen
+STRAINER_TAGS = ('table',)
+
+# siehe manifest
+VERSION = '1'
+
 MessageStrct = namedtuple('MessageStruct',
                               'Counter \
                                Number \
@@ -26,32 +35,46 @@ def get_message_struct(tab_list):
     :return: dataframe mit extrahierten Daten
     """
     match_line = re.compile('^        \d\d\d\d')
-    messageStrct = []
+    messageStrct = column_builder.ColumnBuilder(MessageStrct._fields)
     for table in tab_list:
-        # Die Daten stecken in den P-Tags
-        for table_line in table.find_all('p'):
-            line_string = "".join(table_line.strings).replace(u'\xa0', u' ').replace(u'\n', u'')
-            if match_line.match(line_string):
-                elements = line_string.split()
-
-                counter = elements.pop(0)
-                if elements[0][0].isnumeric():
-                    number = elements.pop(0)
-                else:
-                    number = 0
-
-                qual = elements.pop(0)
-                statusStd = elements.pop(0)
-                statusBdew = elements.pop(0)
-                repetitionStd = elements.pop(0)
-                repetitionBdew = elements.pop(0)
-                level = elements.pop(0)
-                content = ' '.join(elements)
-
-                messageStrct.append(
-                    MessageStrct(counter, number, qual, statusStd, statusBdew, repetitionStd, repetitionBdew, level,
-                                 content, "", ""))
-    return pd.DataFrame(messageStrct)
+        with instrument.table('MessageStructure', lambda: table_heading(table)):
+            # Die Daten stecken in den P-Tags
+            for table_line in table.find_all('p'):
+                line_string = "".join(table_line.strings).replace(u'\xa0', u' ').replace(u'\n', u'')
+                if match_line.match(line_string):
+                    elements = line_string.split()
+
+                    counter = elements.pop(0)
+                    if elements[0][0].isnumeric():
+                        number = elements.pop(0)
+                    else:
+                        number = 0
+
+                    qual = elements.pop(0)
+                    statusStd = elements.pop(0)
+                    statusBdew = elements.pop(0)
+                    repetitionStd = elements.pop(0)
+                    repetitionBdew = elements.pop(0)
+                    level = elements.pop(0)
+                    content = ' '.join(elements)
+
+                    messageStrct.append(counter, number, qual, statusStd, statusBdew, repetitionStd, repetitionBdew,
+                                        level, content, "", "")
+    return messageStrct.frame()
+
+def table_heading(table):
+    """
+    Bezeichnung einer Tabelle für die Laufzeitmessung: die erste Zeile mit Zähler und Segment
+    (z.B. '0040 4 NAD M R 1 1 0 Segment NAD'), sonst die erste Textzeile. Überschriften werden beim Parsen
+    der MIG Dokumente nicht erhalten (STRAINER_TAGS).
+    """
+    first = ""
+    for p in table.find_all('p'):
+        text = " ".join(util.get_string(p).split())
+        if re.match(r'\d{4}\s', text):
+            return text[:80]
+        first = first or text
+    return first[:80]
 
 def get_intend(column):
     """
@@ -61,10 +84,9 @@ def get_intend(column):
     """
     intend_set = set()
     for para in column.find_all('p'):
-            for style_option in para['style'].split(';'):
-                key, value = style_option.split(':')
-                if key == 'margin-left':
-                    intend_set.add(value)
+            intend = util.get_style_dict(para).get('margin-left')
+            if intend is not None:
+                intend_set.add(intend)
     if len(intend_set) == 1:
         return list(intend_set)[0]
 
@@ -149,7 +171,7 @@ def extract_description(col, de, qual, quals):
     :param col: Textspalte
     :param de: Segment Dict
     :param qual: Qualifier Dict
-    :param quals: Qualifier Liste
+    :param quals: column_builder.ColumnBuilder der Qualifier
     :return: (segment dict, qual dict, qualifier list)
     """
     re_qual = re.compile(r'(\s*)(\w*)(\s\s\s)(.*)', flags=re.DOTALL)
@@ -162,7 +184,7 @@ def extract_description(col, de, qual, quals):
             match = re_qual.match(string)
             if match:
                 if has_values(qual):
-                    quals.append(qual)
+                    quals.add(**qual)
                     qual = init_qual()
                 qual['no'] = de['no']
                 if 'deg' in de:
@@ -214,12 +236,14 @@ def init_qual():
                  ('beschreibung', ''),
                  ])
 
-def traverse_table(table, message_struct):
+def traverse_table(table, message_struct, segment_fields, qual_fields):
     #ToDo besser strukturieren
     """
     Auslesen einer Tabelle mit Beschreibung eines Segmentes
     :param table:
-    :return: Tuple mit Liste mit Felder und Liste mit Qualifiern
+    :param segment_fields: column_builder.ColumnBuilder der Felder, wird um die Felder des Segmentes ergänzt
+    :param qual_fields: column_builder.ColumnBuilder der Qualifier
+    :return: Tuple mit segment_fields und qual_fields
     """
     # segment_dict['no'] = get_table_no(rows)
     rows = table.find_all('tr').__iter__()
@@ -229,8 +253,6 @@ def traverse_table(table, message_struct):
         print('Tabellennummer nicht gefunden')
         return
 
-    segment_fields = []
-    qual_fields = []
     deg_dict = init_deg(table_no)
     de_dict = init_de(table_no)
 
@@ -259,10 +281,10 @@ def traverse_table(table, message_struct):
             # Verzögertes Wegschreiben des segment_dicts, da
             # sich eine Datenelement über mehrere Zeilen erstrecken kann.
             if has_values(de_dict):
-                segment_fields.append(de_dict.copy())
+                segment_fields.add(**de_dict)
                 #qual_dict = init_qual()
                 if has_values(qual_dict):
-                    qual_fields.append(qual_dict)
+                    qual_fields.add(**qual_dict)
                     qual_dict = init_qual()
                 de_dict = init_de(table_no)
                 de_dict.update(deg_dict)
@@ -293,10 +315,10 @@ def traverse_table(table, message_struct):
             if not has_values(de_dict):
                 de_dict.update(deg_dict)
     if has_values(qual_dict):
-        qual_fields.append(qual_dict)
+        qual_fields.add(**qual_dict)
 
     if has_values(de_dict):
-        segment_fields.append(de_dict.copy())
+        segment_fields.add(**de_dict)
 
     rows = table.find_all('tr').__iter__()
 
@@ -323,15 +345,14 @@ def get_segmentlayout(tab_list, message_struct):
     :param edi_doc: BS4
     :return: Tupel mit Dataframe für Felder und Dataframe für Qualifier
     """
-    fields = []
-    quals = []
+    fields = column_builder.ColumnBuilder(init_de(None))
+    quals = column_builder.ColumnBuilder(init_qual())
 
     for tab in tab_list:
-        new_fields, new_quals = traverse_table(tab, message_struct)
-        fields.extend(new_fields)
-        quals.extend(new_quals)
+        with instrument.table('SegmentLayout', lambda: table_heading(tab)):
+            traverse_table(tab, message_struct, fields, quals)
 
-    return (pd.DataFrame(fields), pd.DataFrame(quals))
+    return (fields.frame(), quals.frame())
 
 def get_table_index(edi_doc):
     change_hist = []
@@ -356,15 +377,22 @@ def get_table_index(edi_doc):
 
     return  {'MessageStructure': message_structure, 'SegmentLayout': segment_layout,  'ChangeHist': change_hist}
 
-def extract_mig(path):
+def extract_mig(path, backend='html.parser', formats=('excel',)):
     with open(path, 'r') as f:
         data = f.read()
 
-    edi_doc = BeautifulSoup(data, 'html.parser')
+    edi_doc = util.parse_html(data, backend, keep=STRAINER_TAGS)
     table_index = get_table_index(edi_doc)
+    extract_mig_tables(table_index, path, formats)
 
-    new_file = path.parent / f'{path.stem}.xlsx'
-    writer = pd.ExcelWriter(new_file)
+def extract_mig_tables(table_index, path, formats=('excel',)):
+    """
+    Schreibt die Ausgabe zu einem MIG aus dem bereits erstellten Tabellenindex
+    :param table_index: Ergebnis von get_table_index
+    :param path: Pfad der HTML Datei
+    :param formats: Ausgabeformate, siehe sink.FORMATS
+    """
+    out = sink.open_sink(path, formats)
 
     message_struct = get_message_struct(table_index['MessageStructure'])
     message_struct.insert(0, 'Format', path.stem[:6])
@@ -384,7 +412,7 @@ def extract_mig(path):
                'Note': 'Bemerkung',
                'Example': 'Beispiel'}
     message_struct.rename(columns=rn_dict, inplace=True)
-    message_struct.to_excel(writer, sheet_name='Nachrichtenstruktur', index=False)
+    out.write(message_struct, 'Nachrichtenstruktur')
 
     df1.insert(0, 'Format', path.stem[:6])
     df2.insert(0, 'Format', path.stem[:6])
@@ -401,7 +429,7 @@ def extract_mig(path):
                'de_bdew_format': 'Datenelementgruppe BDEW Format',
                'de_beschreibung': 'Beschreibung'}
     df1.rename(columns=rn_dict, inplace=True)
-    df1.to_excel(writer, sheet_name='Segmentlayout', index=False)
+    out.write(df1, 'Segmentlayout')
 
     rn_dict = {'no': 'Zähler',
                'deg': 'Datenelementgruppe',
@@ -410,26 +438,19 @@ def extract_mig(path):
                'descr': 'Qualifier Beschreibung',
                'beschreibung': ''}
     df2.rename(columns=rn_dict, inplace=True)
-    df2.to_excel(writer, sheet_name='Segmentlayout_Qual', index=False)
+    out.write(df2, 'Segmentlayout_Qual')
 
     #  Änderungshistorie
-    util.change_history_to_excel(table_index['ChangeHist'], writer)
+    util.change_history_to_excel(table_index['ChangeHist'], out)
 
-    writer.close()
+    out.close()
 
 def main():
     paths = []
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20231001'))
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230401'))
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20221001'))
-    for path in paths:
-        for file in path.rglob('*.HTML'):
-            if '_MIG_' in file.stem:
-                source = file.parent / file.name
-                try:
-                    extract_mig(source)
-                except BaseException as err:
-                    logging.error(f'File {source}. Fehler {err}')
+    manifest.extract_changed(paths, lambda stem: '_MIG_' in stem, extract_mig, VERSION)
 
 if __name__ == '__main__':
     # ToDo Funktionsbeschreibungen überarbeiten. HowTo Lesen und Type Hints hinzufügen
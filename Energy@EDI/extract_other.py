@@ -1,10 +1,18 @@
-from bs4 import BeautifulSoup
 import re
 import pandas as pd
 from pathlib import Path
 import logging
+import manifest
+import sink
 import util
 
+# Tags, die der Extraktor liest und die beim Parsen mit Strainer erhalten bleiben:
+# nur Tabellen
+STRAINER_TAGS = ('table',)
+
+# siehe manifest
+VERSION = '1'
+
 def get_table_index(edi_doc):
     change_hist = []
     for t in edi_doc.find_all('table'):
@@ -22,20 +30,26 @@ def get_table_index(edi_doc):
 
     return change_hist
 
-def extract_other(path):
+def extract_other(path, backend='html.parser', formats=('excel',)):
     with open(path, 'r') as f:
         data = f.read()
 
-    edi_doc = BeautifulSoup(data, 'html.parser')
-    table_index = get_table_index(edi_doc)
+    edi_doc = util.parse_html(data, backend, keep=STRAINER_TAGS)
+    extract_other_tables(get_table_index(edi_doc), path, formats)
 
-    new_file = path.parent / f'{path.stem}.xlsx'
-    writer = pd.ExcelWriter(new_file)
-    util.change_history_to_excel(table_index, writer)
-    if writer.sheets == {}:
+def extract_other_tables(table_index, path, formats=('excel',)):
+    """
+    Schreibt die Änderungshistorie eines sonstigen Dokumentes
+    :param table_index: Ergebnis von get_table_index
+    :param path: Pfad der HTML Datei
+    :param formats: Ausgabeformate, siehe sink.FORMATS
+    """
+    out = sink.open_sink(path, formats)
+    util.change_history_to_excel(table_index, out)
+    if out.sheets == []:
         return
 
-    writer.close()
+    out.close()
 
 def main():
     paths = []
@@ -44,17 +58,8 @@ def main():
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230401'))
     paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20231001'))
     # paths.append(Path('/Users/rainerwappler/PycharmProjects/pythonProject/EDI@ENERGY/EDI_ENERGY/20230414'))
-    for path in paths:
-        for file in path.rglob('*.HTML'):
-            if not '_MIG_' in file.stem \
-               and not '_AHB_' in file.stem \
-               and not 'EBD_' in file.stem:
-                source = file.parent / file.name
-                try:
-                    extract_other(source)
-                except BaseException as err:
-                    logging.error(f'File {source}. Fehler {err}')
-                    raise err
+    manifest.extract_changed(paths, lambda stem: '_MIG_' not in stem and '_AHB_' not in stem and 'EBD_' not in stem,
+                             extract_other, VERSION, raise_errors=True)
 
 if __name__ == '__main__':
     main()
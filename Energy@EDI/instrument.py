@@ -0,0 +1,226 @@
+"""
+Messung von Laufzeit und Speicher der Extraktion und Zusammenführung.
+
+Ein Recorder sammelt für eine Datei die Laufzeit je Schritt (read, parse, index, extract, write) und auf Wunsch
+den Spitzenspeicher je Schritt (tracemalloc, verlangsamt die Ausführung). Die Schritte werden mit
+instrument.stage('...') markiert. Verschachtelte Schritte werden beim umgebenden Schritt abgezogen, so dass z.B.
+das Schreiben in die Senken (write) nicht in extract mitgezählt wird.
+Mit instrument.table(Klassifikation, Überschrift) wird die Verarbeitung einzelner Tabellen gemessen, um die
+langsamsten Tabellen zu finden.
+
+Mit instrument.count(Name, n) zählen die Extraktoren Ereignisse je Datei, z.B. behobene Syntaxfehler.
+
+Ist kein Recorder aktiv, sind stage, table und count ohne Wirkung.
+
+Außerdem:
+profiled: cProfile einer Datei in <Verzeichnis>/<Datei>.prof
+Progress: Fortschritt und Durchsatz eines Laufs über viele Dateien
+write_jsonl: Messwerte als JSON Lines, eine Zeile je Datensatz
+"""
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+
+MB = 1024 * 1024
+
+# Anzahl der langsamsten Tabellen, die je Datei im Ergebnis festgehalten werden
+TABLE_LIMIT = 20
+
+@dataclass
+class DataClassStageRecord:
+    seconds: float = 0.0
+    # Spitzenspeicher während des Schrittes in MB, nur bei Recorder(memory=True)
+    peak_mb: float = 0.0
+
+@dataclass
+class DataClassTableRecord:
+    # Klassifikation der Tabelle, z.B. 'UseCase', 'SegmentLayout', 'EBD'
+    kind: str = ""
+    heading: str = ""
+    seconds: float = 0.0
+
+class Recorder:
+    def __init__(self, memory=False):
+        """
+        :param memory: Spitzenspeicher je Schritt mit tracemalloc messen
+        """
+        self.memory = memory
+        self.stages = {}
+        self.tables = []
+        self.counts = {}
+        # Offene Schritte: [Name, Start, Laufzeit verschachtelter Schritte, Spitzenspeicher]
+        self._stack = []
+        self._started_tracing = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        if self.memory:
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        frame = [name, time.perf_counter(), 0.0, 0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            record = self.stages.setdefault(name, DataClassStageRecord())
+            record.seconds += elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            if self.memory:
+                peak = max(frame[3], tracemalloc.get_traced_memory()[1])
+                record.peak_mb = max(record.peak_mb, peak / MB)
+                if self._stack:
+                    self._stack[-1][3] = max(self._stack[-1][3], peak)
+
+    @contextmanager
+    def table(self, kind, heading):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tables.append(DataClassTableRecord(kind, heading() if callable(heading) else heading,
+                                                    time.perf_counter() - start))
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def stage_seconds(self):
+        return {name: record.seconds for name, record in self.stages.items()}
+
+    def stage_memory(self):
+        return {name: record.peak_mb for name, record in self.stages.items()} if self.memory else {}
+
+    def slowest_tables(self, limit=TABLE_LIMIT):
+        return [asdict(t) for t in sorted(self.tables, key=lambda t: t.seconds, reverse=True)[:limit]]
+
+# Recorder der Datei, die im aktuellen Prozess gerade verarbeitet wird
+_recorder = None
+
+@contextmanager
+def recording(recorder):
+    """
+    Macht recorder für die Dauer des with Blocks zum aktiven Recorder
+    """
+    global _recorder
+    previous = _recorder
+    _recorder = recorder
+    recorder.start()
+    try:
+        yield recorder
+    finally:
+        recorder.stop()
+        _recorder = previous
+
+def stage(name):
+    """
+    Misst einen Schritt im aktiven Recorder, z.B. with instrument.stage('parse'): ...
+    """
+    return _recorder.stage(name) if _recorder is not None else nullcontext()
+
+def table(kind, heading=""):
+    """
+    Misst die Verarbeitung einer Tabelle im aktiven Recorder
+    :param kind: Klassifikation der Tabelle
+    :param heading: Überschrift oder Funktion, die die Überschrift liefert. Die Funktion wird nur aufgerufen,
+                    wenn ein Recorder aktiv ist.
+    """
+    return _recorder.table(kind, heading) if _recorder is not None else nullcontext()
+
+def count(name, n=1):
+    """
+    Erhöht einen Zähler der Datei im aktiven Recorder
+    """
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+@contextmanager
+def profiled(directory, name):
+    """
+    Zeichnet für die Dauer des with Blocks ein cProfile auf und speichert es als <directory>/<name>.prof.
+    Ohne directory wird nicht aufgezeichnet.
+    """
+    if directory is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(Path(directory) / f'{name}.prof')
+
+def write_jsonl(file, records):
+    """
+    Schreibt jeden Datensatz (dict) als eine Zeile JSON
+    """
+    with open(file, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+def slowest_tables(results, limit=10):
+    """
+    Langsamste Tabellen über alle Dateien
+    :param results: Ergebnisse mit den Attributen file und tables (Liste von DataClassTableRecord als dict)
+    :return: Liste (Sekunden, Datei, Klassifikation, Überschrift)
+    """
+    rows = [(t['seconds'], Path(r.file).name, t['kind'], t['heading']) for r in results for t in r.tables]
+    return sorted(rows, reverse=True)[:limit]
+
+def format_slowest_tables(rows):
+    lines = [f'{"Sekunden":>9}  {"Datei":<40}{"Tabelle":<18}Überschrift']
+    for seconds, file, kind, heading in rows:
+        lines.append(f'{seconds:>9.3f}  {file[:39]:<40}{kind:<18}{heading}')
+    return "\n".join(lines)
+
+class Progress:
+    """
+    Gibt nach jeder Datei (höchstens alle interval Sekunden) Fortschritt und Durchsatz aus
+    """
+    def __init__(self, total, stream=sys.stderr, interval=0.5):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self.last = 0.0
+
+    def update(self, size=0, ok=True):
+        self.done += 1
+        self.bytes += size
+        self.failed += not ok
+        now = time.perf_counter()
+        if now - self.last >= self.interval or self.done == self.total:
+            self.last = now
+            self.stream.write('\r' + self.line())
+            self.stream.flush()
+
+    def line(self):
+        seconds = max(time.perf_counter() - self.start, 1e-9)
+        return (f'{self.done}/{self.total} Dateien, {self.failed} fehlerhaft, {self.done / seconds:.1f} Dateien/s, '
+                f'{self.bytes / MB / seconds:.2f} MB/s')
+
+    def close(self):
+        self.stream.write('\n')
+        self.stream.flush()
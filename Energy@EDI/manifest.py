@@ -0,0 +1,146 @@
+"""
+Manifest für die inkrementelle Extraktion.
+
+Pro Release Verzeichnis wird in MANIFEST_NAME festgehalten, aus welcher Quelldatei (Hash) mit welcher
+Version des Extraktors welche Ausgaben erzeugt wurden, bei mehreren Formaten eine je Format. Ist die Quelldatei
+unverändert, die Version gleich und jede Ausgabe noch vorhanden, muss die Datei nicht erneut extrahiert werden.
+
+Damit nicht bei jedem Lauf alle Dateien gelesen werden müssen, werden Größe und Änderungszeitpunkt
+mitgespeichert. Nur wenn sich diese geändert haben, wird der Hash neu berechnet.
+
+Jeder Extraktor führt dafür eine VERSION. Sie muss erhöht werden, wenn sich die erzeugten Ausgaben ändern,
+damit bereits extrahierte Dateien beim nächsten Lauf neu erzeugt werden.
+"""
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import sink
+
+MANIFEST_NAME = '.edi_manifest.json'
+
+@dataclass
+class DataClassManifestEntry:
+    hash: str = ""
+    size: int = 0
+    mtime_ns: int = 0
+    version: str = ""
+    # Ausgaben relativ zum Release Verzeichnis (Datei bzw. Parquet Verzeichnis je Format)
+    outputs: list = field(default_factory=list)
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class Manifest:
+    def __init__(self, directory):
+        """
+        :param directory: Release Verzeichnis, in dem das Manifest liegt
+        """
+        self.directory = Path(directory)
+        self.file = self.directory / MANIFEST_NAME
+        self.entries = {}
+        # Während eines Laufs berechnete Hashes (Schlüssel, Größe, Änderungszeitpunkt)
+        self.hashes = {}
+        if self.file.exists():
+            with open(self.file, 'r') as f:
+                self.entries = {key: read_entry(entry) for key, entry in json.load(f).items()}
+
+    def key(self, source):
+        return Path(source).relative_to(self.directory).as_posix()
+
+    def source_hash(self, source):
+        """
+        Hash der Quelldatei. Wird aus dem Manifest übernommen, wenn Größe und Änderungszeitpunkt unverändert sind.
+        """
+        stat = Path(source).stat()
+        entry = self.entries.get(self.key(source))
+        if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            return entry.hash
+        key = (self.key(source), stat.st_size, stat.st_mtime_ns)
+        if key not in self.hashes:
+            self.hashes[key] = file_hash(source)
+        return self.hashes[key]
+
+    def is_up_to_date(self, source, version, outputs):
+        """
+        Prüft, ob die Ausgaben mit der aktuellen Quelldatei und Version des Extraktors erzeugt wurden
+        :param source: Quelldatei
+        :param version: Version des Extraktors
+        :param outputs: Ausgaben, z.B. aus output_files. Fehlt eine davon, ist die Datei nicht aktuell.
+        """
+        entry = self.entries.get(self.key(source))
+        if entry is None or entry.version != str(version) or entry.outputs != [self.key(o) for o in outputs]:
+            return False
+        if not all(Path(output).exists() for output in outputs):
+            return False
+        return entry.hash == self.source_hash(source)
+
+    def record(self, source, version, outputs):
+        stat = Path(source).stat()
+        self.entries[self.key(source)] = DataClassManifestEntry(hash=self.source_hash(source),
+                                                                size=stat.st_size,
+                                                                mtime_ns=stat.st_mtime_ns,
+                                                                version=str(version),
+                                                                outputs=[self.key(o) for o in outputs])
+
+    def remove(self, source):
+        self.entries.pop(self.key(source), None)
+
+    def save(self):
+        # Erst in eine temporäre Datei schreiben, damit ein abgebrochener Lauf kein defektes Manifest hinterlässt
+        tmp = self.file.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({key: asdict(entry) for key, entry in self.entries.items()}, f, indent=1)
+        os.replace(tmp, self.file)
+
+def read_entry(entry):
+    """
+    Eintrag aus der JSON Datei. Manifeste vor der Ausgabe mehrerer Formate enthalten statt outputs nur output.
+    """
+    if 'output' in entry:
+        entry['outputs'] = [entry.pop('output')]
+    return DataClassManifestEntry(**entry)
+
+def output_files(source, formats=('excel',)):
+    """
+    Ausgaben, die die Extraktoren zu einer HTML Datei schreiben, eine je Format
+    """
+    return [sink.output_path(source, fmt) for fmt in formats]
+
+def output_version(version, formats=('excel',), layout='wide'):
+    """
+    Version für das Manifest. Die Ausgabeformate und das Layout gehören dazu, damit ein Wechsel eine neue
+    Extraktion auslöst. Für die reine Excel Ausgabe im breiten Layout bleibt es bei der Version des Extraktors.
+    """
+    version = str(version) if tuple(formats) == ('excel',) else f'{version}:{"+".join(formats)}'
+    return version if layout == 'wide' else f'{version}:{layout}'
+
+def extract_changed(paths, matches, extract, version, raise_errors=False):
+    """
+    Extrahiert alle HTML Dateien der Release Verzeichnisse, die laut Manifest nicht aktuell sind (main() der
+    einzelnen Extraktoren, edi_extract.extract_releases führt das Manifest für alle Extraktoren gemeinsam)
+    :param paths: Release Verzeichnisse
+    :param matches: Prüft anhand des Dateinamens, ob der Extraktor zuständig ist
+    :param extract: Extraktion einer Datei, z.B. extract_ahb.extract_ahb
+    :param version: Version des Extraktors
+    :param raise_errors: Fehler nach dem Protokollieren weiterreichen, sonst mit der nächsten Datei fortfahren
+    """
+    for path in paths:
+        extracted = Manifest(path)
+        for source in Path(path).rglob('*.HTML'):
+            if not matches(source.stem) or extracted.is_up_to_date(source, version, output_files(source)):
+                continue
+            try:
+                extract(source)
+                extracted.record(source, version, output_files(source))
+                extracted.save()
+            except BaseException as err:
+                logging.error(f'File {source}. Fehler {err}')
+                if raise_errors:
+                    raise err
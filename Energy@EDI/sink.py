@@ -0,0 +1,251 @@
+"""
+Ausgabe der extrahierten Tabellen.
+
+Die Extraktoren schreiben ihre Sheets (Nachrichtenstruktur, Segmentlayout, Anwendungsfälle, EBD,
+Änderungshistorie ...) nicht direkt in eine Excel Datei, sondern in eine Senke:
+
+ExcelSink:       wie bisher eine Excel Datei <Dokument>.xlsx mit einem Sheet je Tabelle
+ExcelStreamSink: dieselbe Excel Datei, aber mit einem write-only Workbook von openpyxl. Die Zeilen werden
+                 beim Schreiben direkt in die Datei übernommen, statt erst ein vollständiges Workbook im
+                 Speicher aufzubauen (Format 'excel-stream').
+ParquetSink:     ein Verzeichnis <Dokument>.parquet mit einer Parquet Datei je Sheet
+
+Neben write(df, sheet) für fertige DataFrames bieten alle Senken write_rows(sheet, columns, rows).
+Damit kann ein Sheet in mehreren Schritten geschrieben werden, z.B. ein Anwendungsfall nach dem anderen.
+append(df, sheet) hängt ebenso ein DataFrame an, z.B. aus den Spalten eines column_builder.ColumnBuilder.
+
+Parquet Dateien lassen sich um ein Vielfaches schneller lesen und schreiben als Excel Dateien.
+pyarrow wird nur benötigt, wenn Parquet ausgegeben werden soll.
+"""
+from pathlib import Path
+import openpyxl
+import pandas as pd
+import instrument
+
+FORMATS = ('excel', 'excel-stream', 'parquet')
+
+# Verzeichnis eines Releases, in dem die HTML Dateien und ihre Extraktionen liegen
+EXTRACTIONS_DIR = '_Extractions'
+
+def output_dir(source):
+    """
+    HTML Dateien liegen bereits in <Release>/_Extractions, die Extraktion wird daneben geschrieben.
+    Word Dokumente liegen wie beim Download in <Release>/<Bereich>/, ihre Extraktion wird ebenfalls
+    in <Release>/_Extractions geschrieben.
+    """
+    if source.suffix.lower() == '.docx':
+        return source.parent.parent / EXTRACTIONS_DIR
+    return source.parent
+
+def release_dir(source):
+    """
+    Release Verzeichnis eines Dokumentes (HTML oder .docx) oder seiner Extraktion, z.B. .../EDI_ENERGY/20231001
+    """
+    return output_dir(source).parent
+
+def output_path(source, fmt='excel'):
+    """
+    Datei bzw. Verzeichnis, in das die Extraktion eines Dokumentes geschrieben wird
+    :param source: HTML oder .docx Datei
+    :param fmt: einer der Werte aus FORMATS
+    """
+    match fmt:
+        case 'excel' | 'excel-stream':
+            return output_dir(source) / f'{source.stem}.xlsx'
+        case 'parquet':
+            return output_dir(source) / f'{source.stem}.parquet'
+        case _:
+            raise ValueError(f'Unbekanntes Ausgabeformat {fmt}. Möglich sind {FORMATS}')
+
+def cell_value(value):
+    # Fehlende Werte (None, NaN, pd.NA) bleiben in Excel leere Zellen
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    return value
+
+def unique_columns(columns):
+    """
+    Parquet erlaubt keine doppelten Spaltennamen (z.B. 'Datenelementgruppe BDEW Status' im Segmentlayout).
+    Wiederholte Namen werden daher durchnummeriert: 'Name', 'Name (2)', ...
+    """
+    seen = {}
+    names = []
+    for column in map(str, columns):
+        seen[column] = seen.get(column, 0) + 1
+        names.append(column if seen[column] == 1 else f'{column} ({seen[column]})')
+    return names
+
+def get_schema(df):
+    """
+    Schema für Parquet: Zahlen und Wahrheitswerte behalten ihren Typ, alle übrigen Spalten werden
+    als Text mit Nullwerten gespeichert
+    :return: pyarrow.Schema
+    """
+    import pyarrow as pa
+
+    fields = []
+    for column, dtype in zip(unique_columns(df.columns), df.dtypes):
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+            fields.append(pa.field(column, pa.from_numpy_dtype(dtype)))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+def to_arrow(df, schema):
+    """
+    Wandelt ein DataFrame passend zum Schema in eine pyarrow.Table
+    """
+    import pyarrow as pa
+
+    df = df.copy()
+    df.columns = schema.names
+    for column, field in zip(df.columns, schema):
+        if field.type == pa.string():
+            df[column] = df[column].astype('string')
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+class ExcelSink:
+    def __init__(self, file):
+        self.file = file
+        self.writer = pd.ExcelWriter(file)
+        # Anzahl der bereits mit write_rows geschriebenen Zeilen je Sheet
+        self.rows = {}
+
+    @property
+    def sheets(self):
+        return list(self.writer.sheets)
+
+    def write(self, df, sheet):
+        df.to_excel(self.writer, sheet_name=sheet, index=False)
+
+    def write_rows(self, sheet, columns, rows):
+        self.append(pd.DataFrame(list(rows), columns=list(columns)), sheet)
+
+    def append(self, df, sheet):
+        if sheet not in self.rows:
+            df.to_excel(self.writer, sheet_name=sheet, index=False)
+            self.rows[sheet] = len(df)
+        else:
+            df.to_excel(self.writer, sheet_name=sheet, index=False, header=False, startrow=self.rows[sheet] + 1)
+            self.rows[sheet] += len(df)
+
+    def close(self):
+        self.writer.close()
+
+class ExcelStreamSink:
+    def __init__(self, file):
+        self.file = file
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.worksheets = {}
+
+    @property
+    def sheets(self):
+        return list(self.worksheets)
+
+    def write(self, df, sheet):
+        self.write_rows(sheet, df.columns, df.itertuples(index=False, name=None))
+
+    def append(self, df, sheet):
+        self.write_rows(sheet, df.columns, df.itertuples(index=False, name=None))
+
+    def write_rows(self, sheet, columns, rows):
+        worksheet = self.worksheets.get(sheet)
+        if worksheet is None:
+            worksheet = self.workbook.create_sheet(sheet)
+            worksheet.append([str(c) for c in columns])
+            self.worksheets[sheet] = worksheet
+        for row in rows:
+            worksheet.append([cell_value(v) for v in row])
+
+    def close(self):
+        self.workbook.save(self.file)
+
+class ParquetSink:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sheets = []
+        # Offene ParquetWriter der Sheets, die mit write_rows geschrieben werden
+        self.writers = {}
+
+    @property
+    def sheets(self):
+        return list(self._sheets)
+
+    def write(self, df, sheet):
+        import pyarrow.parquet as pq
+
+        pq.write_table(to_arrow(df, get_schema(df)), self.directory / f'{sheet}.parquet')
+        self._sheets.append(sheet)
+
+    def write_rows(self, sheet, columns, rows):
+        self.append(pd.DataFrame(list(rows), columns=list(columns)), sheet)
+
+    def append(self, df, sheet):
+        import pyarrow.parquet as pq
+
+        writer = self.writers.get(sheet)
+        if writer is None:
+            writer = pq.ParquetWriter(self.directory / f'{sheet}.parquet', get_schema(df))
+            self.writers[sheet] = writer
+            self._sheets.append(sheet)
+        if len(df) > 0:
+            writer.write_table(to_arrow(df, writer.schema))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+class MultiSink:
+    """
+    Schreibt jedes Sheet in alle angegebenen Senken
+    """
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    @property
+    def sheets(self):
+        return self.sinks[0].sheets
+
+    def write(self, df, sheet):
+        with instrument.stage('write'):
+            for sink in self.sinks:
+                sink.write(df, sheet)
+
+    def write_rows(self, sheet, columns, rows):
+        # Die Zeilen werden vor dem Schreiben erzeugt, das zählt noch zur Extraktion
+        rows = list(rows)
+        with instrument.stage('write'):
+            for sink in self.sinks:
+                sink.write_rows(sheet, columns, rows)
+
+    def append(self, df, sheet):
+        with instrument.stage('write'):
+            for sink in self.sinks:
+                sink.append(df, sheet)
+
+    def close(self):
+        with instrument.stage('write'):
+            for sink in self.sinks:
+                sink.close()
+
+def open_sink(source, formats=('excel',)):
+    """
+    Öffnet die Senken für die Extraktion eines Dokumentes
+    :param source: HTML oder .docx Datei
+    :param formats: Ausgabeformate aus FORMATS
+    :return: MultiSink
+    """
+    output_dir(source).mkdir(parents=True, exist_ok=True)
+    sinks = []
+    for fmt in formats:
+        match fmt:
+            case 'excel':
+                sinks.append(ExcelSink(output_path(source, fmt)))
+            case 'excel-stream':
+                sinks.append(ExcelStreamSink(output_path(source, fmt)))
+            case 'parquet':
+                sinks.append(ParquetSink(output_path(source, fmt)))
+            case _:
+                raise ValueError(f'Unbekanntes Ausgabeformat {fmt}. Möglich sind {FORMATS}')
+    return MultiSink(sinks)
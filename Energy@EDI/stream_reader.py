@@ -0,0 +1,171 @@
+"""
+Liest große Word HTML Dokumente tabellenweise, ohne den BeautifulSoup Baum des ganzen Dokumentes aufzubauen.
+
+Das Dokument wird stückweise in einen HTMLParser gespeist. Nur das Markup der jeweils aktuellen
+(äußersten) Tabelle wird gesammelt und beim Ende der Tabelle mit BeautifulSoup geparst.
+Zusammen mit der Tabelle werden die zuletzt gelesenen Überschriften und der letzte Paragraph
+außerhalb von Tabellen geliefert. Nach der Verarbeitung kann die Tabelle verworfen werden, so dass der
+Speicherbedarf nicht mit der Größe des Dokumentes wächst.
+Word Dokumente (.docx) werden dabei direkt aus dem Zip Archiv gelesen, siehe docx_reader.
+"""
+from bs4 import BeautifulSoup
+from collections import deque
+from dataclasses import dataclass, field
+from functools import cached_property
+from html import escape
+from html.parser import HTMLParser
+from pathlib import Path
+import docx_reader
+import util
+
+CHUNK_SIZE = 1024 * 1024
+
+def parse_fragment(markup, name):
+    """
+    Parst das Markup eines einzelnen Tags und liefert den Tag
+    """
+    return BeautifulSoup(markup, 'html.parser').find(name)
+
+@dataclass
+class DataClassStreamTable:
+    table: object = None
+    # Zeile, in der die Tabelle im Dokument beginnt
+    sourceline: int = 0
+    # Zuletzt gelesene Überschrift je Ebene ('h1' ... 'h6')
+    headings: dict = field(default_factory=dict)
+    # Zuletzt gelesene Überschrift (beliebige Ebene)
+    heading: object = None
+    # Markup des letzten Paragraphen außerhalb von Tabellen
+    paragraph_markup: str = ''
+
+    @cached_property
+    def paragraph(self):
+        if self.paragraph_markup == '':
+            return None
+        return parse_fragment(self.paragraph_markup, 'p')
+
+class Capture:
+    """
+    Sammelt das Markup eines Tags einschließlich aller enthaltenen Tags
+    """
+    __slots__ = ('name', 'depth', 'parts', 'sourceline')
+
+    def __init__(self, name, sourceline):
+        self.name = name
+        self.depth = 0
+        self.parts = []
+        self.sourceline = sourceline
+
+class TableStreamParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.captures = []
+        self.table = None
+        # Überschriften und Paragraph zu Beginn der aktuellen Tabelle
+        self.table_context = None
+        # Markup und Kontext der fertig gelesenen Tabellen, siehe pop_table
+        self.tables = deque()
+        self.headings = {}
+        self.heading = None
+        self.paragraph_markup = ''
+
+    def _append(self, markup):
+        for capture in self.captures:
+            capture.parts.append(markup)
+
+    def _start_capture(self, tag):
+        capture = Capture(tag, self.getpos()[0])
+        self.captures.append(capture)
+        return capture
+
+    def _end_capture(self, capture):
+        self.captures.remove(capture)
+        markup = "".join(capture.parts)
+        if capture.name == 'table':
+            headings, heading, paragraph_markup = self.table_context
+            self.table = None
+            self.tables.append((markup, capture.sourceline, headings, heading, paragraph_markup))
+        elif capture.name == 'p':
+            self.paragraph_markup = markup
+        else:
+            self.heading = parse_fragment(markup, capture.name)
+            self.headings[capture.name] = self.heading
+
+    def pop_table(self):
+        """
+        Liefert die älteste fertig gelesene Tabelle als DataClassStreamTable. Geparst wird erst hier, damit nicht
+        alle Tabellen eines Stücks gleichzeitig als BeautifulSoup Baum gehalten werden.
+        """
+        markup, sourceline, headings, heading, paragraph_markup = self.tables.popleft()
+        return DataClassStreamTable(table=parse_fragment(markup, 'table'),
+                                    sourceline=sourceline,
+                                    headings=headings,
+                                    heading=heading,
+                                    paragraph_markup=paragraph_markup)
+
+    def _open_paragraph(self):
+        return next((c for c in self.captures if c.name == 'p'), None)
+
+    def handle_starttag(self, tag, attrs):
+        # Ein Paragraph kann weder einen Paragraphen noch eine Tabelle enthalten
+        if tag in ('p', 'table') and self.table is None:
+            paragraph = self._open_paragraph()
+            if paragraph is not None:
+                self._end_capture(paragraph)
+
+        if tag == 'table' and self.table is None:
+            self.table_context = (dict(self.headings), self.heading, self.paragraph_markup)
+            self.table = self._start_capture(tag)
+        elif tag == 'p' and self.table is None:
+            self._start_capture(tag)
+        elif tag in util.HEADINGS:
+            self._start_capture(tag)
+
+        for capture in self.captures:
+            if capture.name == tag:
+                capture.depth += 1
+        self._append(self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs):
+        self._append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        self._append(f'</{tag}>')
+        for capture in list(self.captures):
+            if capture.name == tag:
+                capture.depth -= 1
+                if capture.depth == 0:
+                    self._end_capture(capture)
+
+    def handle_data(self, data):
+        if self.captures:
+            self._append(escape(data, quote=False))
+
+def iter_tables(path, encoding=None, chunk_size=CHUNK_SIZE):
+    """
+    Liefert die Tabellen eines HTML Dokumentes nacheinander als DataClassStreamTable.
+    Word Dokumente (.docx) werden mit docx_reader absatz- und tabellenweise in HTML übersetzt.
+    :param path: HTML oder .docx Datei
+    :param encoding: Kodierung der Datei, Standard wie bei open()
+    :param chunk_size: Anzahl der Zeichen, die je Schritt gelesen werden
+    """
+    if Path(path).suffix.lower() == '.docx':
+        yield from iter_chunk_tables(docx_reader.iter_html(path))
+        return
+
+    with open(path, 'r', encoding=encoding) as f:
+        yield from iter_chunk_tables(iter(lambda: f.read(chunk_size), ''))
+
+def iter_chunk_tables(chunks):
+    """
+    Liefert die Tabellen eines stückweise gelieferten HTML Dokumentes
+    :param chunks: Iterator über Teile des HTML Textes
+    """
+    parser = TableStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        while parser.tables:
+            yield parser.pop_table()
+    parser.close()
+    while parser.tables:
+        yield parser.pop_table()
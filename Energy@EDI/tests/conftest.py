@@ -0,0 +1,58 @@
+"""
+Gemeinsame Fixtures der Tests. Die Module liegen flach in Energy@EDI und werden wie in den Skripten direkt
+importiert, daher wird das Verzeichnis in den Suchpfad aufgenommen.
+"""
+from pathlib import Path
+import shutil
+import sys
+import openpyxl
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import edi_extract
+import edi_generator
+
+@pytest.fixture(scope='session')
+def release(tmp_path_factory):
+    """
+    Synthetisches Release aus edi_generator
+    :return: Liste der Dokumente [MIG, AHB, EBD, Other]
+    """
+    return edi_generator.write_release(tmp_path_factory.mktemp('release'), edi_generator.DataClassGeneratorConfig())
+
+@pytest.fixture(scope='session')
+def malformed_release(tmp_path_factory):
+    """
+    Release mit breiteren Anwendungsfällen und fehlerhaften Zellen (Spalten verschoben, Bedingungen unvollständig)
+    """
+    config = edi_generator.DataClassGeneratorConfig(seed=2, pids=6, malformed_rate=0.2)
+    return edi_generator.write_release(tmp_path_factory.mktemp('malformed'), config)
+
+@pytest.fixture(scope='session')
+def sectioned_release(tmp_path_factory):
+    """
+    Release mit einem Abschnittsumbruch (neues div WordSection) nach jeder dritten Tabelle
+    """
+    config = edi_generator.DataClassGeneratorConfig(section_tables=3)
+    return edi_generator.write_release(tmp_path_factory.mktemp('sectioned'), config)
+
+def extract_copy(file, target_dir, options):
+    """
+    Kopiert ein Dokument in ein eigenes Verzeichnis und extrahiert es dort mit den gewählten Optionen
+    :return: Pfad der erzeugten Excel Datei
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    source = Path(shutil.copy(file, target_dir))
+    edi_extract.extract_file(source, edi_extract.get_extractor(source), edi_extract.DataClassTimings(), options)
+    return source.parent / f'{source.stem}.xlsx'
+
+def read_sheets(file, sheets):
+    """
+    Liest die Zellwerte der angegebenen Sheets einer Excel Datei
+    :return: dict mit Sheetname und Liste der Zeilen (Tupel mit Zellwerten)
+    """
+    wb = openpyxl.load_workbook(file, read_only=True)
+    values = {sheet: list(wb[sheet].iter_rows(values_only=True)) for sheet in sheets if sheet in wb.sheetnames}
+    wb.close()
+    return values
@@ -0,0 +1,128 @@
+"""
+Lokaler Ersatz für edi-energy.de, gegen den download.py in tests/test_download.py geprüft und in benchmark.py
+gemessen wird.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import hashlib
+import threading
+import time
+
+class FakeEdiEnergyHandler(BaseHTTPRequestHandler):
+    """
+    Beantwortet die Anfragen von download.get_view und DataClassEdiDoc.download wie edi-energy.de:
+    POST /index.php liefert die Verzeichnistabelle, HEAD/GET /doc/<n> das Dokument n.
+    GET beachtet If-None-Match (304) und Range/If-Range (206). Mit server.gzip wird das ganze Dokument
+    komprimiert gesendet (Content-Encoding: gzip), wenn die Anfrage gzip erlaubt oder server.force_gzip gesetzt ist.
+    Dokumente in server.failing werden mit 404 beantwortet.
+    Alle Anfragen werden in server.requests protokolliert und um server.latency Sekunden verzögert.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def send_document_headers(self, n, status=200, start=0, encoded=None):
+        content = self.server.contents[n]
+        self.send_response(status)
+        self.send_header('Content-Disposition', f'attachment; filename="Dokument_{n}.pdf"')
+        self.send_header('ETag', f'"{hashlib.md5(content).hexdigest()}"')
+        self.send_header('Last-Modified', 'Sun, 01 Oct 2023 00:00:00 GMT')
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        if encoded is not None:
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(encoded)))
+        else:
+            self.send_header('Content-Length', str(len(content) - start))
+        self.end_headers()
+
+    def get_document(self):
+        time.sleep(self.server.latency)
+        self.server.requests.append((self.command, self.path, self.headers.get('Range')))
+        try:
+            n = int(self.path.rsplit('/', 1)[-1])
+            return n if self.path.startswith('/doc/') and 0 <= n < len(self.server.contents) else None
+        except ValueError:
+            return None
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        rows = ['<tr><td>Strom</td></tr>']
+        for n in range(len(self.server.contents)):
+            if n in self.server.removed:
+                continue
+            rows.append(f'<tr><td>UTILMD AHB Strom {n}</td><td>01.10.2023</td><td>{self.server.to_dates.get(n, "Offen")}</td>'
+                        f'<td><a href="/doc/{n}">PDF</a></td></tr>')
+        body = f'<html><body><table>{"".join(rows)}</table></body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        n = self.get_document()
+        if n is None:
+            self.send_error(404)
+            return
+        self.send_document_headers(n)
+
+    def do_GET(self):
+        n = self.get_document()
+        if n is None:
+            self.send_error(404)
+            return
+        if n in self.server.failing:
+            self.send_error(404)
+            return
+        content = self.server.contents[n]
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        if self.server.gzip and (self.server.force_gzip or 'gzip' in self.headers.get('Accept-Encoding', '')):
+            encoded = gzip.compress(content)
+            self.send_document_headers(n, encoded=encoded)
+            self.wfile.write(encoded)
+            return
+
+        requested = self.headers.get('Range', '')
+        if requested.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+            start = int(requested[6:].split('-')[0])
+            if start >= len(content):
+                self.send_error(416)
+                return
+            self.send_document_headers(n, 206, start)
+            self.wfile.write(content[start:])
+            return
+
+        self.send_document_headers(n)
+        self.wfile.write(content)
+
+def start_fake_server(count, size=64 * 1024, latency=0.0):
+    """
+    Startet FakeEdiEnergyHandler in einem eigenen Thread
+    :param count: Anzahl der Dokumente
+    :param size: Größe der Dokumente in Bytes
+    :param latency: Verzögerung je Anfrage in Sekunden
+    :return: (Server, Basis URL). Der Server wird mit shutdown() beendet.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeEdiEnergyHandler)
+    server.daemon_threads = True
+    server.contents = [bytes([n % 256]) * size for n in range(count)]
+    server.latency = latency
+    server.requests = []
+    # Abweichendes Gültig bis je Dokument, sonst 'Offen'
+    server.to_dates = {}
+    # Dokumente, die nicht mehr im Verzeichnis stehen
+    server.removed = set()
+    # Dokumente, deren Download fehlschlägt
+    server.failing = set()
+    # Dokumente komprimiert senden, mit force_gzip auch ohne gzip in Accept-Encoding
+    server.gzip = False
+    server.force_gzip = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
@@ -0,0 +1,78 @@
+"""
+Zerlegung der Datenelementspalte mit ahb_lexer: erwartete Token für Zellen mit den Eigenheiten der Zerlegung und
+Eigenschaften der Token für alle Zellen eines synthetischen AHB
+"""
+import pytest
+import ahb_lexer
+import extract_ahb
+import util
+
+# Datenelementspalten mit den Eigenheiten der Zerlegung und die erwarteten Token (type, pos, strng, line)
+LEXER_CASES = (
+    # Farbe aus vorherigem span gilt weiter
+    ("<p style='margin-left:0pt'><span style='color:gray'>Beschreibung</span><span>   weiter</span></p>",
+     [('gray', 0, 'Beschreibung', 0), ('empty', 12, '   ', 0), ('gray', 15, 'weiter', 0), ('newline', 0, '', 0)]),
+    # <b> ohne span ist nicht fett, Bedingung ab Position 30
+    ("<p><b>Z01</b>   Text                         X</p>",
+     [('plain', 0, 'Z01', 0), ('empty', 3, '   ', 0), ('plain', 6, 'Text', 0),
+      ('empty', 10, ' ' * 25, 0), ('plain_c', 35, 'X', 0), ('newline', 0, '', 0)]),
+    # Operanden werden hinter dem ersten Vorkommen des Tokens in der Zeile gesucht
+    ("<p><b><span>X</span></b><span>  X  Text</span><span>                         X   M</span></p>",
+     [('bold_x', 0, 'X', 0), ('plain', 1, 'X  Text', 0), ('empty', 10, ' ' * 25, 0), ('plain_c', 35, 'X', 0),
+      ('empty', 36, '   ', 0), ('plain_c', 39, 'M', 0), ('newline', 0, '', 0)]),
+    # Fett ohne folgende Operanden setzt einen Qualifier fort
+    ("<p><b><span>E01</span></b><span>   Beschreibung</span></p><p><b><span>E02</span></b></p>",
+     [('bold', 0, 'E01', 0), ('empty', 3, '   ', 0), ('plain', 6, 'Beschreibung', 0), ('newline', 0, '', 0),
+      ('bold', 0, 'E02', 1), ('newline', 0, '', 1)]),
+    # Einzug über 20pt, Zeilenumbruch im Text wird entfernt
+    ("<p style='margin-left:35.4pt'><span>Muss [1]</span></p><p style='margin-left:7.1pt'>Kann\n[2]</p>",
+     [('indented', 0, 'Muss [1]', 0), ('newline', 0, '', 0), ('plain', 0, 'Kann[2]', 1), ('newline', 0, '', 1)]),
+    # Tabulatoren trennen wie Leerzeichen, leere Paragraphen ergeben nur newline
+    ("<p><span>Text\t\t\tmit Tabs</span><span style='color:gray'>grau</span><span>  </span></p><p></p>",
+     [('plain', 0, 'Text', 0), ('empty', 4, '\t\t\t', 0), ('plain', 7, 'mit Tabs', 0), ('gray', 15, 'grau', 0),
+      ('empty', 19, ' ', 0), ('newline', 0, '', 0), ('newline', 0, '', 1)]),
+    # Geschützte Leerzeichen trennen ebenfalls
+    ("<p>                                        Muss [2]   \xa0\xa0\xa0Soll [3]</p>",
+     [('empty', 0, ' ' * 40, 0), ('plain_c', 40, 'Muss [2]', 0), ('empty', 48, '   \xa0\xa0\xa0', 0),
+      ('plain_c', 54, 'Soll [3]', 0), ('newline', 0, '', 0)]),
+)
+
+TOKEN_TYPES = {'empty', 'bold_x', 'bold', 'gray', 'indented', 'plain_c', 'plain', 'newline'}
+
+def cell(html):
+    return util.parse_html(f'<table><tr><td>{html}</td></tr></table>').find('td')
+
+def ahb_cells(file):
+    """
+    Datenelementspalten aller Zeilen der Anwendungsfälle eines AHB
+    """
+    with open(file, 'r') as f:
+        edi_doc = util.parse_html(f.read(), keep=extract_ahb.STRAINER_TAGS)
+    for _, tab_list in extract_ahb.get_table_index(edi_doc)['UseCases'].values():
+        for table in tab_list:
+            for row in filter(extract_ahb.filter_white_rows, table.find_all('tr')):
+                yield row.find_all('td')[1]
+
+@pytest.mark.parametrize('html, expected', LEXER_CASES)
+def test_tokens(html, expected):
+    assert [tuple(token) for token in ahb_lexer.iter_tokens(cell(html))] == expected
+
+def test_generated_cells(release):
+    """
+    Je Paragraph ein newline, Positionen und Typen passen zusammen und die Token enthalten den ganzen Text
+    """
+    ahb = next(file for file in release if '_AHB_' in file.stem)
+    count = 0
+    for dataelement in ahb_cells(ahb):
+        count += 1
+        tokens = list(ahb_lexer.iter_tokens(dataelement))
+        paragraphs = dataelement.find_all('p')
+        assert [token.line for token in tokens if token.type == 'newline'] == list(range(len(paragraphs)))
+        for token in tokens:
+            assert token.type in TOKEN_TYPES
+            if token.type in ('plain', 'plain_c'):
+                assert (token.type == 'plain_c') == (token.pos > ahb_lexer.CONDITION_POS)
+        for line, p in enumerate(paragraphs):
+            text = ''.join(token.strng for token in tokens if token.line == line)
+            assert ''.join(text.split()) == ''.join(p.get_text().split())
+    assert count > 0
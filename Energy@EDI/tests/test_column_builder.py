@@ -0,0 +1,65 @@
+"""
+Spaltenweiser Aufbau der Tabellen mit column_builder
+"""
+from dataclasses import dataclass
+from pathlib import Path
+import pandas as pd
+import pytest
+import column_builder
+import edi_extract
+import extract_ebd
+import util
+
+# Erwartete Ausgaben, mit dem Stand vor column_builder erzeugt
+DATA = Path(__file__).parent / 'data'
+
+@dataclass
+class DataClassRow:
+    name: str = ""
+    count: int = 0
+    note: str = "-"
+
+def test_add_defaults():
+    builder = column_builder.ColumnBuilder.from_dataclass(DataClassRow)
+    builder.add(name='a')
+    builder.add(count=2, note='x')
+    assert len(builder) == 2
+    assert builder.frame().equals(pd.DataFrame([DataClassRow('a'), DataClassRow(count=2, note='x')]))
+
+def test_wrong_columns():
+    builder = column_builder.ColumnBuilder(('a', 'b'))
+    with pytest.raises(TypeError):
+        builder.add(c=1)
+    with pytest.raises(TypeError):
+        builder.append(1)
+    assert len(builder) == 0
+
+def test_intern():
+    builder = column_builder.ColumnBuilder(('a',))
+    builder.append(''.join(['Mu', 'ss']))
+    builder.append(''.join(['M', 'uss']))
+    assert builder['a'][0] is builder['a'][1]
+
+def test_fill_and_frame():
+    builder = column_builder.ColumnBuilder(('format', 'value'))
+    assert builder.frame().equals(pd.DataFrame())
+    builder.append('', 1)
+    builder.append('', 2)
+    builder.fill('format', 'UTILMD')
+    assert builder.frame({'value': 'Wert'}).to_dict('list') == {'format': ['UTILMD', 'UTILMD'], 'Wert': [1, 2]}
+
+@pytest.mark.parametrize('get_rows, expected', [(extract_ebd.get_ebd, 'ebd_rows.csv'),
+                                                (extract_ebd.get_code_lists, 'code_lists.csv')])
+def test_ebd_rows(release, get_rows, expected):
+    """
+    Der DataFrame des ColumnBuilder entspricht der Ausgabe von get_ebd bzw. get_code_lists vor der Umstellung auf
+    ColumnBuilder (ein Objekt je Zeile) für das EBD aus edi_generator mit der Standardkonfiguration
+    """
+    ebd = next(file for file in release if file.stem.startswith('EBD_'))
+    extractor = edi_extract.get_extractor(ebd)
+    with open(ebd, 'rb' if extractor.binary else 'r') as f:
+        table_index, _ = extractor.get_table_index(util.parse_html(f.read(), keep=extractor.strainer_tags))
+    frame = get_rows(table_index).frame()
+    expected = pd.read_csv(DATA / expected, dtype=str, keep_default_na=False)
+    assert len(expected) > 0
+    assert frame.to_dict('list') == expected.to_dict('list')
@@ -0,0 +1,87 @@
+"""
+Warteschlange der Konvertierung mit dem Fake Konverter und Warten auf das HTML von Word
+"""
+import threading
+import time
+import pytest
+import docx_to_html
+
+def write_slowly(path, parts, pause):
+    """
+    Schreibt parts Stücke mit jeweils pause Sekunden Abstand in einem eigenen Thread, wie Word nach dem Ende der App
+    """
+    def write():
+        for _ in range(parts):
+            time.sleep(pause)
+            with open(path, 'ab') as f:
+                f.write('<p>Stück</p>'.encode())
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+def test_wait_for_file(tmp_path):
+    html = tmp_path / 'temp.html'
+    html.write_bytes(b'')
+    thread = write_slowly(html, 4, 0.1)
+    size = docx_to_html.wait_for_file(html, timeout=5, stable=0.3, poll=0.02)
+    thread.join()
+    assert size == html.stat().st_size == 4 * len('<p>Stück</p>'.encode())
+
+def test_wait_for_empty_file(tmp_path):
+    html = tmp_path / 'temp.html'
+    html.write_bytes(b'')
+    with pytest.raises(docx_to_html.ConversionError):
+        docx_to_html.wait_for_file(html, timeout=0.3, stable=0.1, poll=0.02)
+
+def test_word_waits_for_html(tmp_path, monkeypatch):
+    """
+    Die App (open -W) kehrt zurück, bevor Word temp.html geschrieben hat
+    """
+    work_dir = tmp_path / 'work'
+    work_dir.mkdir()
+    threads = []
+    monkeypatch.setattr(docx_to_html, 'run_process',
+                        lambda args, timeout: threads.append(write_slowly(work_dir / 'temp.html', 3, 0.1)))
+    source = tmp_path / 'Dokument.docx'
+    source.write_bytes(b'')
+    job_dir = tmp_path / 'job'
+    job_dir.mkdir()
+    html = docx_to_html.WordAppConverter(work_dir, timeout=5, stable=0.3).convert(source, job_dir)
+    threads[0].join()
+    assert html.read_bytes() == 3 * '<p>Stück</p>'.encode()
+    assert list(work_dir.iterdir()) == []
+
+def make_conversion_jobs(path, count):
+    """
+    Legt count leere Word Dokumente in <path>/Strom an
+    :return: Liste der DataClassConversionJob
+    """
+    (path / 'Strom').mkdir(parents=True, exist_ok=True)
+    for n in range(count):
+        (path / 'Strom' / f'Dokument_{n}.docx').write_bytes(b'')
+    return sorted(docx_to_html.release_jobs(path), key=lambda job: job.source.name)
+
+def test_convert_all(tmp_path):
+    """
+    Alle HTML Dateien im Ziel, fehlgeschlagene Aufträge ohne HTML Datei, keine Arbeitsverzeichnisse übrig und
+    tatsächlich parallele Konvertierung
+    """
+    count = 8
+    workers = 4
+    jobs = make_conversion_jobs(tmp_path / 'release', count)
+    work_root = tmp_path / 'work'
+    work_root.mkdir()
+    start = time.perf_counter()
+    results = docx_to_html.convert_all(jobs, docx_to_html.FakeConverter(0.2, fail=('Dokument_1.docx',)), workers,
+                                       work_root)
+    seconds = time.perf_counter() - start
+    for job, result in zip(jobs, results):
+        if job.source.name == 'Dokument_1.docx':
+            assert not result.ok
+            assert not job.target.exists()
+        else:
+            assert result.ok, result.error
+            assert job.source.name in job.target.read_text()
+    assert list(work_root.iterdir()) == []
+    # Bei paralleler Konvertierung ist die Gesamtlaufzeit deutlich kürzer als die Summe der Auftragslaufzeiten
+    assert seconds < sum(result.duration for result in results) / 2
@@ -0,0 +1,190 @@
+"""
+Verzeichnis, Snapshots und Download gegen den lokalen Ersatz für edi-energy.de (fake_edi_energy)
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import random
+import time
+import pytest
+import download
+from fake_edi_energy import start_fake_server
+
+@pytest.fixture
+def fake_server():
+    """
+    Startet Server mit start_fake_server(count, size, latency) und beendet sie nach dem Test
+    """
+    servers = []
+    def start(*args, **kwargs):
+        server, base_url = start_fake_server(*args, **kwargs)
+        servers.append(server)
+        return server, base_url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_download(fake_server, tmp_path):
+    count = 20
+    server, base_url = fake_server(count)
+    docs = download.get_view('now', base_url=base_url)
+    assert len(docs) == count
+    for n, doc in enumerate(docs):
+        assert (doc.filename, doc.format, doc.type) == (f'Dokument_{n}.pdf', 'UTILMD', 'AHB')
+
+    for n, result in enumerate(download.download_docs(docs, '20231001', root=tmp_path)):
+        assert result.ok, result.error
+        assert result.path.read_bytes() == server.contents[n]
+    assert not list(tmp_path.rglob('*.part'))
+
+def test_download_changed_and_resumed(fake_server, tmp_path):
+    """
+    Ein zweiter Lauf überträgt nur das geänderte Dokument 0 und setzt den abgebrochenen Download von Dokument 1 fort
+    """
+    server, base_url = fake_server(5)
+    docs = download.get_view('now', base_url=base_url)
+    download.download_docs(docs, '20231001', root=tmp_path)
+
+    server.contents[0] = b'neu' + server.contents[0]
+    cache = download.DownloadCache(tmp_path / '20231001')
+    entry = cache.get(docs[1].url)
+    entry.complete = False
+    cache.set(docs[1].url, entry, save=True)
+    target = tmp_path / '20231001' / docs[1].domain / docs[1].filename
+    target.with_name(target.name + '.part').write_bytes(server.contents[1][:1000])
+    target.unlink()
+
+    results = download.download_docs(docs, '20231001', root=tmp_path)
+    assert [n for n, result in enumerate(results) if not result.skipped] == [0, 1]
+    assert results[1].resumed
+    assert results[1].size == len(server.contents[1]) - 1000
+    for n in (0, 1):
+        assert results[n].path.read_bytes() == server.contents[n]
+
+def change_directory(server):
+    """
+    Dokument 0 entfernt, Dokument 1 mit neuem Gültig bis, ein Dokument hinzugekommen. Snapshots werden sekundengenau
+    benannt, daher wird vor dem nächsten Lesen eine Sekunde gewartet.
+    """
+    server.contents.append(b'neu')
+    server.to_dates[1] = '31.03.2024'
+    server.removed.add(0)
+    time.sleep(1)
+
+def test_snapshot_within_ttl(fake_server, tmp_path):
+    count = 10
+    server, base_url = fake_server(count, size=16)
+    first, diff = download.get_directory(tmp_path, base_url=base_url)
+    # Ohne vorherigen Snapshot sind alle Dokumente neu
+    assert len(diff.delta()) == count and not diff.removed
+    requests_before = len(server.requests)
+    assert download.get_directory(tmp_path, base_url=base_url) == (first, None)
+    assert len(server.requests) == requests_before
+
+def test_snapshot_diff(fake_server, tmp_path):
+    count = 10
+    server, base_url = fake_server(count, size=16)
+    download.get_directory(tmp_path, base_url=base_url)
+
+    change_directory(server)
+    _, diff = download.get_directory(tmp_path, ttl=timedelta(0), base_url=base_url)
+    snapshots = download.snapshot_files(tmp_path)
+    assert len(snapshots) == 2
+    assert download.diff_snapshots(*snapshots) == diff
+
+    assert [Path(doc.url).name for doc in diff.added] == [str(count)]
+    assert [Path(doc.url).name for doc in diff.removed] == ['0']
+    assert [(old.to_date, new.to_date) for old, new in diff.changed] == [(download.OPEN_END, date(2024, 3, 31))]
+    assert len(diff.delta()) == 2
+
+def test_down_load_files(fake_server, tmp_path):
+    """
+    Jeder Lauf fragt alle Dokumente der Ansicht an, der DownloadCache überträgt nur neue, geänderte und
+    zuvor fehlgeschlagene Dokumente - auch innerhalb der TTL und für ein weiteres Release Verzeichnis
+    """
+    count = 5
+    server, base_url = fake_server(count, size=16)
+    snapshots = tmp_path / 'snapshots'
+    snapshots.mkdir()
+    root = tmp_path / 'EDI_ENERGY'
+
+    def down_load(subdirectory='20231001', ttl=download.SNAPSHOT_TTL):
+        """
+        :return: (übertragene Dokumente, fehlgeschlagene Dokumente)
+        """
+        results = download.down_load_files(snapshots, subdirectory, view=None, ttl=ttl, root=root, base_url=base_url)
+        assert sorted(Path(result.url).name for result in results) == \
+               sorted(str(n) for n in range(len(server.contents)) if n not in server.removed)
+        for result in results:
+            if result.ok:
+                assert result.path.read_bytes() == server.contents[int(Path(result.url).name)]
+        return (sorted(Path(result.url).name for result in results if result.ok and not result.skipped),
+                sorted(Path(result.url).name for result in results if not result.ok))
+
+    server.failing.add(2)
+    assert down_load() == (['0', '1', '3', '4'], ['2'])
+    # Innerhalb der TTL wird der fehlgeschlagene Download wiederholt
+    server.failing.clear()
+    assert down_load() == (['2'], [])
+    # Geänderter Inhalt bei gleicher URL und Gültigkeit
+    server.contents[3] = b'neu' + server.contents[3]
+    assert down_load() == (['3'], [])
+    # Ein weiteres Release Verzeichnis erhält alle Dokumente
+    assert down_load('20240401') == ([str(n) for n in range(count)], [])
+
+    # Dokument 1 ist nur in der Gültigkeit geändert, die bedingte Anfrage überträgt es nicht erneut
+    change_directory(server)
+    assert down_load(ttl=timedelta(0)) == ([str(count)], [])
+
+def test_directory_index():
+    """
+    DirectoryIndex.query liefert für zufällige Verzeichnisse und Abfragen dasselbe wie ein Filter über alle Dokumente
+    """
+    rnd = random.Random(1)
+    formats = ['UTILMD', 'MSCONS', 'INVOIC', 'REMADV', 'APERAK']
+    directory = []
+    for n in range(2000):
+        from_date = date(2018, 1, 1) + timedelta(days=rnd.randrange(3000))
+        to_date = download.OPEN_END if rnd.random() < 0.3 else from_date + timedelta(days=rnd.randrange(800))
+        directory.append(download.DataClassEdiDoc(
+            format=' '.join(rnd.sample(formats, rnd.choice([1, 1, 2]))), type=rnd.choice(['AHB', 'MIG', '']),
+            view=rnd.choice(download.VIEWS), from_date=from_date, to_date=to_date, url=f'/doc/{n}'))
+    index = download.DirectoryIndex(directory)
+
+    for _ in range(200):
+        valid_on = date(2018, 1, 1) + timedelta(days=rnd.randrange(3500))
+        format = rnd.choice(formats + [None])
+        type = rnd.choice(['AHB', 'MIG', None])
+        view = rnd.choice(download.VIEWS + (None,))
+        expected = [doc for doc in directory
+                    if doc.from_date <= valid_on <= doc.to_date
+                    and (format is None or format in doc.format.split())
+                    and (type is None or doc.type == type)
+                    and (view is None or doc.view == view)]
+        assert index.query(valid_on, format, type, view) == expected
+
+def test_download_identity_encoding(fake_server, tmp_path):
+    """
+    Dokumente werden ohne Content-Encoding angefordert, damit Content-Length und Range zur Datei passen
+    """
+    server, base_url = fake_server(3)
+    server.gzip = True
+    docs = download.get_view('now', base_url=base_url)
+    for n, result in enumerate(download.download_docs(docs, '20231001', root=tmp_path)):
+        assert result.ok, result.error
+        assert result.size == len(server.contents[n])
+        assert result.path.read_bytes() == server.contents[n]
+
+def test_download_encoded(fake_server, tmp_path):
+    """
+    Komprimiert der Server trotz Accept-Encoding: identity, wird das entpackte Dokument ohne Größenprüfung
+    gespeichert und ein zweiter Lauf bleibt bedingt
+    """
+    server, base_url = fake_server(3)
+    server.gzip = server.force_gzip = True
+    docs = download.get_view('now', base_url=base_url)
+    for n, result in enumerate(download.download_docs(docs, '20231001', root=tmp_path)):
+        assert result.ok, result.error
+        assert result.path.read_bytes() == server.contents[n]
+    assert not list(tmp_path.rglob('*.part'))
+    assert all(result.skipped for result in download.download_docs(docs, '20231001', root=tmp_path))
@@ -0,0 +1,101 @@
+"""
+Zuordnung der Bedingungen zu PIDs, breites und normalisiertes Layout der Anwendungsfälle
+"""
+from collections import Counter
+import random
+import pandas as pd
+import pytest
+import concat
+import edi_extract
+import extract_ahb
+from conftest import extract_copy
+
+def random_start_pos_ref(rnd, count):
+    """
+    Referenzzeile mit count PIDs in zufälliger Reihenfolge und Abständen, die auch gleich weit entfernte
+    Nachbarspalten ergeben
+    """
+    pids = [str(rnd.randint(10000, 99999)) for _ in range(count)]
+    positions = sorted(rnd.sample(range(30, 30 + 12 * count), count))
+    return list(zip(pids, positions))
+
+@pytest.mark.parametrize('count', [1, 2, 5, 24, 48])
+def test_pid_columns(count):
+    """
+    Nächste Referenzspalte, bei gleichem Abstand die kleinere PID
+    """
+    rnd = random.Random(count)
+    for _ in range(50):
+        start_pos_ref = random_start_pos_ref(rnd, count)
+        columns = extract_ahb.PidColumns(start_pos_ref)
+        for pos in range(start_pos_ref[-1][1] + 50):
+            pid, ref = min(start_pos_ref, key=lambda column: (abs(column[1] - pos), column[0]))
+            assert columns.nearest(pos) == (pid, abs(ref - pos)), (start_pos_ref, pos)
+
+def test_generated_use_cases(release, tmp_path):
+    ahb = next(file for file in release if '_AHB_' in file.stem)
+    df = pd.read_excel(extract_copy(ahb, tmp_path, edi_extract.DataClassOptions()),
+                       sheet_name=extract_ahb.USE_CASE_SHEET, keep_default_na=False)
+    assert len(df) > 0
+    assert not df['Fehler'].any()
+
+@pytest.mark.parametrize('fixture', ['release', 'malformed_release'])
+def test_layout(fixture, request, tmp_path):
+    """
+    Das aus dem normalisierten Layout aufgebaute Sheet 'Anwendungsfälle' entspricht dem breiten Layout
+    """
+    ahb = next(file for file in request.getfixturevalue(fixture) if '_AHB_' in file.stem)
+    wide = extract_copy(ahb, tmp_path / 'wide', edi_extract.DataClassOptions())
+    normalized = extract_copy(ahb, tmp_path / 'normalized', edi_extract.DataClassOptions(layout='normalized'))
+    sheet = extract_ahb.USE_CASE_SHEET
+    expected = pd.read_excel(wide, sheet_name=sheet)
+    rebuilt = concat.read_excel_sheets(normalized, [sheet])[sheet]
+    pd.testing.assert_frame_equal(rebuilt, expected)
+
+def test_stream_format_without_unh(release, tmp_path):
+    """
+    Ohne UNH 0065 im ersten Anwendungsfall bleibt dessen Format leer, auch bei der tabellenweisen Extraktion
+    """
+    ahb = next(file for file in release if '_AHB_' in file.stem)
+    html = ahb.read_text()
+    qualifier = html.index('0065')
+    row_start = html.rindex('<tr', 0, qualifier)
+    row_end = html.index('</tr>', qualifier) + len('</tr>')
+    source = tmp_path / ahb.name
+    source.write_text(html[:row_start] + html[row_end:])
+
+    formats = {}
+    for variant, options in (('tree', edi_extract.DataClassOptions()),
+                             ('stream', edi_extract.DataClassOptions(stream=True))):
+        df = pd.read_excel(extract_copy(source, tmp_path / variant, options), sheet_name=extract_ahb.USE_CASE_SHEET,
+                           keep_default_na=False)
+        formats[variant] = df.groupby('Kapitel', sort=False)['format'].first().tolist()
+    assert formats['stream'] == formats['tree']
+    assert formats['tree'][0] == ''
+    assert set(formats['tree'][1:]) == {'UTILMD'}
+
+def test_stream_repeated_pids(release, tmp_path):
+    """
+    Folgt eine Tabelle mit bereits abgeschlossenen PIDs später im Dokument, schreibt die tabellenweise Extraktion
+    ihre Zeilen als eigenen Block am Ende. Die Zeilen sind dieselben wie bei extract_ahb_tables, das sie beim
+    ersten Auftreten der PIDs einordnet.
+    """
+    ahb = next(file for file in release if '_AHB_' in file.stem)
+    html = ahb.read_text()
+    table_start = html.rindex('<table', 0, html.index('EDIFACT Struktur'))
+    table_end = html.index('</table>', table_start) + len('</table>')
+    body_end = html.rindex('</div>')
+    source = tmp_path / ahb.name
+    source.write_text(html[:body_end] + html[table_start:table_end] + html[body_end:])
+
+    def rows(file, variant, options):
+        df = pd.read_excel(extract_copy(file, tmp_path / variant, options), sheet_name=extract_ahb.USE_CASE_SHEET,
+                           keep_default_na=False)
+        return list(df.itertuples(index=False, name=None))
+
+    stream = edi_extract.DataClassOptions(stream=True)
+    before = rows(ahb, 'before', stream)
+    after = rows(source, 'stream', stream)
+    assert len(after) > len(before)
+    assert Counter(after) == Counter(rows(source, 'tree', edi_extract.DataClassOptions()))
+    assert after[:len(before)] == before
@@ -0,0 +1,49 @@
+"""
+Inkrementelle Extraktion über das Manifest im Release Verzeichnis
+"""
+import json
+import shutil
+import edi_extract
+import manifest
+
+def extract(path, formats):
+    """
+    :return: Namen der extrahierten (nicht übersprungenen) Dokumente
+    """
+    summary = edi_extract.extract_releases([path], options=edi_extract.DataClassOptions(formats=formats))
+    assert not summary.failed()
+    return sorted(result.file for result in summary.results if not result.skipped)
+
+def test_all_outputs_checked(release, tmp_path):
+    """
+    Fehlt die Ausgabe eines der Formate, wird das Dokument erneut extrahiert
+    """
+    other = next(file for file in release if file.stem.startswith('Allgemeine_Festlegungen'))
+    source = tmp_path / 'Strom' / other.name
+    source.parent.mkdir()
+    shutil.copy(other, source)
+    formats = ('excel', 'parquet')
+
+    assert extract(tmp_path, formats) == [str(source)]
+    assert extract(tmp_path, formats) == []
+    entry = json.loads((tmp_path / manifest.MANIFEST_NAME).read_text())[f'Strom/{other.name}']
+    assert entry['outputs'] == [f'Strom/{output.name}' for output in manifest.output_files(source, formats)]
+
+    shutil.rmtree(manifest.output_files(source, formats)[1])
+    assert extract(tmp_path, formats) == [str(source)]
+
+def test_single_output_manifest(tmp_path):
+    """
+    Manifeste mit nur einer Ausgabe je Eintrag (output) werden weiter gelesen
+    """
+    source = tmp_path / 'Dokument.HTML'
+    source.write_text('<html></html>')
+    output = tmp_path / 'Dokument.xlsx'
+    output.write_bytes(b'')
+    extracted = manifest.Manifest(tmp_path)
+    extracted.record(source, '1', [output])
+    entry = extracted.entries[extracted.key(source)]
+    (tmp_path / manifest.MANIFEST_NAME).write_text(json.dumps({'Dokument.HTML': {
+        'hash': entry.hash, 'size': entry.size, 'mtime_ns': entry.mtime_ns, 'version': '1',
+        'output': 'Dokument.xlsx'}}))
+    assert manifest.Manifest(tmp_path).is_up_to_date(source, '1', [output])
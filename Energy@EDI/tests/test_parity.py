@@ -0,0 +1,37 @@
+"""
+Alle Parser (util.PARSER_BACKENDS) und die tabellenweise Extraktion mit stream_reader müssen zellgenau dieselben
+Sheets liefern wie html.parser, auch bei Dokumenten mit mehreren Abschnitten (div WordSection).
+"""
+import pytest
+import edi_extract
+import util
+from conftest import extract_copy, read_sheets
+
+# Bedingungen werden aus einem Set geschrieben und haben daher keine feste Reihenfolge
+PARITY_SHEETS = ('Anwendungsfälle', 'Segmentlayout', 'EBD')
+
+VARIANTS = {backend: edi_extract.DataClassOptions(backend=backend) for backend in util.PARSER_BACKENDS}
+VARIANTS['stream'] = edi_extract.DataClassOptions(stream=True)
+
+@pytest.fixture(scope='module', params=['release', 'sectioned_release'])
+def documents(request):
+    return request.getfixturevalue(request.param)
+
+@pytest.fixture(scope='module')
+def reference(documents, tmp_path_factory):
+    """
+    Sheets je Dokument mit html.parser
+    """
+    target_dir = tmp_path_factory.mktemp('html.parser')
+    return {file.name: read_sheets(extract_copy(file, target_dir, VARIANTS['html.parser']), PARITY_SHEETS)
+            for file in documents}
+
+@pytest.mark.parametrize('variant', [variant for variant in VARIANTS if variant != 'html.parser'])
+def test_sheets_equal(variant, documents, reference, tmp_path):
+    # Jedes Dokument enthält eines der Sheets
+    assert sum(len(sheets) for sheets in reference.values()) == len(PARITY_SHEETS)
+    for file in documents:
+        values = read_sheets(extract_copy(file, tmp_path, VARIANTS[variant]), PARITY_SHEETS)
+        assert values.keys() == reference[file.name].keys(), file.name
+        for sheet, rows in reference[file.name].items():
+            assert values[sheet] == rows, f'{file.name} {sheet}'
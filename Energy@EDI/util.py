@@ -1,6 +1,20 @@
+from bisect import bisect_left
+from bs4 import BeautifulSoup, SoupStrainer
 from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
 import pandas as pd
 
+HEADINGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# Verfügbare Parser. 'strainer' und 'lxml-strainer' bauen nur die Teilbäume der Tags auf,
+# die der Extraktor tatsächlich liest (Tabellen, Überschriften ...)
+PARSER_BACKENDS = ('html.parser', 'lxml', 'strainer', 'lxml-strainer')
+
+# Anzahl der unterschiedlichen Style Strings, die parse_style vorhält. Word verwendet in einem Dokument
+# nur wenige hundert verschiedene Style Attribute für sehr viele Zellen und Paragraphen.
+STYLE_CACHE_SIZE = 4096
+
 @dataclass
 class DataClassChangeHistory:
     id: str = ""
@@ -10,7 +24,15 @@ class DataClassChangeHistory:
     reason: str = ""
     status: str = ""
 
-def change_history_to_excel(table_list, excel_writer):
+def change_history_to_excel(table_list, sink):
+    """
+    Liest die Änderungshistorie aus den Tabellen und schreibt sie in das Sheet 'Änderungshistorie'
+    :param table_list: Tabellen der Änderungshistorie
+    :param sink: Senke aus sink.open_sink
+    """
+    write_change_history(get_change_history(table_list), sink)
+
+def get_change_history(table_list):
     history = []
     for table in table_list:
         changeHistory = DataClassChangeHistory()
@@ -58,7 +80,9 @@ def change_history_to_excel(table_list, excel_writer):
                 changeHistory.status = get_text(columns[5])
         changeHistory.id = old_id
         history.append(changeHistory)
+    return history
 
+def write_change_history(history, sink):
     # Wenn keine Änderungshistorie vorhanden wird ein leerer Satz in die Tabelle geschrieben
     if history == []:
         history.append(DataClassChangeHistory())
@@ -70,13 +94,96 @@ def change_history_to_excel(table_list, excel_writer):
                'reason': 'Grund der Anpassung', \
                'status': 'Status'}
     df.rename(columns=rn_dict, inplace=True)
-    df.to_excel(excel_writer, sheet_name='Änderungshistorie', index=False)
+    sink.write(df, 'Änderungshistorie')
 
-def get_style_dict(tag):
+def parse_html(data, backend='html.parser', keep=('table',) + HEADINGS):
+    """
+    Erzeugt den BeautifulSoup Baum eines Word HTML Dokumentes mit dem gewählten Parser.
+
+    Bei den Strainer Varianten werden nur die in keep genannten Tags (mit allen enthaltenen Tags) in den Baum
+    übernommen. Sie stehen dann alle auf oberster Ebene nebeneinander. Wer Tags über ihr Elternelement zuordnet,
+    muss die Abschnitte (div) behalten, siehe extract_ebd.STRAINER_TAGS.
+    lxml liefert keine Zeilennummern. Da extract_ahb die Überschriften über sourceline den Tabellen zuordnet,
+    werden die Tags in diesem Fall in Dokumentreihenfolge durchnummeriert.
+    :param data: Inhalt der HTML Datei (str oder bytes)
+    :param backend: einer der Werte aus PARSER_BACKENDS
+    :param keep: Tags, die bei den Strainer Varianten erhalten bleiben
+    :return: BeautifulSoup
+    """
+    match backend:
+        case 'html.parser':
+            edi_doc = BeautifulSoup(data, 'html.parser')
+        case 'lxml':
+            edi_doc = BeautifulSoup(data, 'lxml')
+        case 'strainer':
+            edi_doc = BeautifulSoup(data, 'html.parser', parse_only=SoupStrainer(list(keep)))
+        case 'lxml-strainer':
+            edi_doc = BeautifulSoup(data, 'lxml', parse_only=SoupStrainer(list(keep)))
+        case _:
+            raise ValueError(f'Unbekannter Parser {backend}. Möglich sind {PARSER_BACKENDS}')
+
+    if backend.startswith('lxml'):
+        for line, tag in enumerate(edi_doc.find_all(True), start=1):
+            tag.sourceline = line
+    return edi_doc
+
+@dataclass
+class DataClassHeadingIndex:
+    """
+    Nach sourceline sortierte Überschriften eines Dokumentes.
+    Die Überschrift vor einer Tabelle wird per Binärsuche ermittelt.
+    """
+    sourcelines: list = field(default_factory=list)
+    headings: list = field(default_factory=list)
+
+    def preceding(self, sourceline):
+        """
+        Letzte Überschrift, die vor der angegebenen Zeile beginnt
+        :param sourceline: Zeile, z.B. einer Tabelle
+        :return: Tag der Überschrift oder None, wenn davor keine Überschrift steht
+        """
+        pos = bisect_left(self.sourcelines, sourceline)
+        if pos == 0:
+            return None
+        return self.headings[pos - 1]
+
+def get_heading_index(edi_doc, name=HEADINGS):
+    """
+    Baut den Überschriftenindex eines Dokumentes einmal auf
+    :param edi_doc: BeautifulSoup
+    :param name: Filter für find_all, Standard alle Überschriften h1 ... h6
+    :return: DataClassHeadingIndex
+    """
+    headings = sorted(edi_doc.find_all(name), key=lambda h: h.sourceline)
+    return DataClassHeadingIndex(sourcelines=[h.sourceline for h in headings], headings=headings)
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def parse_style(style):
+    """
+    Zerlegt ein Style Attribut (z.B. 'margin-left:7.1pt;background:#D8DFE4') in seine Optionen.
+    Leere Optionen und Optionen ohne ':' werden übersprungen.
+    Das Ergebnis wird je Style String zwischengespeichert und ist daher nicht veränderbar.
+    :param style: Inhalt des Style Attributes
+    :return: Mapping Option -> Wert
+    """
     style_dict = {}
-    if 'style' in tag.attrs:
-        style_dict = dict([tuple(x) for x in [s.strip().split(':') for s in tag['style'].split(';')]])
-    return style_dict
+    for option in style.split(';'):
+        key, sep, value = option.partition(':')
+        if sep == '' or key.strip() == '':
+            continue
+        style_dict[key.strip()] = value.strip()
+    return MappingProxyType(style_dict)
+
+def style_cache_info():
+    """
+    Treffer und Fehlzugriffe des Caches von parse_style im aktuellen Prozess
+    :return: dict mit hits, misses, currsize
+    """
+    info = parse_style.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'currsize': info.currsize}
+
+def get_style_dict(tag):
+    return parse_style(tag.get('style', ''))
 
 def get_text(column):
     """